@@ -0,0 +1,146 @@
+"""
+Compare the old and new ways of running weather lookups against a local
+mock of the OpenWeatherMap API:
+
+    old: a new QThread per lookup, each calling requests.get (fresh connection)
+    new: jobs on a QThreadPool sharing one pooled, keep-alive WeatherClient
+
+    python bench.py --lookups 200 --connect-delay 0.05
+
+The mock server speaks plain HTTP on localhost, so --connect-delay stands in
+for the TCP + TLS handshake a real HTTPS connection pays when it is opened.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from PyQt6.QtCore import QThread, QThreadPool
+
+import weather
+
+SAMPLE_RESPONSE = {
+    "name": "London",
+    "sys": {"country": "GB"},
+    "main": {"temp": 288.15, "humidity": 72, "pressure": 1012},
+    "weather": [{"description": "light rain", "icon": "10d"}],
+    "wind": {"speed": 4.1},
+}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections open between requests
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    connect_delay = 0.0
+    body = json.dumps(SAMPLE_RESPONSE).encode()
+
+    def setup(self):
+        # Runs once per accepted connection, like a handshake would
+        time.sleep(self.connect_delay)
+        super().setup()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(connect_delay):
+    handler = type("Handler", (MockHandler,), {"connect_delay": connect_delay})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class OneShotLookup(QThread):
+    """The pre-pool worker: its own thread and its own connection."""
+
+    def __init__(self, url, timings):
+        self.started = time.perf_counter()  # thread creation and start-up are part of the cost
+        super().__init__()
+        self.url = url
+        self.timings = timings
+
+    def run(self):
+        response = requests.get(self.url, params={"q": "London", "appid": "bench"}, timeout=10)
+        weather.WeatherModel().parse_weather_data(response.json())
+        self.timings.append(time.perf_counter() - self.started)
+
+
+def run_old(url, lookups, concurrency):
+    timings = []
+    for start in range(0, lookups, concurrency):
+        threads = []
+        for _ in range(min(concurrency, lookups - start)):
+            threads.append(OneShotLookup(url, timings))
+            threads[-1].start()
+        for thread in threads:
+            thread.wait()
+    return timings
+
+
+class TimedWorker(weather.WeatherWorker):
+    def __init__(self, engine, timings):
+        self.started = time.perf_counter()  # includes waiting in the pool's queue
+        super().__init__(engine)
+        self.timings = timings
+        self.set_city("London")
+
+    def run(self):
+        super().run()
+        self.timings.append(time.perf_counter() - self.started)
+
+
+def run_new(url, lookups, concurrency):
+    timings = []
+    client = weather.WeatherClient("bench", base_url=url)
+    engine = weather.WeatherEngine("bench", cache=weather.ResponseCache(db_path=None), client=client)
+    pool = QThreadPool()
+    pool.setMaxThreadCount(weather.WORKER_THREADS)
+    for start in range(0, lookups, concurrency):
+        for _ in range(min(concurrency, lookups - start)):
+            pool.start(TimedWorker(engine, timings))
+        pool.waitForDone()
+    return timings
+
+
+def summarize(timings, wall):
+    ordered = sorted(timings)
+    return {
+        "lookups": len(ordered),
+        "wall_seconds": round(wall, 3),
+        "p50_ms": round(statistics.median(ordered) * 1000, 2),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-lookup threads against the pooled client")
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1, help="lookups started together")
+    parser.add_argument("--connect-delay", type=float, default=0.05,
+                        help="seconds the mock server waits on each new connection")
+    args = parser.parse_args()
+
+    server = start_server(args.connect_delay)
+    url = f"http://127.0.0.1:{server.server_address[1]}/data/2.5/weather"
+    results = {}
+    for name, run in (("old", run_old), ("new", run_new)):
+        start = time.perf_counter()
+        timings = run(url, args.lookups, args.concurrency)
+        results[name] = summarize(timings, time.perf_counter() - start)
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Current weather for many places from the command line, without Qt. One
+JSON object is printed per place as soon as its result is ready:
+
+    python cli.py London "Paris, FR" 2643743 48.86,2.35
+    python cli.py --concurrency 16 < sites.txt > weather.jsonl
+
+Places are read from stdin, one per line, when none are given. The API
+key comes from --api-key or the OPENWEATHER_API_KEY environment variable.
+"""
+import argparse
+import json
+import os
+import sys
+
+from engine import BULK_CONCURRENCY, CACHE_DB_PATH, WeatherClient, ResponseCache, WeatherEngine
+
+
+def emit(result):
+    sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def run_async(engine, queries, concurrency):
+    import asyncio
+
+    async def stream():
+        failed = 0
+        async for result in engine.alookup_many(queries, concurrency):
+            failed += result["error"] is not None
+            emit(result)
+        return failed
+
+    return asyncio.run(stream())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print current weather as JSON lines")
+    parser.add_argument("places", nargs="*", help="city name, \"City, CC\", city ID or lat,lon")
+    parser.add_argument("--api-key", default=os.environ.get("OPENWEATHER_API_KEY"))
+    parser.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY, help="requests in flight at once")
+    parser.add_argument("--asyncio", action="store_true", help="drive the lookups from an asyncio event loop")
+    parser.add_argument("--cache-db", default=CACHE_DB_PATH, help="SQLite response cache shared with the GUI")
+    parser.add_argument("--no-cache", action="store_true", help="always ask the API")
+    parser.add_argument("--no-gazetteer", action="store_true", help="send names to the API instead of resolving them")
+    parser.add_argument("--base-url", default=WeatherClient.BASE_URL, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not args.api_key:
+        sys.exit("No API key: pass --api-key or set OPENWEATHER_API_KEY")
+    queries = args.places or [line.strip() for line in sys.stdin if line.strip()]
+
+    cache = ResponseCache(db_path=None, ttl=0) if args.no_cache else ResponseCache(args.cache_db)
+    gazetteer = None
+    if not args.no_gazetteer:
+        from gazetteer import Gazetteer
+        try:
+            gazetteer = Gazetteer()
+        except (OSError, ValueError) as e:
+            # e.g. cities.gaz cannot be written next to a read-only install
+            print(f"Gazetteer unavailable, sending names to the API: {e}", file=sys.stderr)
+    engine = WeatherEngine(
+        args.api_key, cache=cache, gazetteer=gazetteer, concurrency=args.concurrency,
+        client=WeatherClient(args.api_key, base_url=args.base_url, pool_size=args.concurrency)
+    )
+
+    if args.asyncio:
+        failed = run_async(engine, queries, args.concurrency)
+    else:
+        failed = 0
+        for result in engine.lookup_many(queries, args.concurrency):
+            failed += result["error"] is not None
+            emit(result)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""
+Weather lookups without Qt, for the GUI and for batch jobs alike:
+parsing, the response cache, the pooled HTTP client, and WeatherEngine,
+which puts them together behind sync and asyncio APIs.
+
+Heavy imports (requests, asyncio) are deferred until they are needed, so
+a script that is answered from the cache starts quickly.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+
+HTTP_KEEP_ALIVE = True  # reuse connections between lookups
+HTTP_POOL_SIZE = 8  # keep-alive connections per host
+HTTP_TIMEOUT = 10  # seconds
+GROUP_MAX_IDS = 20  # the group endpoint takes at most 20 city IDs per call
+BULK_CONCURRENCY = 8  # lookups in flight at once for the bulk APIs
+CACHE_DB_PATH = "weather_cache.db"
+CACHE_TTL_SECONDS = 600  # OpenWeatherMap refreshes current conditions about every 10 minutes
+CACHE_MAX_ENTRIES = 256
+
+
+class WeatherModel:
+
+    def __init__(self):
+        self.weather_data: Optional[Dict[str, Any]] = None
+    
+    def parse_weather_data(self, json_data: Dict[str, Any]) -> Dict[str, Any]:
+
+        try:
+            parsed = {
+                'city': json_data.get('name', 'Unknown'),
+                'country': json_data.get('sys', {}).get('country', ''),
+                'temp_kelvin': json_data.get('main', {}).get('temp', 0),
+                'temp_celsius': json_data.get('main', {}).get('temp', 0) - 273.15,
+                'temp_fahrenheit': (json_data.get('main', {}).get('temp', 0) - 273.15) * 9/5 + 32,
+                'condition': json_data.get('weather', [{}])[0].get('main', 'Unknown'),
+                'description': json_data.get('weather', [{}])[0].get('description', '').title(),
+                'humidity': json_data.get('main', {}).get('humidity', 0),
+                'pressure': json_data.get('main', {}).get('pressure', 0),
+                'wind_speed': json_data.get('wind', {}).get('speed', 0),
+                'icon_code': json_data.get('weather', [{}])[0].get('icon', '01d')
+            }
+            self.weather_data = parsed
+            return parsed
+        except (KeyError, IndexError, TypeError) as e:
+            raise ValueError(f"Failed to parse weather data: {str(e)}")
+    
+    def get_icon_url(self, icon_code: str) -> str:
+        return f"http://openweathermap.org/img/wn/{icon_code}@2x.png"
+
+
+class ResponseCache:
+    """
+    TTL cache of parsed weather data, keyed by normalized city name or
+    rounded coordinates.
+
+    Entries live in an in-memory LRU and in a SQLite table, so a restart
+    keeps whatever is still fresh. Both tiers are safe to use from worker
+    threads. A failing database (locked, full, read-only) only costs the
+    persistent tier; lookups carry on from memory and the network.
+    """
+
+    def __init__(self, db_path: Optional[str] = CACHE_DB_PATH, ttl: float = CACHE_TTL_SECONDS,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, data)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = None
+        if db_path:
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            with self.conn:
+                self.conn.execute("""
+                    CREATE TABLE IF NOT EXISTS weather_cache (
+                        key TEXT PRIMARY KEY,
+                        data TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+                self.conn.execute("DELETE FROM weather_cache WHERE expires_at <= ?", (time.time(),))
+
+    @staticmethod
+    def city_key(city: str) -> str:
+        """Case and spacing are normalized, so "new  york" and "New York" share an entry."""
+        return "city:" + " ".join(city.lower().split())
+
+    @staticmethod
+    def id_key(city_id: int) -> str:
+        return f"id:{city_id}"
+
+    @staticmethod
+    def coords_key(lat: float, lon: float) -> str:
+        """Coordinates rounded to ~1 km, well inside one weather station's area."""
+        return f"coords:{lat:.2f},{lon:.2f}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return fresh cached data for the key, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is not None and entry[0] > now:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if self.conn is not None:
+                try:
+                    row = self.conn.execute(
+                        "SELECT data, expires_at FROM weather_cache WHERE key = ? AND expires_at > ?",
+                        (key, now)
+                    ).fetchone()
+                except sqlite3.Error:
+                    row = None
+                if row is not None:
+                    data = json.loads(row[0])
+                    self._remember(key, row[1], data)
+                    self.hits += 1
+                    return data
+            self.misses += 1
+            return None
+
+    def put(self, key: str, data: Dict[str, Any]):
+        """Store data under the key for the configured TTL."""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, data)
+            if self.conn is not None:
+                try:
+                    with self.conn:
+                        self.conn.execute(
+                            "INSERT OR REPLACE INTO weather_cache (key, data, expires_at) VALUES (?, ?, ?)",
+                            (key, json.dumps(data), expires_at)
+                        )
+                except sqlite3.Error:
+                    pass  # still cached in memory
+
+    def _remember(self, key: str, expires_at: float, data: Dict[str, Any]):
+        self.memory[key] = (expires_at, data)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters, plus how many entries are held in memory."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.memory)}
+
+
+class WeatherError(Exception):
+    """A failed lookup, with a message fit to show the user."""
+
+
+class WeatherClient:
+    """
+    Long-lived OpenWeatherMap client. One requests.Session is shared by
+    every lookup, so connections (and their TLS sessions) are kept alive
+    and reused from a pool instead of being set up for each search.
+    """
+
+    BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+    def __init__(self, api_key: str, base_url: str = BASE_URL, keep_alive: bool = HTTP_KEEP_ALIVE,
+                 pool_size: int = HTTP_POOL_SIZE, timeout: float = HTTP_TIMEOUT):
+        self.api_key = api_key
+        self.base_url = base_url
+        # The group endpoint sits next to the single-city one
+        self.group_url = base_url.rsplit("/", 1)[0] + "/group"
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.pool_size = pool_size
+        self.model = WeatherModel()
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The shared requests.Session, created (and requests imported) on first use."""
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                if not self.keep_alive:
+                    session.headers["Connection"] = "close"
+                self._session = session
+            return self._session
+
+    def fetch(self, city: Optional[str] = None, lat: Optional[float] = None,
+              lon: Optional[float] = None, city_id: Optional[int] = None) -> Dict[str, Any]:
+        """Fetch and parse current weather for a city, coordinates or city ID. Raises WeatherError."""
+        if city_id is not None:
+            params = {"id": city_id}
+            not_found = f"City ID {city_id} not found."
+        elif lat is not None and lon is not None:
+            params = {"lat": lat, "lon": lon}
+            not_found = f"No weather found for coordinates {lat}, {lon}."
+        elif city:
+            params = {"q": city}
+            not_found = f"City '{city}' not found. Please check the spelling."
+        else:
+            raise WeatherError("No city or coordinates provided.")
+        json_data = self._get(self.base_url, params, not_found)
+        try:
+            return self.model.parse_weather_data(json_data)
+        except ValueError as e:
+            raise WeatherError(str(e))
+
+    def fetch_group(self, city_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Fetch up to GROUP_MAX_IDS cities by OpenWeatherMap city ID in one
+        call to the group endpoint. Returns parsed data by city ID; IDs the
+        API does not know are simply missing.
+        """
+        if len(city_ids) > GROUP_MAX_IDS:
+            raise WeatherError(f"At most {GROUP_MAX_IDS} city IDs per group request.")
+        params = {"id": ",".join(str(city_id) for city_id in city_ids)}
+        json_data = self._get(self.group_url, params, "None of these city IDs were found.")
+        results = {}
+        try:
+            for item in json_data.get("list", []):
+                results[item["id"]] = self.model.parse_weather_data(item)
+        except (KeyError, TypeError, ValueError) as e:
+            raise WeatherError(f"Failed to parse weather data: {str(e)}")
+        return results
+
+    def _get(self, url: str, params: Dict[str, Any], not_found: str) -> Dict[str, Any]:
+        params["appid"] = self.api_key
+        session = self.session
+        import requests
+
+        try:
+            response = session.get(url, params=params, timeout=self.timeout)
+        except requests.exceptions.Timeout:
+            raise WeatherError("Request timed out. Please check your internet connection.")
+        except requests.exceptions.ConnectionError:
+            raise WeatherError("Connection error. Please check your internet connection.")
+        except requests.exceptions.RequestException as e:
+            raise WeatherError(f"Request failed: {str(e)}")
+
+        if response.status_code == 401:
+            raise WeatherError("Invalid API Key. Please check your OpenWeatherMap API key.")
+        elif response.status_code == 404:
+            raise WeatherError(not_found)
+        elif response.status_code != 200:
+            raise WeatherError(f"API Error: {response.status_code} - {response.text}")
+        try:
+            return response.json()
+        except ValueError:
+            raise WeatherError("The weather service sent a response that is not valid JSON.")
+
+
+class WeatherEngine:
+    """
+    Cache-first weather lookups for a single place or a batch of places.
+
+    A query string is a city name ("Paris" or "Paris, FR"), an
+    OpenWeatherMap city ID ("2988507") or coordinates ("48.86,2.35").
+    Names the gazetteer knows are resolved to coordinates locally.
+    Bulk lookups send city IDs GROUP_MAX_IDS at a time through the group
+    endpoint, run at most `concurrency` calls at once, and yield each
+    result as soon as it is ready, as a dict:
+
+        {"query": ..., "index": ..., "data": ... or None, "error": ... or None,
+         "cached": bool, "seconds": float}
+    """
+
+    def __init__(self, api_key: str, cache: Optional[ResponseCache] = None,
+                 client: Optional[WeatherClient] = None, gazetteer=None,
+                 concurrency: int = BULK_CONCURRENCY):
+        self.cache = cache if cache is not None else ResponseCache()
+        self.client = client if client is not None else WeatherClient(api_key, pool_size=max(concurrency, HTTP_POOL_SIZE))
+        self.gazetteer = gazetteer
+        self.concurrency = concurrency
+
+    @staticmethod
+    def cache_key(city: Optional[str] = None, lat: Optional[float] = None,
+                  lon: Optional[float] = None, city_id: Optional[int] = None) -> str:
+        if city_id is not None:
+            return ResponseCache.id_key(city_id)
+        if lat is not None and lon is not None:
+            return ResponseCache.coords_key(lat, lon)
+        return ResponseCache.city_key(city or "")
+
+    def fetch(self, city: Optional[str] = None, lat: Optional[float] = None,
+              lon: Optional[float] = None, city_id: Optional[int] = None) -> Dict[str, Any]:
+        """Ask the API, skipping the cache, and cache the answer. Raises WeatherError."""
+        data = self.client.fetch(city=city, lat=lat, lon=lon, city_id=city_id)
+        self.cache.put(self.cache_key(city, lat, lon, city_id), data)
+        return data
+
+    def lookup(self, city: Optional[str] = None, lat: Optional[float] = None,
+               lon: Optional[float] = None, city_id: Optional[int] = None) -> Dict[str, Any]:
+        """Weather for a city, coordinates or city ID, from the cache when fresh. Raises WeatherError."""
+        cached = self.cache.get(self.cache_key(city, lat, lon, city_id))
+        if cached is not None:
+            return cached
+        return self.fetch(city=city, lat=lat, lon=lon, city_id=city_id)
+
+    def parse_query(self, query: str) -> Dict[str, Any]:
+        """Keyword arguments for one query string: city_id, lat/lon, or city."""
+        query = query.strip()
+        if query.isdigit():
+            return {"city_id": int(query)}
+        lat, comma, lon = query.partition(",")
+        if comma:
+            try:
+                return {"lat": float(lat), "lon": float(lon)}
+            except ValueError:
+                pass
+        if self.gazetteer is not None:
+            resolved = self.gazetteer.resolve(query)
+            if resolved is not None:
+                return {"lat": resolved[2], "lon": resolved[3]}
+        return {"city": query}
+
+    def _plan(self, queries: List[str]):
+        """
+        Split a batch into results already cached and the calls still to
+        make: ("group", [(index, query, city_id), ...]) or ("single", [(index, query, kwargs)]).
+        """
+        cached = []
+        ids = []
+        calls = []
+        for index, query in enumerate(queries):
+            target = self.parse_query(query)
+            data = self.cache.get(self.cache_key(**target))
+            if data is not None:
+                cached.append(self._result(query, index, data=data, cached=True))
+            elif "city_id" in target:
+                ids.append((index, query, target["city_id"]))
+            else:
+                calls.append(("single", [(index, query, target)]))
+        for i in range(0, len(ids), GROUP_MAX_IDS):
+            calls.append(("group", ids[i:i + GROUP_MAX_IDS]))
+        return cached, calls
+
+    @staticmethod
+    def _result(query: str, index: int, data=None, error=None, cached=False, seconds=0.0) -> Dict[str, Any]:
+        return {"query": query, "index": index, "data": data, "error": error,
+                "cached": cached, "seconds": seconds}
+
+    def _call(self, kind: str, items: list) -> List[Dict[str, Any]]:
+        """
+        Make one planned call; every query it covers gets the call's wall
+        time. Never raises: a failure becomes an error result for each of
+        its queries, so one bad call cannot end the whole batch.
+        """
+        start = time.perf_counter()
+        try:
+            if kind == "group":
+                found = self.client.fetch_group([city_id for _, _, city_id in items])
+                for city_id, data in found.items():
+                    self.cache.put(ResponseCache.id_key(city_id), data)
+            else:
+                index, query, target = items[0]
+                found = {query: self.fetch(**target)}
+        except WeatherError as e:
+            error = str(e)
+        except Exception as e:
+            error = f"Unexpected error: {str(e)}"
+        else:
+            error = None
+        seconds = time.perf_counter() - start
+        if error is not None:
+            return [self._result(query, index, error=error, seconds=seconds) for index, query, _ in items]
+        results = []
+        for index, query, target in items:
+            data = found.get(target if kind == "group" else query)
+            if data is None:
+                results.append(self._result(query, index, error="Not found", seconds=seconds))
+            else:
+                results.append(self._result(query, index, data=data, seconds=seconds))
+        return results
+
+    def lookup_many(self, queries, concurrency: Optional[int] = None):
+        """Look up many queries on a thread pool, yielding results as they complete."""
+        cached, calls = self._plan(list(queries))
+        yield from cached
+        if not calls:
+            return
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        executor = ThreadPoolExecutor(max_workers=concurrency or self.concurrency)
+        try:
+            futures = [executor.submit(self._call, kind, items) for kind, items in calls]
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            # A caller that stops early should not wait for the rest
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def alookup(self, city: Optional[str] = None, lat: Optional[float] = None,
+                      lon: Optional[float] = None, city_id: Optional[int] = None) -> Dict[str, Any]:
+        """lookup() for asyncio code; the blocking call runs in a worker thread."""
+        import asyncio
+
+        return await asyncio.to_thread(self.lookup, city, lat, lon, city_id)
+
+    async def alookup_many(self, queries, concurrency: Optional[int] = None):
+        """lookup_many() for asyncio code: an async generator, bounded by a semaphore."""
+        import asyncio
+
+        cached, calls = self._plan(list(queries))
+        for result in cached:
+            yield result
+        limit = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def call(kind, items):
+            async with limit:
+                return await asyncio.to_thread(self._call, kind, items)
+
+        tasks = [asyncio.ensure_future(call(kind, items)) for kind, items in calls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for result in await next_done:
+                    yield result
+        finally:
+            for task in tasks:
+                task.cancel()
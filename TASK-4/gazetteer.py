@@ -0,0 +1,219 @@
+"""
+Offline city gazetteer: name, country and coordinates for known cities,
+so names can be completed and resolved without a network round trip.
+
+The bundled cities.tsv is compiled on first use into a compact binary
+file that is memory-mapped, so coordinates are read straight from the
+page cache instead of being held as Python objects. It is a small seed
+list in alphabetical order with no populations. To rank suggestions by
+size, import a GeoNames dump (https://download.geonames.org/export/dump/),
+which is written most populous first:
+
+    python gazetteer.py cities15000.txt > cities.tsv
+"""
+import mmap
+import os
+import struct
+import sys
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cities.tsv")
+AUTOCOMPLETE_LIMIT = 10  # suggestions kept per prefix
+TRIE_DEPTH = 4  # longer prefixes filter the candidates of their first 4 characters
+
+_MAGIC = b"GAZ1"
+_HEADER = struct.Struct("<4sII")  # magic, record count, size of the names blob
+
+
+def normalize(name: str) -> str:
+    """Lowercase, accents stripped and spacing collapsed, so "São  Paulo" matches "sao paulo"."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+
+def read_tsv(path: str) -> List[Tuple[str, str, float, float]]:
+    """Rows of (name, country, lat, lon), in the file's order."""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            name, country, lat, lon = line.rstrip("\n").split("\t")[:4]
+            rows.append((name, country, float(lat), float(lon)))
+    return rows
+
+
+def compile_gazetteer(rows: List[Tuple[str, str, float, float]], path: str):
+    """
+    Write rows in the binary layout Gazetteer maps: a header, then
+    latitudes and longitudes as float32 arrays, two-letter country codes,
+    uint32 offsets into the names blob, and the UTF-8 names blob.
+    """
+    names = [row[0].encode("utf-8") for row in rows]
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+    count = len(rows)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, count, offsets[-1]))
+        f.write(struct.pack(f"<{count}f", *(row[2] for row in rows)))
+        f.write(struct.pack(f"<{count}f", *(row[3] for row in rows)))
+        f.write(b"".join(row[1].encode("ascii")[:2].ljust(2) for row in rows))
+        f.write(struct.pack(f"<{count + 1}I", *offsets))
+        f.write(b"".join(names))
+    os.replace(temp_path, path)
+
+
+class _TrieNode:
+    __slots__ = ("children", "matches")
+
+    def __init__(self):
+        self.children: Optional[Dict[str, "_TrieNode"]] = None  # only made when needed
+        # Best records under this prefix; every record at the deepest level
+        self.matches: List[int] = []
+
+
+class Gazetteer:
+    """
+    Memory-mapped city list with a prefix trie over normalized names.
+
+    Records keep the source order, and suggestions and ambiguous names
+    prefer the lower index: the more populous city for a GeoNames
+    import, the alphabetically first for the bundled seed list. The trie
+    stops at `depth` characters, which keeps it small for tens of
+    thousands of cities; exact names are looked up in a dict. Both are
+    built on first use (or by warm()), so opening costs only the mmap.
+    """
+
+    def __init__(self, path: str = GAZETTEER_PATH, limit: int = AUTOCOMPLETE_LIMIT,
+                 depth: int = TRIE_DEPTH):
+        self.path = path
+        self.limit = limit
+        self.depth = depth
+        self.root: Optional[_TrieNode] = None
+        self.keys: List[str] = []
+        self.exact: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        compiled = os.path.splitext(path)[0] + ".gaz"
+        if not os.path.exists(compiled) or os.path.getmtime(compiled) < os.path.getmtime(path):
+            compile_gazetteer(read_tsv(path), compiled)
+        with open(compiled, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, names_size = _HEADER.unpack_from(self.map)
+        if magic != _MAGIC:
+            raise ValueError(f"{compiled} is not a gazetteer file")
+        view = memoryview(self.map)
+        start = _HEADER.size
+        self.lats = view[start:start + 4 * self.count].cast("f")
+        start += 4 * self.count
+        self.lons = view[start:start + 4 * self.count].cast("f")
+        start += 4 * self.count
+        self.countries = view[start:start + 2 * self.count]
+        start += 2 * self.count
+        self.offsets = view[start:start + 4 * (self.count + 1)].cast("I")
+        start += 4 * (self.count + 1)
+        self.names = view[start:start + names_size]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def name(self, index: int) -> str:
+        return bytes(self.names[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+
+    def country(self, index: int) -> str:
+        return bytes(self.countries[2 * index:2 * index + 2]).decode("ascii").strip()
+
+    def record(self, index: int) -> Tuple[str, str, float, float]:
+        """(name, country, lat, lon) of one city."""
+        # float32 storage: round off the noise past the 4 decimals the source had
+        return self.name(index), self.country(index), round(self.lats[index], 4), round(self.lons[index], 4)
+
+    def label(self, index: int) -> str:
+        """How a city is shown and typed back: "Paris, FR"."""
+        return f"{self.name(index)}, {self.country(index)}"
+
+    def warm(self):
+        """Build the index now rather than on the first lookup."""
+        self._index()
+
+    def _index(self) -> _TrieNode:
+        with self._lock:
+            if self.root is None:
+                root = _TrieNode()
+                keys = []
+                exact: Dict[str, List[int]] = {}
+                for index in range(self.count):
+                    key = normalize(self.name(index))
+                    keys.append(key)
+                    exact.setdefault(key, []).append(index)
+                    node = root
+                    for level, char in enumerate(key[:self.depth], 1):
+                        if node.children is None:
+                            node.children = {}
+                        child = node.children.get(char)
+                        if child is None:
+                            child = node.children[char] = _TrieNode()
+                        node = child
+                        # Records arrive in rank order, so the first few are the best
+                        if level == self.depth or len(node.matches) < self.limit:
+                            node.matches.append(index)
+                self.keys = keys
+                self.exact = exact
+                self.root = root
+            return self.root
+
+    def complete(self, prefix: str) -> List[int]:
+        """Record indices of the best cities whose name starts with `prefix`."""
+        key = normalize(prefix)
+        if not key:
+            return []
+        node = self._index()
+        for char in key[:self.depth]:
+            if node.children is None or char not in node.children:
+                return []
+            node = node.children[char]
+        if len(key) <= self.depth:
+            return node.matches[:self.limit]
+        results = []
+        for index in node.matches:
+            if self.keys[index].startswith(key):
+                results.append(index)
+                if len(results) == self.limit:
+                    break
+        return results
+
+    def resolve(self, text: str) -> Optional[Tuple[str, str, float, float]]:
+        """
+        Look up "City" or "City, CC" exactly (ignoring case and accents).
+        Returns the first match in file order, or None if the city is unknown.
+        """
+        self._index()
+        name, _, country = text.partition(",")
+        country = country.strip().upper()
+        for index in self.exact.get(normalize(name), ()):
+            if not country or self.country(index) == country:
+                return self.record(index)
+        return None
+
+
+def import_geonames(path: str, out=sys.stdout):
+    """Convert a GeoNames cities dump to cities.tsv rows, most populous first."""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            rows.append((int(fields[14] or 0), fields[1], fields[8], fields[4], fields[5]))
+    rows.sort(key=lambda row: -row[0])
+    out.write("# name\tcountry\tlat\tlon\tpopulation\n")
+    for population, name, country, lat, lon in rows:
+        out.write(f"{name}\t{country}\t{lat}\t{lon}\t{population}\n")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python gazetteer.py citiesNNNN.txt > cities.tsv")
+    import_geonames(sys.argv[1])
@@ -0,0 +1,287 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import cli
+from engine import GROUP_MAX_IDS, ResponseCache, WeatherClient, WeatherEngine, WeatherError
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def sample(name, city_id=None):
+    data = {
+        "name": name,
+        "sys": {"country": "GB"},
+        "main": {"temp": 288.15, "humidity": 72, "pressure": 1012},
+        "weather": [{"main": "Rain", "description": "light rain", "icon": "10d"}],
+        "wind": {"speed": 4.1},
+    }
+    if city_id is not None:
+        data["id"] = city_id
+    return data
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the OpenWeatherMap API, like the one in bench.py."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    calls = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.calls.append((url.path, params))
+        status, body = 200, None
+        if url.path.endswith("/group"):
+            ids = [int(city_id) for city_id in params["id"].split(",")]
+            body = {"list": [sample(f"City {city_id}", city_id) for city_id in ids if city_id != 999]}
+        elif params.get("q") == "bad":
+            body = b"<html>Service unavailable</html>"
+        elif "missing" in params.values() or "404" in params.values():
+            status, body = 404, {"message": "city not found"}
+        elif "lat" in params:
+            body = sample(f"{params['lat']},{params['lon']}")
+        else:
+            body = sample(params.get("q") or params.get("id"))
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeGazetteer:
+    def resolve(self, text):
+        return ("Paris", "FR", 48.8534, 2.3488) if text.lower() == "paris" else None
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.db_path = os.path.join(self.tmpdir.name, "cache.db")
+
+    def test_keys(self):
+        self.assertEqual(ResponseCache.city_key("  New   YORK "), ResponseCache.city_key("new york"))
+        self.assertEqual(ResponseCache.coords_key(48.85341, 2.3488), "coords:48.85,2.35")
+        self.assertEqual(ResponseCache.id_key(42), "id:42")
+
+    def test_ttl(self):
+        cache = ResponseCache(self.db_path, ttl=60)
+        with mock.patch("engine.time.time", return_value=1000.0):
+            cache.put("city:london", {"temp": 1})
+        with mock.patch("engine.time.time", return_value=1059.0):
+            self.assertEqual(cache.get("city:london"), {"temp": 1})
+        with mock.patch("engine.time.time", return_value=1061.0):
+            self.assertIsNone(cache.get("city:london"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = ResponseCache(db_path=None, max_entries=2)
+        cache.put("a", {"n": 1})
+        cache.put("b", {"n": 2})
+        cache.get("a")
+        cache.put("c", {"n": 3})
+        self.assertEqual(list(cache.memory), ["a", "c"])
+        self.assertIsNone(cache.get("b"))
+
+    def test_survives_restart(self):
+        ResponseCache(self.db_path).put("id:1", {"temp": 2})
+        restarted = ResponseCache(self.db_path, max_entries=1)
+        self.assertEqual(restarted.get("id:1"), {"temp": 2})
+        self.assertIn("id:1", restarted.memory)
+
+    def test_database_errors_fall_back_to_memory(self):
+        cache = ResponseCache(self.db_path)
+        cache.conn.close()
+        cache.put("a", {"n": 1})
+        self.assertEqual(cache.get("a"), {"n": 1})
+        self.assertIsNone(cache.get("b"))
+
+
+class TestWeatherClient(unittest.TestCase):
+    def test_one_pooled_session_for_every_thread(self):
+        client = WeatherClient("test-key", pool_size=3)
+        sessions = []
+        threads = [threading.Thread(target=lambda: sessions.append(client.session)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(session is sessions[0] for session in sessions))
+        adapter = sessions[0].get_adapter("https://api.openweathermap.org")
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertEqual(sessions[0].headers["Connection"], "keep-alive")
+
+    def test_without_keep_alive(self):
+        client = WeatherClient("test-key", keep_alive=False)
+        self.assertEqual(client.session.headers["Connection"], "close")
+        self.assertEqual(client.group_url, "https://api.openweathermap.org/data/2.5/group")
+
+
+class MockServerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/data/2.5/weather"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        MockHandler.calls = []
+
+    def by_index(self, results):
+        results = list(results)
+        self.assertEqual(len(results), len({result["index"] for result in results}))
+        return {result["index"]: result for result in results}
+
+
+class TestWeatherEngine(MockServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ResponseCache(db_path=None)
+        self.engine = WeatherEngine("test-key", cache=self.cache, gazetteer=FakeGazetteer(),
+                                    client=WeatherClient("test-key", base_url=self.base_url))
+
+    def test_parse_query(self):
+        self.assertEqual(self.engine.parse_query(" 2643743 "), {"city_id": 2643743})
+        self.assertEqual(self.engine.parse_query("48.86, 2.35"), {"lat": 48.86, "lon": 2.35})
+        self.assertEqual(self.engine.parse_query("Paris"), {"lat": 48.8534, "lon": 2.3488})
+        self.assertEqual(self.engine.parse_query("Springfield, US"), {"city": "Springfield, US"})
+        self.assertEqual(self.engine.parse_query("a,b"), {"city": "a,b"})
+
+    def test_plan_groups_ids_and_skips_cached(self):
+        self.cache.put(ResponseCache.city_key("London"), {"city": "London"})
+        ids = [str(city_id) for city_id in range(1, GROUP_MAX_IDS + 6)]
+        cached, calls = self.engine._plan(["London", "Rome"] + ids)
+        self.assertEqual([(r["index"], r["cached"]) for r in cached], [(0, True)])
+        self.assertEqual(calls[0], ("single", [(1, "Rome", {"city": "Rome"})]))
+        groups = [items for kind, items in calls if kind == "group"]
+        self.assertEqual([len(items) for items in groups], [GROUP_MAX_IDS, 5])
+        self.assertEqual(groups[1][0], (GROUP_MAX_IDS + 2, str(GROUP_MAX_IDS + 1), GROUP_MAX_IDS + 1))
+
+    def test_call_group(self):
+        results = self.engine._call("group", [(0, "1", 1), (1, "999", 999), (2, "2", 2)])
+        self.assertEqual([r["data"]["city"] if r["data"] else r["error"] for r in results],
+                         ["City 1", "Not found", "City 2"])
+        self.assertEqual(len(MockHandler.calls), 1)
+        self.assertEqual(MockHandler.calls[0][1]["id"], "1,999,2")
+        self.assertIsNotNone(self.cache.get(ResponseCache.id_key(2)))
+
+    def test_call_errors_become_results(self):
+        result, = self.engine._call("single", [(0, "bad", {"city": "bad"})])
+        self.assertIn("not valid JSON", result["error"])
+        result, = self.engine._call("single", [(0, "missing", {"city": "missing"})])
+        self.assertEqual(result["error"], "City 'missing' not found. Please check the spelling.")
+        with mock.patch.object(self.engine.client, "fetch_group", side_effect=RuntimeError("boom")):
+            results = self.engine._call("group", [(0, "1", 1), (1, "2", 2)])
+        self.assertEqual([r["error"] for r in results], ["Unexpected error: boom"] * 2)
+
+    def test_not_found_names_the_target(self):
+        messages = []
+        for target in ({"city_id": 404}, {"lat": 404, "lon": 2.5}):
+            with self.assertRaises(WeatherError) as error:
+                self.engine.lookup(**target)
+            messages.append(str(error.exception))
+        self.assertEqual(messages, ["City ID 404 not found.", "No weather found for coordinates 404, 2.5."])
+
+    def test_lookup_uses_cache(self):
+        first = self.engine.lookup(city="London")
+        self.assertEqual(self.engine.lookup(city="london"), first)
+        self.assertEqual(len(MockHandler.calls), 1)
+        with self.assertRaises(WeatherError):
+            self.engine.lookup(city="bad")
+
+    def test_lookup_many(self):
+        queries = ["Foo", "bad", "Paris", "1", "2", "999", "Bar"]
+        results = self.by_index(self.engine.lookup_many(queries, concurrency=4))
+        self.assertEqual(sorted(results), list(range(len(queries))))
+        self.assertEqual(results[0]["data"]["city"], "Foo")
+        self.assertIn("not valid JSON", results[1]["error"])
+        self.assertEqual(results[2]["data"]["city"], "48.8534,2.3488")
+        self.assertEqual(results[5]["error"], "Not found")
+        self.assertEqual(results[6]["data"]["city"], "Bar")
+        self.assertEqual(sum(path.endswith("/group") for path, _ in MockHandler.calls), 1)
+
+        again = self.by_index(self.engine.lookup_many(queries))
+        self.assertTrue(all(again[index]["cached"] for index in (0, 2, 3, 4, 6)))
+
+    def test_alookup_many(self):
+        async def collect():
+            return [result async for result in self.engine.alookup_many(["Foo", "bad", "1", "2"], concurrency=2)]
+
+        results = self.by_index(asyncio.run(collect()))
+        self.assertEqual(sorted(results), [0, 1, 2, 3])
+        self.assertIsNotNone(results[1]["error"])
+        self.assertEqual(results[3]["data"]["city"], "City 2")
+
+
+class TestCli(MockServerTestCase):
+    def run_cli(self, *args, stdin=""):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            return subprocess.run(
+                [sys.executable, os.path.join(HERE, "cli.py"), "--api-key", "test-key", "--base-url", self.base_url,
+                 "--cache-db", os.path.join(tmpdir, "cache.db"), *args],
+                input=stdin, capture_output=True, text=True, timeout=30,
+            )
+
+    def lines(self, completed):
+        return self.by_index(json.loads(line) for line in completed.stdout.splitlines())
+
+    def test_prints_every_result(self):
+        completed = self.run_cli("Foo", "bad", "1", "Bar")
+        results = self.lines(completed)
+        self.assertEqual(sorted(results), [0, 1, 2, 3])
+        self.assertIsNotNone(results[1]["error"])
+        self.assertEqual(results[2]["data"]["city"], "City 1")
+        self.assertEqual(completed.returncode, 1)
+
+    def test_stdin_and_asyncio(self):
+        completed = self.run_cli("--asyncio", "--no-gazetteer", stdin="London\n\n48.86,2.35\n")
+        results = self.lines(completed)
+        self.assertEqual([results[i]["data"]["city"] for i in (0, 1)], ["London", "48.86,2.35"])
+        self.assertEqual(completed.returncode, 0)
+
+    def test_runs_without_gazetteer(self):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        argv = ["cli.py", "--api-key", "test-key", "--base-url", self.base_url, "--no-cache", "Paris"]
+        with mock.patch.object(sys, "argv", argv), mock.patch("gazetteer.Gazetteer", side_effect=OSError("read-only")), \
+                contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr), \
+                self.assertRaises(SystemExit) as exit:
+            cli.main()
+        self.assertEqual(exit.exception.code, 0)
+        self.assertEqual(json.loads(stdout.getvalue())["data"]["city"], "Paris")
+        self.assertIn("Gazetteer unavailable", stderr.getvalue())
+        self.assertEqual(MockHandler.calls[0][1]["q"], "Paris")
+
+    def test_needs_api_key(self):
+        completed = subprocess.run([sys.executable, os.path.join(HERE, "cli.py"), "London"],
+                                   capture_output=True, text=True, timeout=30,
+                                   env={k: v for k, v in os.environ.items() if k != "OPENWEATHER_API_KEY"})
+        self.assertNotEqual(completed.returncode, 0)
+        self.assertIn("No API key", completed.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
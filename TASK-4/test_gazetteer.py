@@ -0,0 +1,78 @@
+import os
+import tempfile
+import time
+import unittest
+from gazetteer import Gazetteer, normalize
+
+# Most populous first, like a GeoNames import
+ROWS = [
+    ("São Paulo", "BR", -23.5475, -46.63611),
+    ("Paris", "FR", 48.85341, 2.3488),
+    ("Parisot", "FR", 44.26667, 1.85),
+    ("Paris", "US", 33.66094, -95.55551),
+    ("Parma", "IT", 44.79935, 10.32618),
+    ("Pariser Platz", "DE", 52.5163, 13.3777),
+]
+
+
+class TestGazetteer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "cities.tsv")
+        self.write_rows(ROWS)
+        self.gazetteer = Gazetteer(self.path, limit=3)
+
+    def write_rows(self, rows):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("# name\tcountry\tlat\tlon\n")
+            for name, country, lat, lon in rows:
+                f.write(f"{name}\t{country}\t{lat}\t{lon}\n")
+
+    def names(self, indices):
+        return [self.gazetteer.label(index) for index in indices]
+
+    def test_normalize(self):
+        self.assertEqual(normalize("  São   PAULO "), "sao paulo")
+
+    def test_records(self):
+        self.assertEqual(len(self.gazetteer), len(ROWS))
+        self.assertEqual(self.gazetteer.record(1), ("Paris", "FR", 48.8534, 2.3488))
+        self.assertEqual(self.gazetteer.label(0), "São Paulo, BR")
+
+    def test_complete_prefers_earlier_records(self):
+        self.assertEqual(self.names(self.gazetteer.complete("par")), ["Paris, FR", "Parisot, FR", "Paris, US"])
+        self.assertEqual(self.names(self.gazetteer.complete("PA")), ["Paris, FR", "Parisot, FR", "Paris, US"])
+        self.assertEqual(self.names(self.gazetteer.complete("sao")), ["São Paulo, BR"])
+        self.assertEqual(self.gazetteer.complete("xyz"), [])
+        self.assertEqual(self.gazetteer.complete("  "), [])
+
+    def test_complete_past_trie_depth(self):
+        self.assertEqual(self.names(self.gazetteer.complete("paris")), ["Paris, FR", "Parisot, FR", "Paris, US"])
+        self.assertEqual(self.names(self.gazetteer.complete("pariser")), ["Pariser Platz, DE"])
+        self.assertEqual(self.names(self.gazetteer.complete("parm")), ["Parma, IT"])
+        self.assertEqual(self.gazetteer.complete("parisx"), [])
+
+    def test_resolve(self):
+        self.assertEqual(self.gazetteer.resolve("paris")[:2], ("Paris", "FR"))
+        self.assertEqual(self.gazetteer.resolve("Paris, us")[:2], ("Paris", "US"))
+        self.assertEqual(self.gazetteer.resolve("Sao Paulo")[:2], ("São Paulo", "BR"))
+        self.assertIsNone(self.gazetteer.resolve("Paris, DE"))
+        self.assertIsNone(self.gazetteer.resolve("Pari"))
+
+    def test_recompiles_when_source_changes(self):
+        later = time.time() + 10
+        self.write_rows(ROWS + [("Parakou", "BJ", 9.33716, 2.63031)])
+        os.utime(self.path, (later, later))
+        gazetteer = Gazetteer(self.path)
+        self.assertEqual(len(gazetteer), len(ROWS) + 1)
+        self.assertEqual(gazetteer.resolve("parakou")[:2], ("Parakou", "BJ"))
+
+    def test_bundled_list(self):
+        gazetteer = Gazetteer()
+        self.assertEqual(gazetteer.resolve("London, GB")[:2], ("London", "GB"))
+        self.assertIn("Paris, FR", [gazetteer.label(index) for index in gazetteer.complete("pari")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,279 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QBuffer, QThreadPool, Qt
+from PyQt6.QtGui import QColor, QImage
+from PyQt6.QtWidgets import QApplication
+
+from engine import ResponseCache, WeatherEngine, WeatherError
+from weather import DashboardJob, DashboardModel, DashboardWindow, IconWorker, RequestCoordinator, WeatherWorker
+
+app = QApplication.instance() or QApplication([])
+
+
+def wait_until(predicate, timeout=2.0):
+    """Run the Qt event loop until predicate() is true, so queued signals arrive."""
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    app.processEvents()
+    return predicate()
+
+
+class FakeEngine:
+    """Stands in for WeatherEngine; fetches block while `gate` is clear."""
+
+    def __init__(self):
+        self.cache = ResponseCache(db_path=None)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def fetch(self, **target):
+        with self.lock:
+            self.fetched.append(WeatherEngine.cache_key(**target))
+        self.gate.wait(5)
+        return {"city": target.get("city")}
+
+
+def png_bytes():
+    image = QImage(4, 4, QImage.Format.Format_ARGB32)
+    image.fill(QColor("red"))
+    buffer = QBuffer()
+    buffer.open(QBuffer.OpenModeFlag.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = responses
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        return self.responses.get(url.rsplit("/", 1)[-1], FakeResponse(404))
+
+
+class TestIconWorker(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache_dir = os.path.join(self.tmpdir.name, "icons")
+        self.session = FakeSession({"10d@2x.png": FakeResponse(200, png_bytes()),
+                                    "01n@2x.png": FakeResponse(200, b"not a png")})
+
+    def run_worker(self, icon_codes):
+        worker = IconWorker(icon_codes, self.session, cache_dir=self.cache_dir)
+        loaded, failed = [], []
+        worker.signals.icon_loaded.connect(lambda code, image: loaded.append((code, image.width())))
+        worker.signals.icon_failed.connect(failed.append)
+        worker.run()
+        return loaded, failed
+
+    def test_downloads_once_then_reads_from_disk(self):
+        self.assertEqual(self.run_worker(["10d"]), ([("10d", 4)], []))
+        self.assertEqual(os.listdir(self.cache_dir), ["10d.png"])
+        self.assertEqual(self.run_worker(["10d"]), ([("10d", 4)], []))
+        self.assertEqual(len(self.session.urls), 1)
+
+    def test_failures_are_reported_per_icon(self):
+        loaded, failed = self.run_worker(["01n", "10d", "50d"])
+        self.assertEqual(loaded, [("10d", 4)])
+        self.assertEqual(failed, ["01n", "50d"])
+        self.assertEqual(os.listdir(self.cache_dir), ["10d.png"])
+
+
+class TestWeatherWorker(unittest.TestCase):
+    def run_worker(self, fetch, **target):
+        engine = FakeEngine()
+        if fetch is not None:
+            engine.fetch = fetch
+        worker = WeatherWorker(engine, **target)
+        events = []
+        worker.weather_fetched.connect(lambda data: events.append(("data", data["city"])))
+        worker.error_occurred.connect(lambda error: events.append(("error", error)))
+        worker.finished.connect(lambda: events.append(("finished",)))
+        pool = QThreadPool()
+        pool.start(worker)
+        pool.waitForDone()
+        self.assertTrue(wait_until(lambda: events and events[-1] == ("finished",)))
+        return events
+
+    def test_result_is_delivered_to_the_gui_thread(self):
+        self.assertEqual(self.run_worker(None, city="Oslo"), [("data", "Oslo"), ("finished",)])
+
+    def test_errors(self):
+        def fail(**target):
+            raise WeatherError("City not found.")
+
+        def crash(**target):
+            raise KeyError("main")
+
+        self.assertEqual(self.run_worker(fail, city="x"), [("error", "City not found."), ("finished",)])
+        self.assertEqual(self.run_worker(crash, city="x"), [("error", "Unexpected error: 'main'"), ("finished",)])
+
+    def test_set_target(self):
+        worker = WeatherWorker(FakeEngine())
+        worker.set_city("Oslo")
+        self.assertEqual(worker.target, {"city": "Oslo"})
+        worker.set_coordinates(59.9, 10.7)
+        self.assertEqual(worker.target, {"lat": 59.9, "lon": 10.7})
+
+
+class TestRequestCoordinator(unittest.TestCase):
+    def setUp(self):
+        self.engine = FakeEngine()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(4)
+        self.addCleanup(self.pool.waitForDone)
+        self.addCleanup(self.engine.gate.set)
+        self.coordinator = RequestCoordinator(self.engine, self.pool, debounce_ms=20)
+        self.shown = []
+        self.errors = []
+        self.coordinator.weather_ready.connect(lambda data: self.shown.append(data["city"]))
+        self.coordinator.error_occurred.connect(self.errors.append)
+
+    def test_request_after_finished_worker(self):
+        # The first worker is done but its result has not been delivered yet
+        self.coordinator.request({"city": "A"}, debounce=False)
+        self.pool.waitForDone()
+        self.coordinator.request({"city": "B"}, debounce=False)
+        self.assertTrue(wait_until(lambda: self.shown == ["B"]))
+        self.assertEqual(self.coordinator.ignored, 1)
+        self.assertEqual(self.coordinator.in_flight, {})
+
+    def test_same_key_joins_the_call_in_flight(self):
+        self.engine.gate.clear()
+        self.coordinator.request({"city": "A"}, debounce=False)
+        self.assertTrue(wait_until(lambda: self.engine.fetched))  # running, so B cannot take it back
+        self.coordinator.request({"city": "B"}, debounce=False)
+        self.coordinator.request({"city": "a"}, debounce=False)
+        self.assertTrue(wait_until(lambda: len(self.engine.fetched) == 2))
+        self.engine.gate.set()
+        self.assertTrue(wait_until(lambda: not self.coordinator.in_flight))
+        self.assertEqual(self.engine.fetched, ["city:a", "city:b"])
+        self.assertEqual(self.shown, ["A"])
+        self.assertEqual(self.coordinator.merged, 1)
+        self.assertEqual(self.coordinator.ignored, 1)
+
+    def test_superseded_queued_lookup_is_cancelled(self):
+        self.pool.setMaxThreadCount(1)
+        self.engine.gate.clear()
+        self.coordinator.request({"city": "A"}, debounce=False)
+        self.assertTrue(wait_until(lambda: self.engine.fetched))
+        self.coordinator.request({"city": "B"}, debounce=False)  # queued behind A
+        self.coordinator.request({"city": "C"}, debounce=False)
+        self.assertEqual(self.coordinator.cancelled, 1)
+        self.engine.gate.set()
+        self.assertTrue(wait_until(lambda: self.shown == ["C"]))
+        self.assertEqual(self.engine.fetched, ["city:a", "city:c"])
+
+    def test_searches_are_debounced(self):
+        for city in ("A", "B", "C"):
+            self.coordinator.request({"city": city})
+        self.assertTrue(wait_until(lambda: self.shown))
+        self.assertEqual(self.engine.fetched, ["city:c"])
+        self.assertEqual(self.shown, ["C"])
+
+    def test_cached_result_skips_the_pool(self):
+        self.engine.cache.put("city:a", {"city": "cached"})
+        self.coordinator.request({"city": "A"}, debounce=False)
+        self.assertEqual(self.shown, ["cached"])
+        self.assertEqual(self.engine.fetched, [])
+
+
+def weather_data(city, temp=15.0):
+    return {"city": city, "country": "GB", "temp_celsius": temp, "description": "light rain",
+            "humidity": 72, "wind_speed": 4.1}
+
+
+class BulkEngine:
+    """Stands in for WeatherEngine.lookup_many: Qt-free results, one per query."""
+
+    def __init__(self):
+        self.closed = False
+
+    def lookup_many(self, queries, concurrency=None):
+        try:
+            for index, query in enumerate(queries):
+                failed = query == "bad"
+                yield {"query": query, "index": index, "data": None if failed else weather_data(query),
+                       "error": "Not found" if failed else None, "cached": index == 0, "seconds": 0.0125}
+        finally:
+            self.closed = True
+
+
+class TestDashboardModel(unittest.TestCase):
+    def setUp(self):
+        self.model = DashboardModel()
+        self.model.reset(["London", "bad"])
+        self.changed = []
+        self.model.dataChanged.connect(lambda top, bottom: self.changed.append((top.row(), bottom.column())))
+
+    def row(self, row):
+        return [self.model.data(self.model.index(row, column)) for column in range(self.model.columnCount())]
+
+    def test_pending_rows_show_the_query(self):
+        self.assertEqual(self.model.rowCount(), 2)
+        self.assertEqual(self.model.columnCount(), len(DashboardModel.COLUMNS))
+        self.assertEqual(self.row(1), ["bad", "", "", "", "", "", "pending"])
+        self.assertEqual(self.model.headerData(1, Qt.Orientation.Horizontal), "Temp (°C)")
+        self.assertEqual(self.model.rowCount(self.model.index(0, 0)), 0)
+
+    def test_result_and_error(self):
+        self.model.set_result(0, weather_data("London", 12.345), 0.0426, "cached")
+        self.model.set_error(1, "Not found", 0.2)
+        self.assertEqual(self.row(0), ["London, GB", "12.3", "light rain", "72%", "4.1", "43", "cached"])
+        self.assertEqual(self.row(1), ["bad", "", "", "", "", "200", "Not found"])
+        self.assertEqual(self.changed, [(0, 6), (1, 6)])
+
+
+class TestDashboard(unittest.TestCase):
+    def setUp(self):
+        self.engine = BulkEngine()
+
+    def test_job_forwards_results_until_cancelled(self):
+        job = DashboardJob(self.engine, 7, ["A", "B", "C"], 2)
+        received = []
+
+        def on_result(run_id, result):
+            received.append((run_id, result["query"]))
+            job.cancelled = True
+
+        job.signals.result.connect(on_result)
+        job.run()
+        self.assertEqual(received, [(7, "A")])
+        self.assertTrue(self.engine.closed)
+
+    def test_window_fills_rows_as_results_arrive(self):
+        window = DashboardWindow(self.engine)
+        self.addCleanup(window.pool.waitForDone)
+        window.cities_input.setPlainText("London\n\nbad\n")
+        window.start()
+        self.assertTrue(wait_until(lambda: window.done == 2))
+        self.assertEqual([entry["status"] for entry in window.model.rows], ["cached", "Not found"])
+        self.assertEqual(window.errors, 1)
+        self.assertEqual(window.request_seconds, [0.0125])
+        self.assertTrue(window.summary_label.text().startswith("2/2 done, 1 failed"))
+
+        # A result from an earlier run is ignored
+        window.on_result(window.run_id - 1, {"index": 0, "data": None, "error": "late", "cached": False, "seconds": 1})
+        self.assertEqual(window.model.rows[0]["status"], "cached")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,129 +1,157 @@
 import sys
+import os
+import threading
+import time
 import requests
 import geocoder
-from typing import Optional, Dict, Any
+from engine import WeatherModel, ResponseCache, WeatherError, WeatherClient, WeatherEngine
+from gazetteer import Gazetteer
+from typing import Optional, Dict, Any, List
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QRadioButton, QButtonGroup,
-    QMessageBox, QFrame
+    QMessageBox, QFrame, QPlainTextEdit, QCompleter, QSpinBox, QTableView, QHeaderView
 )
-from PyQt6.QtCore import QThread, pyqtSignal, Qt
-from PyQt6.QtGui import QPixmap, QFont
-
-class WeatherModel:
+from PyQt6.QtCore import (
+    QObject, QRunnable, QThreadPool, QTimer, QAbstractTableModel, QModelIndex, QStringListModel,
+    pyqtSignal, Qt
+)
+from PyQt6.QtGui import QPixmap, QImage, QFont
 
-    def __init__(self):
-        self.weather_data: Optional[Dict[str, Any]] = None
-    
-    def parse_weather_data(self, json_data: Dict[str, Any]) -> Dict[str, Any]:
+WORKER_THREADS = 4
+SEARCH_DEBOUNCE_MS = 250  # searches this close together collapse into the last one
+DASHBOARD_CONCURRENCY = 8  # lookups in flight at once on the multi-city dashboard
+DASHBOARD_MAX_CONCURRENCY = 32
+IP_LOCATION_TTL_SECONDS = 1800  # an IP's location rarely changes within a session
+ICON_CACHE_DIR = "weather_icons"
+PREFETCH_ICONS = True  # download the whole icon set once at startup so icons also work offline
+# Every icon OpenWeatherMap uses: day ("d") and night ("n") variants of each condition
+WEATHER_ICON_CODES = tuple(
+    f"{condition}{period}"
+    for condition in ("01", "02", "03", "04", "09", "10", "11", "13", "50")
+    for period in ("d", "n")
+)
 
-        try:
-            parsed = {
-                'city': json_data.get('name', 'Unknown'),
-                'country': json_data.get('sys', {}).get('country', ''),
-                'temp_kelvin': json_data.get('main', {}).get('temp', 0),
-                'temp_celsius': json_data.get('main', {}).get('temp', 0) - 273.15,
-                'temp_fahrenheit': (json_data.get('main', {}).get('temp', 0) - 273.15) * 9/5 + 32,
-                'condition': json_data.get('weather', [{}])[0].get('main', 'Unknown'),
-                'description': json_data.get('weather', [{}])[0].get('description', '').title(),
-                'humidity': json_data.get('main', {}).get('humidity', 0),
-                'pressure': json_data.get('main', {}).get('pressure', 0),
-                'wind_speed': json_data.get('wind', {}).get('speed', 0),
-                'icon_code': json_data.get('weather', [{}])[0].get('icon', '01d')
-            }
-            self.weather_data = parsed
-            return parsed
-        except (KeyError, IndexError, TypeError) as e:
-            raise ValueError(f"Failed to parse weather data: {str(e)}")
-    
-    def get_icon_url(self, icon_code: str) -> str:
-        return f"http://openweathermap.org/img/wn/{icon_code}@2x.png"
+class WeatherSignals(QObject):
+    weather_fetched = pyqtSignal(dict)
+    error_occurred = pyqtSignal(str)
+    finished = pyqtSignal()
 
 
-class WeatherWorker(QThread):
+class WeatherWorker(QRunnable):
     """
-    QThread worker for handling API requests in background.
+    Weather lookup job for the shared QThreadPool.
     Prevents UI freezing during network operations.
     
-    Signals:
+    Signals (on self.signals, also reachable as attributes):
         weather_fetched: Emitted when weather data is successfully retrieved
         error_occurred: Emitted when an error occurs during API call
-        location_detected: Emitted when user location is successfully detected
+        finished: Emitted when the job is done, either way
     """
     
-    weather_fetched = pyqtSignal(dict) 
-    error_occurred = pyqtSignal(str)    
-    location_detected = pyqtSignal(str) 
-    
-    def __init__(self, api_key: str):
+    def __init__(self, engine: WeatherEngine, **target):
         super().__init__()
-        self.api_key = api_key
-        self.city: Optional[str] = None
-        self.use_coords = False
-        self.lat: Optional[float] = None
-        self.lon: Optional[float] = None
-        self.model = WeatherModel()
+        # QRunnable is not a QObject, so the signals live on a helper created
+        # here in the GUI thread; emits from the pool are queued back to it
+        self.signals = WeatherSignals()
+        self.weather_fetched = self.signals.weather_fetched
+        self.error_occurred = self.signals.error_occurred
+        self.finished = self.signals.finished
+        self.engine = engine
+        self.target = target  # keyword arguments for WeatherEngine.fetch
     
     def set_city(self, city: str):
         """Set the city to fetch weather for."""
-        self.city = city
-        self.use_coords = False
+        self.target = {"city": city}
     
     def set_coordinates(self, lat: float, lon: float):
         """Set coordinates for location-based weather fetch."""
-        self.lat = lat
-        self.lon = lon
-        self.use_coords = True
+        self.target = {"lat": lat, "lon": lon}
     
     def run(self):
-        """
-        Main thread execution method.
-        This runs in a separate thread to avoid blocking the UI.
-        """
+        """Runs on a pool thread to avoid blocking the UI."""
         try:
-            base_url = "https://api.openweathermap.org/data/2.5/weather"
-            
-            if self.use_coords and self.lat is not None and self.lon is not None:
-                url = f"{base_url}?lat={self.lat}&lon={self.lon}&appid={self.api_key}"
-            elif self.city:
-                url = f"{base_url}?q={self.city}&appid={self.api_key}"
-            else:
-                self.error_occurred.emit("No city or coordinates provided.")
-                return
-            
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 401:
-                self.error_occurred.emit("Invalid API Key. Please check your OpenWeatherMap API key.")
-                return
-            elif response.status_code == 404:
-                self.error_occurred.emit(f"City '{self.city}' not found. Please check the spelling.")
-                return
-            elif response.status_code != 200:
-                self.error_occurred.emit(f"API Error: {response.status_code} - {response.text}")
-                return
-            
-            json_data = response.json()
-            parsed_data = self.model.parse_weather_data(json_data)
-            
+            parsed_data = self.engine.fetch(**self.target)
             self.weather_fetched.emit(parsed_data)
             
-        except requests.exceptions.Timeout:
-            self.error_occurred.emit("Request timed out. Please check your internet connection.")
-        except requests.exceptions.ConnectionError:
-            self.error_occurred.emit("Connection error. Please check your internet connection.")
-        except ValueError as e:
+        except WeatherError as e:
             self.error_occurred.emit(str(e))
         except Exception as e:
             self.error_occurred.emit(f"Unexpected error: {str(e)}")
+        finally:
+            self.finished.emit()
 
 
-class LocationWorker(QThread):
+class IconSignals(QObject):
+    icon_loaded = pyqtSignal(str, QImage)
+    icon_failed = pyqtSignal(str)
+
+
+class IconWorker(QRunnable):
     """
-    Separate thread for detecting user location via IP.
+    Loads weather icons in the background: from the disk cache when
+    present, otherwise from OpenWeatherMap (saving them to disk). Icons
+    are decoded here into QImages; the GUI thread turns them into QPixmaps.
     """
-    location_detected = pyqtSignal(float, float, str)  
+
+    def __init__(self, icon_codes: list, session: Optional[requests.Session] = None,
+                 cache_dir: str = ICON_CACHE_DIR):
+        super().__init__()
+        self.signals = IconSignals()
+        self.icon_codes = icon_codes
+        self.session = session or requests.Session()
+        self.cache_dir = cache_dir
+        self.model = WeatherModel()
+
+    def run(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for icon_code in self.icon_codes:
+            try:
+                image = self.load(icon_code)
+            except Exception:
+                image = None
+            if image is None:
+                self.signals.icon_failed.emit(icon_code)
+            else:
+                self.signals.icon_loaded.emit(icon_code, image)
+
+    def load(self, icon_code: str) -> Optional[QImage]:
+        path = os.path.join(self.cache_dir, f"{icon_code}.png")
+        image = QImage()
+        if os.path.exists(path) and image.load(path):
+            return image
+        response = self.session.get(self.model.get_icon_url(icon_code), timeout=5)
+        if response.status_code != 200 or not image.loadFromData(response.content):
+            return None
+        # Per-thread temp name: the prefetch and a search may fetch the same icon at once
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(response.content)
+        os.replace(temp_path, path)
+        return image
+
+
+class LocationSignals(QObject):
+    location_detected = pyqtSignal(float, float, str)
     error_occurred = pyqtSignal(str)
+    finished = pyqtSignal()
+
+
+class LocationWorker(QRunnable):
+    """
+    Pool job for detecting user location via IP. A detected location is
+    saved to `cache` so repeat clicks within its TTL skip the lookup.
+    """
+
+    CACHE_KEY = "ip:me"
+
+    def __init__(self, cache: Optional[ResponseCache] = None):
+        super().__init__()
+        self.cache = cache
+        self.signals = LocationSignals()
+        self.location_detected = self.signals.location_detected
+        self.error_occurred = self.signals.error_occurred
+        self.finished = self.signals.finished
     
     def run(self):
         """Detect user location using IP-based geolocation."""
@@ -132,11 +160,306 @@ class LocationWorker(QThread):
             if g.ok and g.latlng:
                 lat, lon = g.latlng
                 city = g.city or "Unknown Location"
+                if self.cache is not None:
+                    self.cache.put(self.CACHE_KEY, {"lat": lat, "lon": lon, "city": city})
                 self.location_detected.emit(lat, lon, city)
             else:
                 self.error_occurred.emit("Could not detect location. Please enter city manually.")
         except Exception as e:
             self.error_occurred.emit(f"Location detection failed: {str(e)}")
+        finally:
+            self.finished.emit()
+
+
+class RequestCoordinator(QObject):
+    """
+    Decides which lookups for the main view reach the network, and which
+    results may update it.
+
+    - Every request bumps a generation number. Only the newest request's
+      result is emitted; anything that finishes after being superseded is
+      dropped.
+    - A request for a key that is already in flight joins that call
+      instead of starting another.
+    - Superseded lookups still queued in the pool are taken back out
+      before they start.
+    - City searches are debounced, so a burst of Enter presses sends one
+      request.
+    """
+
+    weather_ready = pyqtSignal(dict)
+    error_occurred = pyqtSignal(str)
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, engine: WeatherEngine, pool: QThreadPool, debounce_ms: int = SEARCH_DEBOUNCE_MS):
+        super().__init__()
+        self.engine = engine
+        self.pool = pool
+        self.generation = 0
+        self.wanted_key: Optional[str] = None
+        self.wanted_generation = 0
+        self.pending: Optional[Dict[str, Any]] = None  # target waiting for the debounce timer
+        self.in_flight: Dict[str, WeatherWorker] = {}
+        self.merged = 0
+        self.cancelled = 0
+        self.ignored = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(debounce_ms)
+        self.timer.timeout.connect(self._dispatch)
+
+    def request(self, target: Dict[str, Any], debounce: bool = True):
+        """Show weather for `target`, keyword arguments for WeatherEngine.fetch."""
+        self.generation += 1
+        self.pending = target
+        if debounce and self.timer.interval() > 0:
+            self.timer.start()  # restarts the wait if it is already running
+        else:
+            self.timer.stop()
+            self._dispatch()
+
+    def _dispatch(self):
+        if self.pending is None:
+            return
+        target = self.pending
+        self.pending = None
+        key = WeatherEngine.cache_key(**target)
+        self.wanted_key = key
+        self.wanted_generation = self.generation
+        self._cancel_queued(keep=key)
+
+        cached = self.engine.cache.get(key)
+        if cached is not None:
+            self.busy_changed.emit(False)
+            self.weather_ready.emit(cached)
+            return
+        if key in self.in_flight:
+            self.merged += 1
+            self.busy_changed.emit(True)
+            return
+
+        worker = WeatherWorker(self.engine, **target)
+        # in_flight owns the worker until its result is handled; an auto-deleted one
+        # could be gone by the time _cancel_queued hands it to tryTake
+        worker.setAutoDelete(False)
+        worker.weather_fetched.connect(lambda data, key=key: self._finished(key, data, None))
+        worker.error_occurred.connect(lambda error, key=key: self._finished(key, None, error))
+        self.in_flight[key] = worker
+        self.busy_changed.emit(True)
+        self.pool.start(worker)
+
+    def _cancel_queued(self, keep: str):
+        for key, worker in list(self.in_flight.items()):
+            if key != keep and self.pool.tryTake(worker):
+                del self.in_flight[key]
+                self.cancelled += 1
+
+    def _finished(self, key: str, data: Optional[Dict[str, Any]], error: Optional[str]):
+        self.in_flight.pop(key, None)
+        if key != self.wanted_key or self.wanted_generation != self.generation:
+            self.ignored += 1
+            return
+        self.busy_changed.emit(False)
+        if error is None:
+            self.weather_ready.emit(data)
+        else:
+            self.error_occurred.emit(error)
+
+
+class DashboardSignals(QObject):
+    result = pyqtSignal(int, dict)  # run, one WeatherEngine.lookup_many result
+
+
+class DashboardJob(QRunnable):
+    """
+    Runs one dashboard refresh through WeatherEngine.lookup_many, which
+    bounds the concurrency and batches city IDs, and forwards each result
+    as it arrives.
+    """
+
+    def __init__(self, engine: WeatherEngine, run_id: int, queries: List[str], concurrency: int):
+        super().__init__()
+        self.signals = DashboardSignals()
+        self.engine = engine
+        self.run_id = run_id
+        self.queries = queries
+        self.concurrency = concurrency
+        self.cancelled = False
+
+    def run(self):
+        results = self.engine.lookup_many(self.queries, self.concurrency)
+        try:
+            for result in results:
+                if self.cancelled:
+                    break
+                self.signals.result.emit(self.run_id, result)
+        finally:
+            results.close()
+
+
+class DashboardModel(QAbstractTableModel):
+    """
+    Rows of the multi-city dashboard. QTableView only asks for the cells
+    it is painting, so hundreds of rows cost no more than a screenful.
+    """
+
+    COLUMNS = ("City", "Temp (°C)", "Condition", "Humidity", "Wind (m/s)", "Time (ms)", "Status")
+
+    def __init__(self):
+        super().__init__()
+        self.rows: List[Dict[str, Any]] = []
+
+    def reset(self, queries: List[str]):
+        self.beginResetModel()
+        self.rows = [{"query": query, "data": None, "seconds": None, "status": "pending"} for query in queries]
+        self.endResetModel()
+
+    def set_result(self, row: int, data: Dict[str, Any], seconds: float, status: str = "ok"):
+        self.rows[row].update(data=data, seconds=seconds, status=status)
+        self._changed(row)
+
+    def set_error(self, row: int, error: str, seconds: float):
+        self.rows[row].update(seconds=seconds, status=error)
+        self._changed(row)
+
+    def _changed(self, row: int):
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        entry = self.rows[index.row()]
+        data = entry["data"]
+        column = index.column()
+        if column == 0:
+            return f"{data['city']}, {data['country']}" if data else entry["query"]
+        if column == 5:
+            return "" if entry["seconds"] is None else f"{entry['seconds'] * 1000:.0f}"
+        if column == 6:
+            return entry["status"]
+        if data is None:
+            return ""
+        if column == 1:
+            return f"{data['temp_celsius']:.1f}"
+        if column == 2:
+            return data['description']
+        if column == 3:
+            return f"{data['humidity']}%"
+        return f"{data['wind_speed']:.1f}"
+
+
+class DashboardWindow(QWidget):
+    """
+    Weather for a list of cities at once. Lookups run with at most the
+    chosen number in flight, and rows fill in as results arrive. Numeric
+    lines are OpenWeatherMap city IDs and are fetched GROUP_MAX_IDS per
+    call through the group endpoint.
+    """
+
+    def __init__(self, engine: WeatherEngine):
+        super().__init__()
+        self.engine = engine
+        self.pool = QThreadPool()
+        self.job: Optional[DashboardJob] = None
+        self.run_id = 0
+        self.total = 0
+        self.done = 0
+        self.errors = 0
+        self.request_seconds: List[float] = []
+        self.started_at = 0.0
+
+        self.setWindowTitle("Multi-City Dashboard")
+        self.resize(900, 600)
+        layout = QVBoxLayout(self)
+
+        self.cities_input = QPlainTextEdit()
+        self.cities_input.setPlaceholderText("One city per line: a name, or an OpenWeatherMap city ID")
+        self.cities_input.setMaximumHeight(120)
+        layout.addWidget(self.cities_input)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Concurrent requests:"))
+        self.concurrency_input = QSpinBox()
+        self.concurrency_input.setRange(1, DASHBOARD_MAX_CONCURRENCY)
+        self.concurrency_input.setValue(DASHBOARD_CONCURRENCY)
+        controls.addWidget(self.concurrency_input)
+        controls.addStretch()
+        self.fetch_btn = QPushButton("🔄 Fetch All")
+        self.fetch_btn.clicked.connect(self.start)
+        controls.addWidget(self.fetch_btn)
+        layout.addLayout(controls)
+
+        self.model = DashboardModel()
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        # Fixed row heights, so scrolling never measures rows that are off screen
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        self.summary_label = QLabel("")
+        layout.addWidget(self.summary_label)
+
+    def start(self):
+        """Fetch every listed city, replacing the previous run."""
+        queries = [line.strip() for line in self.cities_input.toPlainText().splitlines() if line.strip()]
+        # Results still on their way from the previous run are ignored by run_id
+        self.cancel()
+        self.run_id += 1
+        self.model.reset(queries)
+        self.total = len(queries)
+        self.done = 0
+        self.errors = 0
+        self.request_seconds = []
+        self.started_at = time.perf_counter()
+        self.update_summary()
+
+        self.job = DashboardJob(self.engine, self.run_id, queries, self.concurrency_input.value())
+        self.job.signals.result.connect(self.on_result)
+        self.pool.start(self.job)
+
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancelled = True
+            self.job = None
+
+    def on_result(self, run_id: int, result: Dict[str, Any]):
+        if run_id != self.run_id:
+            return
+        row = result["index"]
+        if result["data"] is not None:
+            self.model.set_result(row, result["data"], result["seconds"], "cached" if result["cached"] else "ok")
+        else:
+            self.model.set_error(row, result["error"], result["seconds"])
+            self.errors += 1
+        if not result["cached"]:
+            self.request_seconds.append(result["seconds"])
+        self.done += 1
+        self.update_summary()
+
+    def update_summary(self):
+        elapsed = time.perf_counter() - self.started_at
+        text = f"{self.done}/{self.total} done, {self.errors} failed, {elapsed:.2f} s elapsed"
+        if self.request_seconds:
+            average = sum(self.request_seconds) / len(self.request_seconds)
+            text += f", {average * 1000:.0f} ms average per request"
+        self.summary_label.setText(text)
+
+    def closeEvent(self, event):
+        self.run_id += 1
+        self.cancel()
+        super().closeEvent(event)
 
 
 class MainWindow(QMainWindow):
@@ -149,9 +472,32 @@ class MainWindow(QMainWindow):
         self.api_key = "abcd_enter_your_api_key" 
         self.current_unit = "celsius"  
         self.weather_data: Optional[Dict[str, Any]] = None
+        self.location_cache = ResponseCache(ttl=IP_LOCATION_TTL_SECONDS)
+        try:
+            self.gazetteer: Optional[Gazetteer] = Gazetteer()
+        except (OSError, ValueError):
+            self.gazetteer = None
+        # All fetching, caching and parsing lives in the engine; the window only schedules it
+        self.engine = WeatherEngine(self.api_key, gazetteer=self.gazetteer)
+        self.cache = self.engine.cache
+        self.client = self.engine.client
+        # Jobs reuse a few long-lived threads instead of starting one per search
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(WORKER_THREADS)
+        self.icon_cache: Dict[str, QPixmap] = {}
+        self.wanted_icon: Optional[str] = None
+        self.dashboard: Optional[DashboardWindow] = None
+        self.coordinator = RequestCoordinator(self.engine, self.pool)
+        self.coordinator.weather_ready.connect(self.display_weather)
+        self.coordinator.error_occurred.connect(self.handle_error)
+        self.coordinator.busy_changed.connect(self.on_busy_changed)
         
         self.init_ui()
         self.apply_dark_theme()
+        if self.gazetteer is not None:
+            self.pool.start(self.gazetteer.warm)
+        if PREFETCH_ICONS:
+            self.start_icon_worker(list(WEATHER_ICON_CODES))
     
     def init_ui(self):
         """Initialize and setup the user interface."""
@@ -176,6 +522,14 @@ class MainWindow(QMainWindow):
         self.city_input.setMinimumHeight(40)
         self.city_input.returnPressed.connect(self.fetch_weather)
         
+        # Suggestions come from the gazetteer's trie, already ranked and accent-insensitive
+        self.suggestions = QStringListModel()
+        completer = QCompleter(self.suggestions, self)
+        completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        completer.activated.connect(lambda text: self.fetch_weather())
+        self.city_input.setCompleter(completer)
+        self.city_input.textEdited.connect(self.update_suggestions)
+        
         self.search_btn = QPushButton("🔍 Search")
         self.search_btn.setFont(QFont("Arial", 11, QFont.Weight.Bold))
         self.search_btn.setMinimumHeight(40)
@@ -192,6 +546,12 @@ class MainWindow(QMainWindow):
         self.location_btn.clicked.connect(self.detect_location)
         main_layout.addWidget(self.location_btn)
         
+        self.dashboard_btn = QPushButton("🗺️ Multi-City Dashboard")
+        self.dashboard_btn.setFont(QFont("Arial", 11))
+        self.dashboard_btn.setMinimumHeight(40)
+        self.dashboard_btn.clicked.connect(self.open_dashboard)
+        main_layout.addWidget(self.dashboard_btn)
+        
         unit_layout = QHBoxLayout()
         unit_label = QLabel("Temperature Unit:")
         unit_label.setFont(QFont("Arial", 11))
@@ -260,6 +620,7 @@ class MainWindow(QMainWindow):
         main_layout.addStretch()
         
         self.weather_container.hide()
+        self.update_cache_status()
     
     def apply_dark_theme(self):
         """Apply modern dark mode styling using QSS."""
@@ -331,39 +692,53 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Input Error", "Please enter a city name.")
             return
         
-        self.set_ui_enabled(False)
-        
-        self.worker = WeatherWorker(self.api_key)
-        self.worker.set_city(city)
-        
-        self.worker.weather_fetched.connect(self.display_weather)
-        self.worker.error_occurred.connect(self.handle_error)
-        self.worker.finished.connect(lambda: self.set_ui_enabled(True))
-        self.worker.start()
+        # Input stays enabled: a new search simply supersedes the running one.
+        # Known cities are resolved locally, so the API is always asked by coordinates.
+        self.coordinator.request(self.engine.parse_query(city))
+    
+    def update_suggestions(self, text: str):
+        if self.gazetteer is not None:
+            self.suggestions.setStringList([self.gazetteer.label(i) for i in self.gazetteer.complete(text)])
     
     def detect_location(self):
         """Detect user location and fetch weather data."""
+        cached = self.location_cache.get(LocationWorker.CACHE_KEY)
+        if cached is not None:
+            self.on_location_detected(cached["lat"], cached["lon"], cached["city"])
+            return
+        
         self.set_ui_enabled(False)
         
-        self.location_worker = LocationWorker()
+        self.location_worker = LocationWorker(self.location_cache)
         
         self.location_worker.location_detected.connect(self.on_location_detected)
         self.location_worker.error_occurred.connect(self.handle_error)
         self.location_worker.finished.connect(lambda: self.set_ui_enabled(True))
         
-        self.location_worker.start()
+        self.pool.start(self.location_worker)
+    
+    def open_dashboard(self):
+        """Show the multi-city dashboard, creating it on first use."""
+        if self.dashboard is None:
+            engine = WeatherEngine(
+                self.api_key, cache=self.cache, gazetteer=self.gazetteer,
+                client=WeatherClient(self.api_key, pool_size=DASHBOARD_MAX_CONCURRENCY)
+            )
+            self.dashboard = DashboardWindow(engine)
+            self.dashboard.setStyleSheet(self.styleSheet())
+        self.dashboard.show()
+        self.dashboard.raise_()
     
     def on_location_detected(self, lat: float, lon: float, city: str):
         """Handle successful location detection."""
         self.city_input.setText(city)
-        
-        self.worker = WeatherWorker(self.api_key)
-        self.worker.set_coordinates(lat, lon)
-        
-        self.worker.weather_fetched.connect(self.display_weather)
-        self.worker.error_occurred.connect(self.handle_error)
-        
-        self.worker.start()
+        self.coordinator.request({"lat": lat, "lon": lon}, debounce=False)
+    
+    def on_busy_changed(self, busy: bool):
+        if busy:
+            self.statusBar().showMessage("Fetching weather...")
+        else:
+            self.update_cache_status()
     
     def display_weather(self, data: Dict[str, Any]):
         """
@@ -386,6 +761,15 @@ class MainWindow(QMainWindow):
         
         self.weather_container.show()
     
+    def update_cache_status(self):
+        """Show the cache and request coordinator counters in the status bar."""
+        stats = self.cache.stats()
+        superseded = self.coordinator.cancelled + self.coordinator.ignored
+        self.statusBar().showMessage(
+            f"Cache: {stats['hits']} hits, {stats['misses']} misses | "
+            f"{self.coordinator.merged} merged, {superseded} superseded"
+        )
+    
     def update_temperature_display(self):
         """Update temperature display based on selected unit."""
         if not self.weather_data:
@@ -403,21 +787,34 @@ class MainWindow(QMainWindow):
         self.temp_label.setText(f"{temp:.1f}{unit}")
     
     def load_weather_icon(self, icon_code: str):
-        """Load weather icon from OpenWeatherMap."""
-        try:
-            icon_url = f"http://openweathermap.org/img/wn/{icon_code}@2x.png"
-            response = requests.get(icon_url, timeout=5)
-            
-            if response.status_code == 200:
-                pixmap = QPixmap()
-                pixmap.loadFromData(response.content)
-                self.icon_label.setPixmap(pixmap.scaled(
-                    100, 100,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                ))
-        except Exception as e:
-            print(f"Failed to load icon: {e}")
+        """Show the icon from memory, or load it in the background."""
+        self.wanted_icon = icon_code
+        pixmap = self.icon_cache.get(icon_code)
+        if pixmap is not None:
+            self.icon_label.setPixmap(pixmap)
+            return
+        self.icon_label.clear()
+        self.start_icon_worker([icon_code])
+    
+    def start_icon_worker(self, icon_codes: list):
+        worker = IconWorker(icon_codes, self.client.session)
+        worker.signals.icon_loaded.connect(self.on_icon_loaded)
+        worker.signals.icon_failed.connect(self.on_icon_failed)
+        self.pool.start(worker)
+    
+    def on_icon_loaded(self, icon_code: str, image: QImage):
+        """Cache the decoded icon, and show it if it is the one being waited for."""
+        pixmap = QPixmap.fromImage(image).scaled(
+            100, 100,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+        self.icon_cache[icon_code] = pixmap
+        if icon_code == self.wanted_icon:
+            self.icon_label.setPixmap(pixmap)
+    
+    def on_icon_failed(self, icon_code: str):
+        if icon_code == self.wanted_icon:
             self.icon_label.setText("🌤️")
             self.icon_label.setFont(QFont("Arial", 48))
     
@@ -0,0 +1,41 @@
+import hashlib
+import os
+import stat
+
+from werkzeug.security import safe_join
+
+
+class StaticFingerprints:
+    """
+    Content hashes of static files, for cache-busting URLs. A file is
+    hashed the first time it is asked for and again only when its
+    modification time changes.
+    """
+
+    def __init__(self, static_folder, length=12):
+        self.static_folder = static_folder
+        self.length = length
+        self._hashes = {}  # filename -> (mtime, digest)
+
+    def __call__(self, filename):
+        """The file's fingerprint, or None if it is not a regular file inside the static folder."""
+        # The name comes from the request URL: never follow it out of the folder
+        path = safe_join(self.static_folder, filename)
+        if path is None:
+            return None
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(info.st_mode):
+            return None
+        cached = self._hashes.get(filename)
+        if cached is not None and cached[0] == info.st_mtime_ns:
+            return cached[1]
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()[:self.length]
+        self._hashes[filename] = (info.st_mtime_ns, digest)
+        return digest
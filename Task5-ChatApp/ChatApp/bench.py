@@ -0,0 +1,349 @@
+"""
+Load generator and latency benchmark for the chat server.
+
+Starts the server in a subprocess, signs up and logs in synthetic users
+through the normal HTTP routes, spreads them across rooms and has every
+user send messages at a fixed rate. Reports fan-out latency percentiles,
+throughput, connect times, server RSS and server CPU per message as JSON,
+along with the bytes and encode cost of one message in each wire format.
+
+    python bench.py --users 50 --rooms 5 --rate 1 --duration 20 --async-mode threading
+    python bench.py --format msgpack --output msgpack.json
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+BENCH_PREFIX = "bench "
+SAMPLE_MESSAGES = ["ok", "see you at the standup in five minutes", "lorem ipsum dolor sit amet " * 10]
+
+
+def percentiles(values, points=(50, 95, 99)):
+    if not values:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        result[f"p{p}"] = ordered[index]
+    return result
+
+
+def read_rss(pid):
+    """Resident set size of `pid` in bytes, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def read_cpu_seconds(pid):
+    """User plus system CPU time of `pid`, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            # Fields after the parenthesised command name; utime and stime are 14 and 15
+            fields = stat.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def sample_message(i):
+    return {"name": f"bench{i % 50}", "message": f"{SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)]} #{i}",
+            "time": "12:34", "avatar": i % 8, "seq": i}
+
+
+def wire_frames(content, fmt):
+    """The WebSocket messages Socket.IO sends for one "message" event in `fmt`."""
+    import wire
+    from socketio import packet
+
+    frames = packet.Packet(packet.EVENT, data=["message", wire.encode(content, fmt)]).encode()
+    # Engine.IO prefixes text messages with "4"; binary attachments go as they are
+    return [b"4" + frame.encode() if isinstance(frame, str) else frame
+            for frame in (frames if isinstance(frames, list) else [frames])]
+
+
+def wire_costs(repeat=2000):
+    """
+    Bytes on the wire and encode CPU for one chat message in each format,
+    raw and with permessage-deflate (one compressor per connection, with
+    context takeover, as browsers negotiate it).
+    """
+    import wire
+
+    report = {}
+    for fmt in wire.available_formats():
+        contents = [sample_message(i) for i in range(repeat)]
+        wire_frames(contents[0], fmt)  # warm up imports and caches
+        start = time.process_time()
+        encoded = [wire_frames(content, fmt) for content in contents]
+        encode_seconds = time.process_time() - start
+
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        deflated = 0
+        start = time.process_time()
+        for frames in encoded:
+            for frame in frames:
+                # The 4 byte deflate tail is stripped on the wire (RFC 7692)
+                deflated += len(compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+        deflate_seconds = time.process_time() - start
+
+        # Plus a 2 byte WebSocket header per frame at these sizes
+        headers = sum(2 * len(frames) for frames in encoded)
+        report[fmt] = {
+            "frames_per_message": sum(len(frames) for frames in encoded) / repeat,
+            "bytes_per_message": (sum(len(f) for frames in encoded for f in frames) + headers) / repeat,
+            "deflated_bytes_per_message": (deflated + headers) / repeat,
+            "encode_us_per_message": encode_seconds / repeat * 1e6,
+            "deflate_us_per_message": deflate_seconds / repeat * 1e6,
+        }
+    return report
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(args):
+    """Run the chat server in this process with limits opened up for load testing."""
+    if args.async_mode == "eventlet":
+        import eventlet
+        eventlet.monkey_patch()
+    elif args.async_mode == "gevent":
+        from gevent import monkey
+        monkey.patch_all()
+    os.environ["CHAT_ASYNC_MODE"] = args.async_mode
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    import main
+
+    main.session_limiter.rate = main.session_limiter.burst = args.session_rate
+    main.room_limiter.rate = main.room_limiter.burst = args.room_rate
+    if args.no_coalesce:
+        main.coalescer = None
+    main.socketio.run(main.app, host="127.0.0.1", port=args.port, allow_unsafe_werkzeug=True)
+
+
+class SyntheticUser:
+    def __init__(self, base_url, name, transports, wire_format):
+        import requests
+        import socketio
+
+        self.base_url = base_url
+        self.name = name
+        self.transports = transports
+        self.wire_format = wire_format
+        self.http = requests.Session()
+        self.client = socketio.Client(reconnection=False)
+        self.latencies = []
+        self.received = 0
+        self.payload_bytes = 0
+        self.batches = 0
+        self.sent = 0
+        self.connect_time = None
+        self.client.on("message", self.on_message)
+        self.client.on("batch", self.on_batch)
+
+    def on_message(self, data):
+        self.record(data)
+
+    def on_batch(self, data):
+        self.record(data)
+        self.batches += 1
+
+    def record(self, frame):
+        """
+        Count the bench messages in one received frame (a message, or a
+        batch of them) and their share of its payload size.
+        """
+        import wire
+
+        size = len(frame) if isinstance(frame, bytes) else wire.encoded_size(frame, wire.JSON)
+        messages = wire.decode(frame)
+        if isinstance(messages, dict):
+            messages = [messages]
+        for content in messages:
+            text = content.get("message", "") if isinstance(content, dict) else ""
+            if text.startswith(BENCH_PREFIX):
+                self.latencies.append(time.time() - float(text[len(BENCH_PREFIX):]))
+                self.received += 1
+                self.payload_bytes += size / len(messages)
+
+    def sign_in(self):
+        credentials = {"name": self.name, "password": "bench-password"}
+        self.http.post(f"{self.base_url}/signup", data=credentials)
+        response = self.http.post(f"{self.base_url}/", data=credentials)
+        response.raise_for_status()
+
+    def create_room(self):
+        response = self.http.post(f"{self.base_url}/lounge", data={"create": "1", "code": ""})
+        match = re.search(r"Chat Room: (\w+)", response.text)
+        if not match:
+            raise RuntimeError(f"{self.name} could not create a room")
+        return match.group(1)
+
+    def join_room(self, code):
+        response = self.http.post(f"{self.base_url}/lounge", data={"join": "1", "code": code})
+        if f"Chat Room: {code}" not in response.text:
+            raise RuntimeError(f"{self.name} could not join room {code}")
+
+    def connect(self):
+        cookies = "; ".join(f"{k}={v}" for k, v in self.http.cookies.items())
+        start = time.perf_counter()
+        self.client.connect(self.base_url, headers={"Cookie": cookies}, transports=self.transports,
+                            auth={"format": self.wire_format})
+        self.connect_time = time.perf_counter() - start
+
+    def send_loop(self, rate, duration):
+        interval = 1 / rate
+        deadline = time.monotonic() + duration
+        next_send = time.monotonic()
+        while time.monotonic() < deadline:
+            self.client.emit("message", {"data": f"{BENCH_PREFIX}{time.time()!r}"})
+            self.sent += 1
+            next_send += interval
+            time.sleep(max(0, next_send - time.monotonic()))
+
+    def close(self):
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+
+def run_benchmark(args):
+    port = args.port or free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    workdir = tempfile.TemporaryDirectory()
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+         "--async-mode", args.async_mode,
+         "--session-rate", str(max(args.rate * 10, 10)),
+         "--room-rate", str(max(args.rate * args.users * 10, 100))]
+        + (["--no-coalesce"] if args.no_coalesce else []),
+        cwd=workdir.name,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port, timeout=15)
+        rss_samples = [read_rss(server.pid)]
+
+        users = [SyntheticUser(base_url, f"bench{i}", args.transports, args.format) for i in range(args.users)]
+        for user in users:
+            user.sign_in()
+        codes = [users[i].create_room() for i in range(min(args.rooms, len(users)))]
+        for i, user in enumerate(users[len(codes):], start=len(codes)):
+            user.join_room(codes[i % len(codes)])
+
+        for user in users:
+            user.connect()
+
+        senders = [threading.Thread(target=u.send_loop, args=(args.rate, args.duration)) for u in users]
+        cpu_start = read_cpu_seconds(server.pid)
+        start = time.monotonic()
+        for sender in senders:
+            sender.start()
+        while any(s.is_alive() for s in senders):
+            rss_samples.append(read_rss(server.pid))
+            time.sleep(1)
+        elapsed = time.monotonic() - start
+        # Let in-flight fan-out drain before counting
+        time.sleep(args.drain)
+        rss_samples.append(read_rss(server.pid))
+        cpu_end = read_cpu_seconds(server.pid)
+        server_cpu = cpu_end - cpu_start if cpu_start is not None and cpu_end is not None else None
+
+        for user in users:
+            user.close()
+
+        latencies = [l * 1000 for u in users for l in u.latencies]
+        sent = sum(u.sent for u in users)
+        received = sum(u.received for u in users)
+        rss = [r for r in rss_samples if r is not None]
+        return {
+            "async_mode": args.async_mode,
+            "transports": args.transports,
+            "format": args.format,
+            "coalesce": not args.no_coalesce,
+            "users": args.users,
+            "rooms": len(codes),
+            "rate_per_user": args.rate,
+            "duration_s": elapsed,
+            "messages_sent": sent,
+            "messages_delivered": received,
+            "sent_per_s": sent / elapsed,
+            "delivered_per_s": received / elapsed,
+            "latency_ms": percentiles(latencies),
+            "connect_ms": percentiles([u.connect_time * 1000 for u in users]),
+            "server_rss_bytes": {"start": rss[0], "peak": max(rss), "end": rss[-1]} if rss else None,
+            "server_cpu_s": server_cpu,
+            # Includes handling the incoming message, not just encoding the fan-out
+            "server_cpu_us_per_delivered": server_cpu / received * 1e6 if server_cpu and received else None,
+            "batched_frames": sum(u.batches for u in users),
+            "payload_bytes_per_message": sum(u.payload_bytes for u in users) / received if received else None,
+            "wire": wire_costs(),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        workdir.cleanup()
+
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat server load benchmark")
+    parser.add_argument("--users", type=int, default=20, help="synthetic users")
+    parser.add_argument("--rooms", type=int, default=4, help="rooms to spread users across")
+    parser.add_argument("--rate", type=float, default=1.0, help="messages per second per user")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of sending")
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for in-flight messages")
+    parser.add_argument("--async-mode", default="threading", help="eventlet, gevent or threading")
+    parser.add_argument("--transports", nargs="+", default=["websocket"], help="socket.io client transports")
+    parser.add_argument("--format", default="json", choices=["json", "msgpack"], help="wire format clients ask for")
+    parser.add_argument("--no-coalesce", action="store_true", help="send every message in its own frame")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--session-rate", type=float, default=1000, help=argparse.SUPPRESS)
+    parser.add_argument("--room-rate", type=float, default=100000, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    report = json.dumps(run_benchmark(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import pickle
+import queue
+import re
+import sys
+import threading
+from socketio import PubSubManager
+
+
+class InProcessBus:
+    """
+    Message bus for workers living in the same process (used by tests and
+    single-process setups). Every listener gets its own queue per channel.
+
+    Like the ZeroMQ broker, it delivers every message to every listener in
+    the same order, and each listener gets its own copy.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, data):
+        payload = pickle.dumps(data)
+        # Queued under the lock, so concurrent publishes reach everyone in one order
+        with self._lock:
+            for subscriber in self._subscribers.get(channel, []):
+                subscriber.put(pickle.loads(payload))
+
+    def listen(self, channel):
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscriber)
+        try:
+            while True:
+                yield subscriber.get()
+        finally:
+            with self._lock:
+                self._subscribers[channel].remove(subscriber)
+
+
+class ZmqBus:
+    """
+    Message bus backed by ZeroMQ PUB/SUB through a forwarding broker.
+
+    The URL has the form ``zmq+tcp://host:sink_port+fanout_port``: workers
+    publish to the broker's sink port and subscribe on its fan-out port.
+    Start the broker with ``python bus.py zmq+tcp://*:5555+5556``.
+    """
+
+    def __init__(self, url="zmq+tcp://localhost:5555+5556"):
+        try:
+            from eventlet.green import zmq
+        except ImportError:
+            try:
+                import zmq
+            except ImportError:
+                raise RuntimeError('zmq package is not installed (Run "pip install pyzmq").')
+
+        self.zmq = zmq
+        self.sink_url, self.fanout_url = parse_zmq_url(url)
+        self.context = zmq.Context.instance()
+        self._pub = self.context.socket(zmq.PUB)
+        self._pub.connect(self.sink_url)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, data):
+        frames = [channel.encode(), pickle.dumps(data)]
+        with self._lock:
+            self._pub.send_multipart(frames)
+
+    def listen(self, channel):
+        sub = self.context.socket(self.zmq.SUB)
+        sub.connect(self.fanout_url)
+        sub.setsockopt(self.zmq.SUBSCRIBE, channel.encode())
+        try:
+            while True:
+                topic, payload = sub.recv_multipart()
+                if topic == channel.encode():
+                    yield pickle.loads(payload)
+        finally:
+            sub.close()
+
+
+def parse_zmq_url(url):
+    """Split ``zmq+tcp://host:p1+p2`` into the broker's sink and fan-out endpoints."""
+    match = re.match(r"^zmq\+tcp://([^:]+):(\d+)\+(\d+)$", url)
+    if not match:
+        raise ValueError(f"Unexpected zmq connection string: {url}")
+    host, sink_port, fanout_port = match.groups()
+    return f"tcp://{host}:{sink_port}", f"tcp://{host}:{fanout_port}"
+
+
+def create_bus(url):
+    """
+    Build a bus from a URL: ``memory://`` for the in-process backend,
+    ``zmq+tcp://host:p1+p2`` for ZeroMQ, or None/empty for single-worker mode.
+    """
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return InProcessBus()
+    if url.startswith("zmq+tcp://"):
+        return ZmqBus(url)
+    raise ValueError(f"Unsupported message bus: {url}")
+
+
+class BusManager(PubSubManager):
+    """
+    Socket.IO client manager that fans out emits through a pluggable bus,
+    so ``send(..., to=room)`` reaches clients connected to every worker.
+    """
+    name = "bus"
+
+    def __init__(self, bus, channel="socketio", write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.bus = bus
+
+    def _publish(self, data):
+        self.bus.publish(self.channel, data)
+
+    def _listen(self):
+        yield from self.bus.listen(self.channel)
+
+
+def run_zmq_broker(url):
+    """Forward every message from the sink port to all subscribers."""
+    import zmq
+
+    sink_url, fanout_url = parse_zmq_url(url)
+    context = zmq.Context.instance()
+    frontend = context.socket(zmq.XSUB)
+    frontend.bind(sink_url)
+    backend = context.socket(zmq.XPUB)
+    backend.bind(fanout_url)
+    print(f"Message bus broker: {sink_url} -> {fanout_url}")
+    zmq.proxy(frontend, backend)
+
+
+if __name__ == "__main__":
+    run_zmq_broker(sys.argv[1] if len(sys.argv) > 1 else "zmq+tcp://*:5555+5556")
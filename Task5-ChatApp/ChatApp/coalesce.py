@@ -0,0 +1,135 @@
+import heapq
+import math
+import threading
+import time
+from log import get_logger
+
+logger = get_logger("coalesce")
+
+
+class _RoomRate:
+    __slots__ = ("rate", "last", "pending", "flushing")
+
+    def __init__(self, now):
+        self.rate = 0.0
+        self.last = now
+        self.pending = None
+        self.flushing = False  # a batch has been taken by due() and is still being sent
+
+
+class MessageCoalescer:
+    """
+    Groups a busy room's outgoing messages into one frame per window.
+
+    Each room keeps an exponentially decaying estimate of its message
+    rate. Below `quiet_rate` messages go straight out (submit returns
+    False). Above it they are held for a window that grows from
+    `min_window` to `max_window` as the rate approaches `busy_rate`, then
+    handed to `flush(room, messages)` together. Like the RoomReaper, one
+    background task drains a heap of deadlines; it sleeps until the
+    earliest one, and `event` (a threading.Event-like factory matching the
+    async mode) wakes it when a new batch opens sooner.
+    """
+
+    def __init__(self, flush, min_window=0.01, max_window=0.05, quiet_rate=20.0, busy_rate=200.0,
+                 decay=1.0, event=threading.Event, clock=time.monotonic):
+        self.flush = flush
+        self.min_window = min_window
+        self.max_window = max_window
+        self.quiet_rate = quiet_rate
+        self.busy_rate = busy_rate
+        self.decay = decay  # seconds for the rate estimate to forget a burst
+        self.clock = clock
+        self.rooms = {}
+        self.heap = []
+        self.batches = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._wakeup = event()
+
+    def window(self, rate):
+        """Batching window for a room at `rate` messages per second; 0 means send directly."""
+        if rate < self.quiet_rate:
+            return 0.0
+        busy = min(1.0, (rate - self.quiet_rate) / (self.busy_rate - self.quiet_rate))
+        return self.min_window + (self.max_window - self.min_window) * busy
+
+    def submit(self, room, content):
+        """Queue `content` for the room's next batch. Returns False if it should be sent now."""
+        now = self.clock()
+        with self._lock:
+            state = self.rooms.get(room)
+            if state is None:
+                state = self.rooms[room] = _RoomRate(now)
+            state.rate = state.rate * math.exp((state.last - now) / self.decay) + 1 / self.decay
+            state.last = now
+            if state.pending is not None:
+                # Join the open batch, even if the room just went quiet, to keep order
+                state.pending.append(content)
+                return True
+            window = self.window(state.rate)
+            if not window and not state.flushing:
+                return False
+            # While the previous batch is still being sent even a quiet room
+            # queues, so its message cannot overtake that batch
+            state.pending = [content]
+            heapq.heappush(self.heap, (now + window, room))
+            if self.heap[0][1] == room:
+                self._wakeup.set()
+            return True
+
+    def rate(self, room):
+        """Current message rate estimate for the room."""
+        with self._lock:
+            state = self.rooms.get(room)
+            if state is None:
+                return 0.0
+            return state.rate * math.exp((state.last - self.clock()) / self.decay)
+
+    def forget(self, room):
+        """Drop a deleted room's state. Anything still pending is flushed first."""
+        with self._lock:
+            state = self.rooms.pop(room, None)
+        if state is not None and state.pending:
+            self._flush(room, state.pending)
+
+    def due(self):
+        """Take every batch whose window has closed, as (room, messages) pairs."""
+        now = self.clock()
+        ready = []
+        with self._lock:
+            while self.heap and self.heap[0][0] <= now:
+                _, room = heapq.heappop(self.heap)
+                state = self.rooms.get(room)
+                # A room whose last batch is still being sent is re-queued when that finishes
+                if state is not None and state.pending and not state.flushing:
+                    ready.append((room, state.pending))
+                    state.pending = None
+                    state.flushing = True
+        return ready
+
+    def _flush(self, room, messages):
+        self.batches += 1
+        self.coalesced += len(messages)
+        try:
+            self.flush(room, messages)
+        finally:
+            with self._lock:
+                state = self.rooms.get(room)
+                if state is not None:
+                    state.flushing = False
+                    if state.pending:
+                        heapq.heappush(self.heap, (self.clock(), room))
+
+    def run(self):
+        """Flush batches as their windows close. Runs as a background task."""
+        while True:
+            for room, messages in self.due():
+                try:
+                    self._flush(room, messages)
+                except Exception:
+                    logger.exception("failed to flush batch", room=room, messages=len(messages))
+            with self._lock:
+                self._wakeup.clear()
+                deadline = self.heap[0][0] if self.heap else None
+            self._wakeup.wait(None if deadline is None else max(0.0, deadline - self.clock()))
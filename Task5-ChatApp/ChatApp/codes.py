@@ -0,0 +1,88 @@
+import random
+from array import array
+from string import ascii_uppercase
+
+
+class RoomCodeAllocator:
+    """
+    Hands out unused room codes in constant time.
+
+    Every code in the space is numbered. `slots` is a permutation of those
+    numbers where the first `free_count` entries are free and the rest are
+    taken; `positions` maps a number back to its slot. Allocating, reserving
+    and releasing each swap one entry across the free/taken boundary.
+    """
+
+    def __init__(self, length=4, alphabet=ascii_uppercase):
+        self.length = length
+        self.alphabet = alphabet
+        self.capacity = len(alphabet) ** length
+        self.slots = array("L", range(self.capacity))
+        self.positions = array("L", range(self.capacity))
+        self.free_count = self.capacity
+
+    def encode(self, number):
+        chars = []
+        for _ in range(self.length):
+            number, index = divmod(number, len(self.alphabet))
+            chars.append(self.alphabet[index])
+        return "".join(reversed(chars))
+
+    def decode(self, code):
+        """Return the number for `code`, or None if it is outside the code space."""
+        if not isinstance(code, str) or len(code) != self.length:
+            return None
+        number = 0
+        for char in code:
+            index = self.alphabet.find(char)
+            if index < 0:
+                return None
+            number = number * len(self.alphabet) + index
+        return number
+
+    def _swap(self, a, b):
+        slots, positions = self.slots, self.positions
+        slots[a], slots[b] = slots[b], slots[a]
+        positions[slots[a]] = a
+        positions[slots[b]] = b
+
+    def allocate(self):
+        """Take a random free code. Returns None once the space is exhausted."""
+        if self.free_count == 0:
+            return None
+        slot = random.randrange(self.free_count)
+        number = self.slots[slot]
+        self.free_count -= 1
+        self._swap(slot, self.free_count)
+        return self.encode(number)
+
+    def reserve(self, code):
+        """Mark a specific code as taken (restored or replicated rooms)."""
+        number = self.decode(code)
+        if number is None or self.positions[number] >= self.free_count:
+            return False
+        self.free_count -= 1
+        self._swap(self.positions[number], self.free_count)
+        return True
+
+    def release(self, code):
+        """Return a code to the free pool once its room is gone."""
+        number = self.decode(code)
+        if number is None or self.positions[number] < self.free_count:
+            return False
+        self._swap(self.positions[number], self.free_count)
+        self.free_count += 1
+        return True
+
+    def is_taken(self, code):
+        number = self.decode(code)
+        return number is not None and self.positions[number] >= self.free_count
+
+    def stats(self):
+        allocated = self.capacity - self.free_count
+        return {
+            "capacity": self.capacity,
+            "allocated": allocated,
+            "free": self.free_count,
+            "occupancy": allocated / self.capacity,
+        }
@@ -0,0 +1,90 @@
+import sys
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+
+class MessageHistory:
+    """
+    Fixed-capacity ring buffer of room messages.
+    Every appended message is tagged with a per-room sequence number so
+    clients can page backwards with `before=<seq>`.
+    """
+
+    def __init__(self, capacity=500):
+        self.capacity = capacity
+        self.messages = deque(maxlen=capacity)
+        self.next_seq = 1
+
+    def __len__(self):
+        return len(self.messages)
+
+    @property
+    def first_seq(self):
+        """Sequence number of the oldest message still held, or next_seq if empty."""
+        if not self.messages:
+            return self.next_seq
+        return self.messages[0]["seq"]
+
+    @property
+    def last_seq(self):
+        """Sequence number of the newest message, or 0 if nothing was appended yet."""
+        return self.next_seq - 1
+
+    def append(self, content):
+        content["seq"] = self.next_seq
+        self.next_seq += 1
+        self.messages.append(content)
+        return content
+
+    def restore(self, messages):
+        """
+        Seed the buffer from persisted messages, continuing their sequence.
+        Messages older than what is already held are skipped, so restoring
+        from several sources does not duplicate. Returns the ones added.
+        """
+        added = [content for content in messages if content["seq"] >= self.next_seq]
+        self.messages.extend(added)
+        if self.messages:
+            self.next_seq = self.messages[-1]["seq"] + 1
+        return added
+
+    def page(self, before=None, limit=50):
+        """
+        Return up to `limit` messages with seq < `before`, oldest first.
+        When `before` is None the latest page is returned.
+        """
+        if before is None or before > self.next_seq:
+            before = self.next_seq
+        # Sequence numbers are increasing (though not always contiguous after
+        # a restore), so the slice end is found by bisection.
+        end = bisect_left(self.messages, before, key=lambda m: m["seq"])
+        start = max(0, end - limit)
+        return [self.messages[i] for i in range(start, end)]
+
+    def find(self, seq):
+        """The message numbered `seq`, or None if it is not held."""
+        i = bisect_left(self.messages, seq, key=lambda m: m["seq"])
+        if i < len(self.messages) and self.messages[i]["seq"] == seq:
+            return self.messages[i]
+        return None
+
+    def since(self, seq):
+        """
+        Return every held message with seq > `seq`, oldest first, and whether
+        that covers the whole gap (False if some of it was already evicted).
+        """
+        start = bisect_right(self.messages, seq, key=lambda m: m["seq"])
+        complete = not self.messages or seq >= self.first_seq - 1
+        return [self.messages[i] for i in range(start, len(self.messages))], complete
+
+    def memory_bytes(self):
+        """Approximate memory held by the buffer: the deque, message dicts and their values."""
+        total = sys.getsizeof(self.messages)
+        for content in self.messages:
+            total += sys.getsizeof(content)
+            total += sum(sys.getsizeof(value) for value in content.values())
+        return total
+
+    def has_more(self, before):
+        """True if messages older than `before` are still held."""
+        return bool(self.messages) and before is not None and before > self.first_seq
@@ -0,0 +1,60 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Lets callers pass fields as keyword arguments: log.info("joined", room=code)."""
+
+    RESERVED = ("exc_info", "stack_info", "stacklevel", "extra")
+
+    def process(self, msg, kwargs):
+        fields = {k: kwargs.pop(k) for k in list(kwargs) if k not in self.RESERVED}
+        kwargs.setdefault("extra", {})["fields"] = fields
+        return msg, kwargs
+
+
+def setup_logging(level="INFO", stream=None):
+    """
+    Route the "chat" loggers through a queue so handlers only enqueue;
+    a listener thread formats and writes the records.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger("chat")
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    return StructuredLogger(logging.getLogger(f"chat.{name}"), {})
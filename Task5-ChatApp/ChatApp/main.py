@@ -1,15 +1,108 @@
-from flask import Flask, render_template, request, session, redirect, url_for
-from flask_socketio import join_room, leave_room, send, SocketIO
+from flask import Flask, render_template, request, session, redirect, url_for, jsonify, abort
+from markupsafe import Markup
+from jinja2 import FileSystemBytecodeCache
+from flask_socketio import join_room, leave_room, send, emit, SocketIO
 import random
-from string import ascii_uppercase
+from assets import StaticFingerprints
 from datetime import datetime
+import atexit
+import hashlib
+import os
+import time
+from bus import BusManager, create_bus
+from coalesce import MessageCoalescer
+from log import get_logger, setup_logging
+from metrics import MetricsRegistry
+from passwords import PasswordHasher
+from ratelimit import RateLimiter, SlowConsumerGuard
+from reaper import RoomReaper
+from search import RoomIndex, resolve_hits
+from snapshot import StateSnapshotter
+from state import SharedState
+from store import MessageStore
+from userstore import UserStore
+import wire
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "hjhjsdahhds"
-socketio = SocketIO(app)
-
-rooms = {}
-users = {}
+app.config["HISTORY_CAPACITY"] = 500
+app.config["HISTORY_PAGE_SIZE"] = 50
+app.config["SEARCH_INDEX_MESSAGES"] = 50000  # messages indexed per room for search
+app.config["SEARCH_PAGE_SIZE"] = 20
+app.config["MESSAGE_DB"] = "chat_messages.db"
+app.config["MESSAGE_FLUSH_BATCH"] = 100
+app.config["MESSAGE_FLUSH_INTERVAL"] = 0.2  # seconds
+app.config["USER_DB"] = "chat_users.db"
+app.config["USER_CACHE_SIZE"] = 10000
+app.config["USER_SEARCH_LIMIT"] = 50
+app.config["ROOM_GRACE_PERIOD"] = 5  # seconds an empty room survives before deletion
+app.config["RESTORE_GRACE_PERIOD"] = 60  # seconds restored rooms wait for their clients to reconnect
+app.config["SNAPSHOT_PATH"] = "chat_state.snapshot"
+app.config["SNAPSHOT_INTERVAL"] = 30  # seconds
+app.config["SESSION_MESSAGE_RATE"] = 2  # messages per second, per connection
+app.config["SESSION_MESSAGE_BURST"] = 10
+app.config["ROOM_MESSAGE_RATE"] = 50  # messages per second, per room
+app.config["ROOM_MESSAGE_BURST"] = 100
+app.config["MAX_OUTBOUND_QUEUE"] = 100  # packets queued for one client before it counts as slow
+app.config["SLOW_CONSUMER_POLICY"] = "drop"  # or "disconnect"
+# Busy rooms batch outgoing messages into one frame per window. Rooms below the
+# quiet rate send every message directly; the window grows with the rate up to
+# the max. Set COALESCE_MAX_WINDOW to 0 to always send directly.
+app.config["COALESCE_MIN_WINDOW"] = 0.01  # seconds
+app.config["COALESCE_MAX_WINDOW"] = 0.05  # seconds
+app.config["COALESCE_QUIET_RATE"] = 20  # messages per second, per room
+app.config["COALESCE_BUSY_RATE"] = 200  # messages per second, per room
+# Cross-process bus for multi-worker mode, e.g. "zmq+tcp://localhost:5555+5556".
+# Leave empty to run as a single worker.
+app.config["MESSAGE_BUS"] = os.environ.get("CHAT_MESSAGE_BUS", "")
+app.config["STATE_SYNC_TIMEOUT"] = 2  # seconds a starting worker waits for the others' rooms
+# "eventlet", "threading", ... or None to let Flask-SocketIO pick the best available
+app.config["ASYNC_MODE"] = os.environ.get("CHAT_ASYNC_MODE") or None
+app.config["LOG_LEVEL"] = os.environ.get("CHAT_LOG_LEVEL", "INFO")
+# Format the room page asks for: "json", or "msgpack" for binary frames. Clients
+# that ask for nothing (or for a format this server lacks) always get JSON.
+app.config["WIRE_FORMAT"] = os.environ.get("CHAT_WIRE_FORMAT", "json")
+# Directory for compiled templates; empty disables the bytecode cache (handy while editing them)
+app.config["JINJA_CACHE_DIR"] = os.environ.get("CHAT_JINJA_CACHE_DIR", "")
+app.config["STATIC_MAX_AGE"] = 365 * 24 * 60 * 60  # seconds, for content-hashed static URLs
+
+setup_logging(app.config["LOG_LEVEL"])
+if app.config["JINJA_CACHE_DIR"]:
+    os.makedirs(app.config["JINJA_CACHE_DIR"], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config["JINJA_CACHE_DIR"])
+logger = get_logger("app")
+metrics = MetricsRegistry()
+handler_latency = metrics.histogram(
+    "chat_handler_latency_seconds", "Socket.IO event handler latency.", label="event"
+)
+
+bus = create_bus(app.config["MESSAGE_BUS"])
+if bus is not None:
+    socketio = SocketIO(app, async_mode=app.config["ASYNC_MODE"], client_manager=BusManager(bus))
+else:
+    socketio = SocketIO(app, async_mode=app.config["ASYNC_MODE"])
+
+def thread_offload():
+    """Run blocking work (the KDF, snapshot writes) on a real OS thread so only the calling green thread waits."""
+    if socketio.async_mode == "eventlet":
+        from eventlet import tpool
+        return tpool.execute
+    if socketio.async_mode == "gevent":
+        import gevent
+        return lambda fn, *args: gevent.get_hub().threadpool.apply(fn, args)
+    return None
+
+hasher = PasswordHasher(offload=thread_offload())
+
+state = SharedState(
+    bus,
+    history_capacity=app.config["HISTORY_CAPACITY"],
+    index_capacity=app.config["SEARCH_INDEX_MESSAGES"],
+    users=UserStore(app.config["USER_DB"], cache_size=app.config["USER_CACHE_SIZE"]),
+)
+# Read by the handlers below. Mutate them through `state`.
+rooms = state.rooms
+users = state.users
 PROFILE_PICS = [
     '<svg viewBox="0 0 100 100" xmlns="http://www.w3.org/2000/svg"><circle cx="50" cy="50" r="50" fill="#ff7f50"/></svg>',
     '<svg viewBox="0 0 100 100" xmlns="http://www.w3.org/2000/svg"><circle cx="50" cy="50" r="50" fill="#6495ed"/></svg>',
@@ -17,23 +110,156 @@ PROFILE_PICS = [
     '<svg viewBox="0 0 100 100" xmlns="http://www.w3.org/2000/svg"><circle cx="50" cy="50" r="50" fill="#ee82ee"/></svg>',
     '<svg viewBox="0 0 100 100" xmlns="http://www.w3.org/2000/svg"><circle cx="50" cy="50" r="50" fill="#ffdab9"/></svg>',
 ]
-
-def generate_unique_code(length):
-    while True:
-        code = ""
-        for _ in range(length):
-            code += random.choice(ascii_uppercase)
-
-        if code not in rooms:
-            break
-
-    return code
-
-def delayed_delete(room_code):
-    socketio.sleep(5)
-    if room_code in rooms and rooms[room_code]["members"] <= 0:
-        print(f"Deleting empty room {room_code} after delay.")
-        del rooms[room_code]
+AVATAR_ETAGS = [hashlib.sha1(pic.encode()).hexdigest()[:16] for pic in PROFILE_PICS]
+AVATAR_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+
+@app.template_global()
+def avatar_svg(avatar_id):
+    """Inline SVG for server-rendered pages; chat messages use /avatar/<id> instead."""
+    return Markup(PROFILE_PICS[avatar_id])
+
+message_store = MessageStore(
+    app.config["MESSAGE_DB"],
+    batch_size=app.config["MESSAGE_FLUSH_BATCH"],
+    flush_interval=app.config["MESSAGE_FLUSH_INTERVAL"],
+)
+
+def restore_rooms():
+    """Rebuild recent room history from the message log."""
+    for room_code, (instance, messages) in message_store.load_recent(app.config["HISTORY_CAPACITY"]).items():
+        if not state.restore_room(room_code, messages, instance):
+            continue
+        # Nobody is in a restored room yet; reap it unless someone rejoins
+        reaper.schedule(room_code, app.config["RESTORE_GRACE_PERIOD"])
+    logger.info("restored rooms from the message log", rooms=len(rooms))
+
+def restore_snapshot():
+    """Bring back rooms from the last state snapshot, before the message log tops them up."""
+    data = snapshots.load()
+    if data is None:
+        return
+    for room_code in snapshots.restore(data, deleted=message_store.deleted_rooms()):
+        reaper.schedule(room_code, app.config["RESTORE_GRACE_PERIOD"])
+    logger.info("restored state snapshot", rooms=len(data["rooms"]), age=round(time.time() - data["taken_at"], 1))
+
+def index_from_log():
+    """
+    Index what restored rooms said before their history buffer starts, so
+    search covers SEARCH_INDEX_MESSAGES and not just the restored history.
+    """
+    for room_code, _ in rooms.snapshot():
+        with rooms.locked(room_code) as current:
+            if current is None:
+                continue
+            instance = current.instance
+            first_seq = current.messages.first_seq
+            room_messages = list(current.messages.messages)
+        index = RoomIndex(app.config["SEARCH_INDEX_MESSAGES"])
+        older = app.config["SEARCH_INDEX_MESSAGES"] - len(room_messages)
+        for content in message_store.iter_messages(instance, first_seq, max(0, older)):
+            index.add(content)
+        with rooms.locked(room_code) as current:
+            if current is None or current.instance != instance:
+                continue
+            for content in room_messages:
+                index.add(content)
+            # Messages that arrived while the log was read
+            for content in current.messages.since(room_messages[-1]["seq"] if room_messages else 0)[0]:
+                index.add(content)
+            current.index = index
+
+def delete_if_empty(room_code):
+    if forget_room(room_code):
+        logger.info("deleted empty room", room=room_code)
+
+def forget_room(room_code):
+    """Delete the room if it is empty, along with everything kept about it. Returns False if it was kept."""
+    instance = state.delete_room(room_code, only_if_empty=True)
+    if instance is None:
+        return False
+    message_store.delete_room(instance)
+    room_limiter.forget(room_code)
+    if coalescer is not None:
+        coalescer.forget(room_code)
+    return True
+
+reaper = RoomReaper(delete_if_empty, grace_period=app.config["ROOM_GRACE_PERIOD"], sleep=socketio.sleep)
+snapshots = StateSnapshotter(
+    state,
+    app.config["SNAPSHOT_PATH"],
+    interval=app.config["SNAPSHOT_INTERVAL"],
+    sleep=socketio.sleep,
+    offload=thread_offload(),
+)
+session_limiter = RateLimiter(app.config["SESSION_MESSAGE_RATE"], app.config["SESSION_MESSAGE_BURST"])
+room_limiter = RateLimiter(app.config["ROOM_MESSAGE_RATE"], app.config["ROOM_MESSAGE_BURST"])
+slow_consumers = SlowConsumerGuard(app.config["MAX_OUTBOUND_QUEUE"], app.config["SLOW_CONSUMER_POLICY"])
+
+def outbound_queue_sizes(room):
+    """Yield (sid, queued packets) for every client of `room` connected to this worker."""
+    server = socketio.server
+    for sid, eio_sid in server.manager.get_participants("/", room):
+        eio_socket = server.eio.sockets.get(eio_sid)
+        if eio_socket is not None:
+            yield sid, eio_socket.queue.qsize()
+
+def fan_out(event, payload, room):
+    """
+    Emit to the room, skipping (or disconnecting) clients that cannot keep up.
+    Uses the server object, not the request context, so background tasks can call it.
+    """
+    skip, slow = slow_consumers.check(outbound_queue_sizes(room))
+    # Encoded once per wire format, not once per client
+    for fmt in wire.available_formats():
+        socketio.emit(event, wire.encode(payload, fmt), to=wire.format_room(room, fmt), skip_sid=skip or None)
+    for sid in slow:
+        socketio.server.disconnect(sid, namespace="/")
+
+def deliver_message(room, instance, content):
+    """Persist and send a message once it has its sequence number (see SharedState.add_message)."""
+    message_store.append(room, instance, content)
+    broadcast(content, room)
+    logger.debug("message", user=content["name"], room=room, seq=content["seq"])
+
+state.on_message = deliver_message
+
+def broadcast(content, room):
+    """Send a chat message to the room, batched with others while the room is busy."""
+    if coalescer is None or not coalescer.submit(room, content):
+        fan_out("message", content, room)
+
+if app.config["COALESCE_MAX_WINDOW"]:
+    coalescer = MessageCoalescer(
+        lambda room, messages: fan_out("batch", messages, room),
+        min_window=app.config["COALESCE_MIN_WINDOW"],
+        max_window=app.config["COALESCE_MAX_WINDOW"],
+        quiet_rate=app.config["COALESCE_QUIET_RATE"],
+        busy_rate=app.config["COALESCE_BUSY_RATE"],
+        event=socketio.server.eio.create_event,
+    )
+else:
+    coalescer = None
+
+static_fingerprints = StaticFingerprints(app.static_folder)
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    """Add a content hash to static URLs, so they can be cached forever and still change."""
+    if endpoint == "static" and "v" not in values:
+        digest = static_fingerprints(values.get("filename", ""))
+        if digest:
+            values["v"] = digest
+
+@app.after_request
+def cache_static(response):
+    version = request.args.get("v")
+    if (request.endpoint == "static" and version and response.status_code in (200, 304)
+            and version == static_fingerprints(request.view_args["filename"])):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config["STATIC_MAX_AGE"]
+        response.cache_control.immutable = True
+    return response
 
 @app.route("/", methods=["POST", "GET"])
 def login():
@@ -45,7 +271,8 @@ def login():
         if not name or not password:
             return render_template("login.html", error="Please enter a name and password.", name=name)
 
-        if name not in users or users[name]["password"] != password:
+        user = users.get(name)
+        if user is None or not hasher.verify(password, user["password"]):
             return render_template("login.html", error="Invalid credentials.", name=name)
 
         session["name"] = name
@@ -62,18 +289,20 @@ def signup():
         if not name or not password:
             return render_template("signup.html", error="Please enter a name and password.", name=name)
 
-        if name in users:
+        if users.get(name) is not None:
             return render_template("signup.html", error="Name already taken.", name=name)
 
-        users[name] = {"password": password, "profile_pic": random.choice(PROFILE_PICS)}
+        record = {"password": hasher.hash(password), "avatar": random.randrange(len(PROFILE_PICS))}
+        if not state.add_user(name, record):
+            return render_template("signup.html", error="Name already taken.", name=name)
         return redirect(url_for("login"))
 
     return render_template("signup.html")
 
 @app.route("/lounge", methods=["POST", "GET"])
 def lounge():
-    name = session.get("name")
-    if not name:
+    user = users.get(session.get("name"))
+    if user is None:
         return redirect(url_for("login"))
 
     if request.method == "POST":
@@ -82,19 +311,20 @@ def lounge():
         create = request.form.get("create", False)
 
         if join != False and not code:
-            return render_template("lounge.html", error="Please enter a room code.", user=users.get(name))
+            return render_template("lounge.html", error="Please enter a room code.", user=user)
 
         room = code
         if create != False:
-            room = generate_unique_code(4)
-            rooms[room] = {"members": 0, "messages": [], "names": set()}
+            room = state.create_room(sleep=socketio.sleep)
+            if room is None:
+                return render_template("lounge.html", error="No free room codes, please try again later.", user=user)
         elif code not in rooms:
-            return render_template("lounge.html", error="Room does not exist.", user=users.get(name))
+            return render_template("lounge.html", error="Room does not exist.", user=user)
 
         session["room"] = room
         return redirect(url_for("room"))
 
-    return render_template("lounge.html", user=users.get(name))
+    return render_template("lounge.html", user=user)
 
 @app.route("/logout")
 def logout():
@@ -103,17 +333,43 @@ def logout():
 
 @app.route("/account", methods=["GET", "POST"])
 def account():
-    if "name" not in session:
+    name = session.get("name")
+    user = users.get(name)
+    if user is None:
         return redirect(url_for("login"))
 
     if request.method == "POST":
-        name = session["name"]
         pic_index = int(request.form.get("profile_pic"))
         if 0 <= pic_index < len(PROFILE_PICS):
-            users[name]["profile_pic"] = PROFILE_PICS[pic_index]
+            state.update_user(name, avatar=pic_index)
         return redirect(url_for("account"))
 
-    return render_template("account.html", users=users, profile_pics=PROFILE_PICS)
+    return render_template("account.html", user=user, profile_pics=PROFILE_PICS)
+
+@app.route("/users/search")
+def search_users():
+    if users.get(session.get("name")) is None:
+        return jsonify({"error": "Not logged in."}), 403
+
+    prefix = request.args.get("q", "")
+    after = request.args.get("after") or None
+    limit = request.args.get("limit", 20, type=int)
+    limit = max(1, min(limit, app.config["USER_SEARCH_LIMIT"]))
+
+    matches = users.search(prefix, after=after, limit=limit)
+    next_after = matches[-1]["name"] if len(matches) == limit else None
+    return jsonify({"users": matches, "next": next_after})
+
+@app.route("/avatar/<int:avatar_id>")
+def avatar(avatar_id):
+    if not 0 <= avatar_id < len(PROFILE_PICS):
+        abort(404)
+
+    response = app.response_class(PROFILE_PICS[avatar_id], mimetype="image/svg+xml")
+    response.set_etag(AVATAR_ETAGS[avatar_id])
+    response.cache_control.public = True
+    response.cache_control.max_age = AVATAR_MAX_AGE
+    return response.make_conditional(request)
 
 @app.route("/room")
 def room():
@@ -121,13 +377,104 @@ def room():
         return redirect(url_for("lounge"))
 
     room_code = session.get("room")
-    return render_template("room.html", code=room_code, messages=rooms[room_code]["messages"])
+    with rooms.locked(room_code) as current:
+        if current is None:
+            return redirect(url_for("lounge"))
+        history = current.messages
+        messages = history.page(limit=app.config["HISTORY_PAGE_SIZE"])
+        # Older messages than the buffer holds are paged in from the message log
+        has_more = bool(messages) and messages[0]["seq"] > 1
+        last_seq = history.last_seq
+    return render_template(
+        "room.html", code=room_code, messages=messages, has_more=has_more, last_seq=last_seq,
+        wire_format=wire.negotiate(app.config["WIRE_FORMAT"]),
+    )
+
+@app.route("/room/history")
+def room_history():
+    room_code = session.get("room")
+    if "name" not in session or room_code not in rooms:
+        return jsonify({"error": "Not in a room."}), 403
+
+    before = request.args.get("before", type=int)
+    limit = request.args.get("limit", app.config["HISTORY_PAGE_SIZE"], type=int)
+    limit = max(1, min(limit, app.config["HISTORY_PAGE_SIZE"]))
+
+    with rooms.locked(room_code) as current:
+        if current is None:
+            return jsonify({"error": "Not in a room."}), 403
+        instance = current.instance
+        first_seq = current.messages.first_seq
+        messages = current.messages.page(before=before, limit=limit)
+    if len(messages) < limit:
+        # Past the start of the buffer: the rest comes from the message log
+        older_than = messages[0]["seq"] if messages else min(before or first_seq, first_seq)
+        messages = message_store.page(instance, older_than, limit - len(messages)) + messages
+    has_more = bool(messages) and messages[0]["seq"] > 1
+    return jsonify({"messages": messages, "has_more": has_more})
+
+@app.route("/room/search")
+def room_search():
+    room_code = session.get("room")
+    if "name" not in session or room_code not in rooms:
+        return jsonify({"error": "Not in a room."}), 403
+
+    query = request.args.get("q", "").strip()
+    before = request.args.get("before", type=int)
+    limit = request.args.get("limit", app.config["SEARCH_PAGE_SIZE"], type=int)
+    limit = max(1, min(limit, app.config["SEARCH_PAGE_SIZE"]))
+
+    with rooms.locked(room_code) as current:
+        if current is None:
+            return jsonify({"error": "Not in a room."}), 403
+        instance = current.instance
+        candidates = current.index.candidates(query, before=before, limit=limit)
+    # Outside the lock: older hits are read from the message log
+    hits, next_before = resolve_hits(candidates, lambda seqs: fetch_messages(room_code, instance, seqs), limit)
+    return jsonify({"hits": hits, "next": next_before, "truncated": candidates.truncated})
+
+def fetch_messages(room_code, instance, seqs):
+    """Return {seq: message}, from the room's history buffer when it still holds them, else from the log."""
+    found = {}
+    with rooms.locked(room_code) as current:
+        if current is not None and current.instance == instance:
+            for seq in seqs:
+                content = current.messages.find(seq)
+                if content is not None:
+                    found[seq] = content
+    missing = [seq for seq in seqs if seq not in found]
+    found.update(message_store.fetch(instance, missing))
+    return found
+
+@app.route("/stats")
+def stats():
+    return jsonify({
+        "rooms": len(rooms),
+        "rooms_pending_reap": reaper.pending_count(),
+        "room_codes": state.codes.stats(),
+        "fanout": {
+            "throttled_sessions": session_limiter.throttled,
+            "throttled_rooms": room_limiter.throttled,
+            "dropped_slow_consumers": slow_consumers.dropped,
+            "disconnected_slow_consumers": slow_consumers.disconnected,
+        },
+    })
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @socketio.on("message")
+@metrics.timed(handler_latency, "message")
 def message(data):
     room = session.get("room")
     name = session.get("name")
-    if room not in rooms or name not in users:
+    user = users.get(name)
+    if room not in rooms or user is None:
+        return
+
+    if not session_limiter.allow(request.sid) or not room_limiter.allow(room):
+        emit("throttled", {"message": "You are sending messages too fast."})
         return
 
     now = datetime.now()
@@ -136,78 +483,151 @@ def message(data):
         "name": name,
         "message": data["data"],
         "time": current_time,
-        "profile_pic": users[name]["profile_pic"]
+        "avatar": user["avatar"]
     }
-    send(content, to=room)
-    rooms[room]["messages"].append(content)
-    print(f"{session.get('name')} said: {data['data']}")
+    state.add_message(room, content)
 
 @socketio.on("connect")
+@metrics.timed(handler_latency, "connect")
 def connect(auth):
     room = session.get("room")
     name = session.get("name")
-    if not room or not name or name not in users:
+    user = users.get(name)
+    if not room or user is None:
         return
     if room not in rooms:
         leave_room(room)
         return
     
-    if name in rooms[room]["names"]:
+    if not state.join(room, name):
         return False
 
+    reaper.cancel(room)
+    auth = auth if isinstance(auth, dict) else {}
     join_room(room)
+    join_room(wire.format_room(room, wire.negotiate(auth.get("format"))))
+
+    # Replay only what the client missed since its last-seen sequence number
+    last_seq = auth.get("last_seq")
+    if isinstance(last_seq, int):
+        with rooms.locked(room) as current:
+            missed, complete = current.messages.since(last_seq) if current else ([], True)
+        if missed or not complete:
+            emit("resync", {"messages": missed, "complete": complete})
+
     now = datetime.now()
     current_time = now.strftime("%H:%M")
-    send({"name": name, "message": "has entered the room", "time": current_time, "profile_pic": users[name]["profile_pic"]}, to=room)
-    rooms[room]["members"] += 1
-    rooms[room]["names"].add(name)
-    print(f"{name} joined room {room}")
+    send({"name": name, "message": "has entered the room", "time": current_time, "avatar": user["avatar"]}, to=room)
+    logger.info("joined room", user=name, room=room)
 
 @socketio.on("disconnect")
+@metrics.timed(handler_latency, "disconnect")
 def disconnect():
+    session_limiter.forget(request.sid)
     room = session.get("room")
     name = session.get("name")
+    user = users.get(name)
 
-    if not room or not name or name not in users:
+    if not room or user is None:
         return
 
     leave_room(room)
+    for fmt in wire.available_formats():
+        leave_room(wire.format_room(room, fmt))
 
-    if room in rooms:
-        rooms[room]["members"] -= 1
-        rooms[room]["names"].discard(name)
-        if rooms[room]["members"] <= 0:
-            socketio.start_background_task(delayed_delete, room)
+    if room in rooms and state.leave(room, name) <= 0:
+        reaper.schedule(room)
     
     now = datetime.now()
     current_time = now.strftime("%H:%M")
-    send({"name": name, "message": "has left the room", "time": current_time, "profile_pic": users[name]["profile_pic"]}, to=room)
-    print(f"{name} has left the room {room}")
+    send({"name": name, "message": "has left the room", "time": current_time, "avatar": user["avatar"]}, to=room)
+    logger.info("left room", user=name, room=room)
 
 
 @socketio.on("leave")
+@metrics.timed(handler_latency, "leave")
 def leave(data):
     room = session.get("room")
     name = session.get("name")
+    user = users.get(name)
 
-    if not room or not name or name not in users:
+    if not room or user is None:
         session.clear()
         return
 
     leave_room(room)
-    profile_pic = users[name]["profile_pic"] # Get pic before clearing session
+    for fmt in wire.available_formats():
+        leave_room(wire.format_room(room, fmt))
 
-    if room in rooms:
-        rooms[room]["members"] -= 1
-        rooms[room]["names"].discard(name)
-        if rooms[room]["members"] <= 0:
-            del rooms[room]
+    if room in rooms and state.leave(room, name) <= 0:
+        reaper.cancel(room)
+        forget_room(room)
     
     now = datetime.now()
     current_time = now.strftime("%H:%M")
-    send({"name": name, "message": "has left the room", "time": current_time, "profile_pic": profile_pic}, to=room)
-    print(f"{name} has left the room {room}")
+    send({"name": name, "message": "has left the room", "time": current_time, "avatar": user["avatar"]}, to=room)
+    logger.info("left room", user=name, room=room)
     session.clear()
 
+def history_bytes():
+    total = 0
+    for code, _ in rooms.snapshot():
+        with rooms.locked(code) as current:
+            if current is not None:
+                total += current.messages.memory_bytes() + current.index.memory_bytes()
+    return total
+
+metrics.collect("chat_active_rooms", "Rooms currently open.", lambda: len(rooms))
+metrics.collect("chat_connected_sockets", "Engine.IO sockets connected to this worker.",
+                lambda: len(socketio.server.eio.sockets))
+metrics.collect("chat_room_messages", "Messages sent in each open room.",
+                lambda: {code: current.messages.last_seq for code, current in rooms.snapshot()}, label="room")
+metrics.collect("chat_history_bytes", "Approximate memory held by room history buffers and search indexes.",
+                history_bytes)
+metrics.collect("chat_rooms_pending_reap", "Empty rooms waiting for their grace period.", reaper.pending_count)
+metrics.collect("chat_room_code_occupancy", "Fraction of the room code space in use.",
+                lambda: state.codes.stats()["occupancy"])
+metrics.collect("chat_message_store_pending", "Messages queued for the SQLite writer.", message_store.pending)
+metrics.collect("chat_user_cache_hits_total", "User record lookups served from the LRU.",
+                lambda: users.hits, metric_type="counter")
+metrics.collect("chat_user_cache_misses_total", "User record lookups that went to SQLite.",
+                lambda: users.misses, metric_type="counter")
+metrics.collect("chat_message_store_writer_running", "1 while the SQLite writer thread is alive.",
+                lambda: int(message_store.running()))
+metrics.collect("chat_message_store_written_total", "Messages persisted to SQLite.",
+                lambda: message_store.written, metric_type="counter")
+metrics.collect("chat_throttled_total", "Messages rejected by rate limits.",
+                lambda: {"session": session_limiter.throttled, "room": room_limiter.throttled},
+                metric_type="counter", label="scope")
+metrics.collect("chat_slow_consumers_total", "Slow clients skipped or disconnected during fan-out.",
+                lambda: {"dropped": slow_consumers.dropped, "disconnected": slow_consumers.disconnected},
+                metric_type="counter", label="action")
+metrics.collect("chat_snapshot_bytes", "Size of the last state snapshot.", lambda: snapshots.last_size)
+metrics.collect("chat_snapshot_seconds", "Time spent on the last state snapshot.",
+                lambda: {"capture": snapshots.last_capture_seconds, "write": snapshots.last_write_seconds},
+                label="phase")
+metrics.collect("chat_snapshots_total", "State snapshots written.", lambda: snapshots.written, metric_type="counter")
+if coalescer is not None:
+    metrics.collect("chat_coalesced_batches_total", "Batched frames sent by busy rooms.",
+                    lambda: coalescer.batches, metric_type="counter")
+    metrics.collect("chat_coalesced_messages_total", "Messages delivered inside batched frames.",
+                    lambda: coalescer.coalesced, metric_type="counter")
+
+# Restore before serving, so reconnecting clients find their rooms
+restore_snapshot()
+restore_rooms()
+message_store.start()
+socketio.start_background_task(metrics.track_task("room_reaper", reaper.run))
+socketio.start_background_task(metrics.track_task("state_snapshot", snapshots.run))
+if coalescer is not None:
+    socketio.start_background_task(metrics.track_task("message_coalescer", coalescer.run))
+if bus is not None:
+    socketio.start_background_task(metrics.track_task("state_listener", state.listen))
+    if state.sync(app.config["STATE_SYNC_TIMEOUT"], sleep=socketio.sleep):
+        logger.info("synced rooms from running workers", rooms=len(rooms))
+index_from_log()
+atexit.register(message_store.close)
+atexit.register(snapshots.write, offload=False)
+
 if __name__ == "__main__":
     socketio.run(app, debug=True)
@@ -0,0 +1,124 @@
+import functools
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """Cumulative histogram with one series per label value, Prometheus style."""
+
+    def __init__(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self.series.get(label_value)
+            if series is None:
+                series = self.series[label_value] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    labels = _format_labels({self.label: label_value, "le": bound})
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels({self.label: label_value, "le": "+Inf"})
+                lines.append(f"{self.name}_bucket{labels} {series['count']}")
+                labels = _format_labels({self.label: label_value})
+                lines.append(f"{self.name}_sum{labels} {series['sum']}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds handler histograms plus gauges/counters that are read from the
+    live app state at scrape time, and renders them in Prometheus text format.
+    """
+
+    def __init__(self):
+        self.histograms = []
+        self.collectors = []
+        self.background_tasks = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        histogram = Histogram(name, help_text, label, buckets)
+        self.histograms.append(histogram)
+        return histogram
+
+    def collect(self, name, help_text, fn, metric_type="gauge", label=None):
+        """
+        Register a metric read from `fn` at scrape time. `fn` returns a
+        number, or a {label value: number} dict when `label` is given.
+        """
+        self.collectors.append((name, help_text, fn, metric_type, label))
+
+    def timed(self, histogram, label_value):
+        """Decorator recording the wrapped handler's duration in `histogram`."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    histogram.observe(label_value, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def track_task(self, name, fn):
+        """Wrap a background task so the number running under `name` is reported."""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self._lock:
+                self.background_tasks[name] = self.background_tasks.get(name, 0) + 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.background_tasks[name] -= 1
+        return wrapper
+
+    def render(self):
+        lines = []
+        for histogram in self.histograms:
+            lines.extend(histogram.render())
+        for name, help_text, fn, metric_type, label in self.collectors:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            value = fn()
+            if label is None:
+                lines.append(f"{name} {value}")
+            else:
+                for label_value, sample in sorted(value.items()):
+                    lines.append(f"{name}{_format_labels({label: label_value})} {sample}")
+        lines.append("# HELP chat_background_tasks Background tasks currently running.")
+        lines.append("# TYPE chat_background_tasks gauge")
+        with self._lock:
+            for name, running in sorted(self.background_tasks.items()):
+                lines.append(f"chat_background_tasks{_format_labels({'task': name})} {running}")
+        return "\n".join(lines) + "\n"
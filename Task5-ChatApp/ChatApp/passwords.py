@@ -0,0 +1,84 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+class PasswordHasher:
+    """
+    Salted scrypt hashing that runs off the event loop.
+
+    The KDF is executed through `offload` (e.g. eventlet.tpool.execute) so a
+    login only suspends the calling green thread; by default a small thread
+    pool is used. Recent successful verifications are remembered in an LRU
+    keyed by an HMAC of the stored hash and the password, so login bursts
+    do not re-run the KDF.
+    """
+
+    def __init__(self, n=2 ** 14, r=8, p=1, offload=None, workers=4, cache_size=1024, cache_ttl=600):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_key = os.urandom(32)
+        if offload is None:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+            offload = lambda fn, *args: self._executor.submit(fn, *args).result()
+        self.offload = offload
+
+    def _derive(self, password, salt, n, r, p):
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * 1024 * 1024)
+
+    def hash(self, password):
+        salt = os.urandom(16)
+        digest = self.offload(self._derive, password, salt, self.n, self.r, self.p)
+        return f"scrypt${self.n}${self.r}${self.p}${_b64(salt)}${_b64(digest)}"
+
+    def verify(self, password, stored):
+        try:
+            scheme, n, r, p, salt, expected = stored.split("$")
+            if scheme != "scrypt":
+                return False
+            n, r, p = int(n), int(r), int(p)
+            salt, expected = base64.b64decode(salt), base64.b64decode(expected)
+        except (AttributeError, ValueError):
+            return False
+
+        cache_key = hmac.new(self._cache_key, f"{stored}\0{password}".encode(), hashlib.sha256).digest()
+        if self._cache_hit(cache_key):
+            return True
+
+        digest = self.offload(self._derive, password, salt, n, r, p)
+        if not hmac.compare_digest(digest, expected):
+            return False
+        self._remember(cache_key)
+        return True
+
+    def _cache_hit(self, key):
+        with self._cache_lock:
+            verified_at = self._cache.get(key)
+            if verified_at is None:
+                return False
+            if time.monotonic() - verified_at > self.cache_ttl:
+                del self._cache[key]
+                return False
+            self._cache.move_to_end(key)
+            return True
+
+    def _remember(self, key):
+        with self._cache_lock:
+            self._cache[key] = time.monotonic()
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,78 @@
+import time
+
+
+class TokenBucket:
+    """Allows `burst` events at once, refilled at `rate` tokens per second."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def allow(self, now, cost=1):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+
+class RateLimiter:
+    """One token bucket per key (a session ID or a room code)."""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.buckets = {}
+        self.throttled = 0
+
+    def allow(self, key):
+        now = self.clock()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst, now)
+        if bucket.allow(now):
+            return True
+        self.throttled += 1
+        return False
+
+    def forget(self, key):
+        self.buckets.pop(key, None)
+
+
+class SlowConsumerGuard:
+    """
+    Decides what to do with clients whose outbound queue has backed up.
+
+    With the "drop" policy a slow client is skipped for the current
+    broadcast; with "disconnect" it is disconnected so its buffer is freed.
+    """
+
+    POLICIES = ("drop", "disconnect")
+
+    def __init__(self, max_queue=100, policy="drop"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.dropped = 0
+        self.disconnected = 0
+
+    def check(self, queue_sizes):
+        """
+        Take (sid, queued_packets) pairs for a broadcast's recipients and
+        return (sids to skip, sids to disconnect).
+        """
+        slow = [sid for sid, size in queue_sizes if size >= self.max_queue]
+        if not slow:
+            return [], []
+        if self.policy == "disconnect":
+            self.disconnected += len(slow)
+            return slow, slow
+        self.dropped += len(slow)
+        return slow, []
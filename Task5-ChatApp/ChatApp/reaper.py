@@ -0,0 +1,71 @@
+import heapq
+import threading
+import time
+from log import get_logger
+
+logger = get_logger("reaper")
+
+
+class RoomReaper:
+    """
+    Deletes empty rooms once their grace period has passed.
+
+    One long-running task drains a heap of (deadline, code) entries instead
+    of spawning a sleeping background task per disconnect. `pending` holds
+    the live deadline for each room, so cancelling on rejoin is a dict pop;
+    stale heap entries are skipped when they surface. Handlers and the
+    reaper task may run on different OS threads, so both share a lock.
+    """
+
+    def __init__(self, on_expire, grace_period=5.0, tick=0.5, sleep=time.sleep, clock=time.monotonic):
+        self.on_expire = on_expire
+        self.grace_period = grace_period
+        self.tick = tick
+        self.sleep = sleep
+        self.clock = clock
+        self.pending = {}
+        self.heap = []
+        self.reaped = 0
+        self._lock = threading.Lock()
+
+    def schedule(self, code, grace_period=None):
+        deadline = self.clock() + (self.grace_period if grace_period is None else grace_period)
+        with self._lock:
+            self.pending[code] = deadline
+            heapq.heappush(self.heap, (deadline, code))
+            # Rooms that churn leave cancelled entries behind; rebuild once they dominate
+            if len(self.heap) > 64 and len(self.heap) > 2 * len(self.pending):
+                self.heap = [(deadline, code) for code, deadline in self.pending.items()]
+                heapq.heapify(self.heap)
+
+    def cancel(self, code):
+        with self._lock:
+            return self.pending.pop(code, None) is not None
+
+    def pending_count(self):
+        return len(self.pending)
+
+    def reap(self):
+        """Expire every room whose deadline has passed. Returns their codes."""
+        now = self.clock()
+        expired = []
+        with self._lock:
+            while self.heap and self.heap[0][0] <= now:
+                deadline, code = heapq.heappop(self.heap)
+                if self.pending.get(code) != deadline:
+                    continue
+                self.pending.pop(code, None)
+                expired.append(code)
+        # Outside the lock: on_expire may schedule or cancel rooms itself
+        for code in expired:
+            self.on_expire(code)
+        self.reaped += len(expired)
+        return expired
+
+    def run(self):
+        while True:
+            self.sleep(self.tick)
+            try:
+                self.reap()
+            except Exception:
+                logger.exception("room reaper error")
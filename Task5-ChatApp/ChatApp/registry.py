@@ -0,0 +1,120 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from zlib import crc32
+from history import MessageHistory
+from search import RoomIndex
+
+
+class Room:
+    """State of one chat room: who is in it, its history and a few counters."""
+
+    __slots__ = ("code", "instance", "names", "messages", "index", "created_at", "joins", "sent")
+
+    def __init__(self, code, history_capacity=500, index_capacity=50000, instance=None):
+        self.code = code
+        # Codes are reused once a room is deleted; the instance id never is
+        self.instance = instance or uuid.uuid4().hex
+        self.names = set()
+        self.messages = MessageHistory(history_capacity)
+        # Owned by the room, so deleting the room drops its index with it
+        self.index = RoomIndex(index_capacity)
+        self.created_at = time.time()
+        self.joins = 0
+        self.sent = 0
+
+    @property
+    def members(self):
+        # Derived from the member set, so it can never drift or go negative
+        return len(self.names)
+
+
+class _Shard:
+    __slots__ = ("lock", "rooms")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rooms = {}
+
+
+class RoomRegistry:
+    """
+    Rooms partitioned into shards by a hash of the room code, one lock per
+    shard. Every read or mutation of a room happens while holding its
+    shard's lock, so handlers running concurrently (threads or greenlets)
+    see consistent state, and rooms in different shards never contend.
+    """
+
+    def __init__(self, shards=16, history_capacity=500, index_capacity=50000):
+        self.history_capacity = history_capacity
+        self.index_capacity = index_capacity
+        self._shards = [_Shard() for _ in range(shards)]
+
+    def _shard(self, code):
+        # crc32 rather than hash() so the shard is stable across processes
+        return self._shards[crc32(code.encode()) % len(self._shards)]
+
+    def __contains__(self, code):
+        if not isinstance(code, str):
+            return False
+        return code in self._shard(code).rooms
+
+    def __len__(self):
+        return sum(len(shard.rooms) for shard in self._shards)
+
+    @contextmanager
+    def locked(self, code):
+        """Hold the room's shard lock; yields the Room, or None if it does not exist."""
+        shard = self._shard(code)
+        with shard.lock:
+            yield shard.rooms.get(code)
+
+    def create(self, code, instance=None):
+        """Create the room. Returns False if it already exists."""
+        shard = self._shard(code)
+        with shard.lock:
+            if code in shard.rooms:
+                return False
+            shard.rooms[code] = Room(code, self.history_capacity, self.index_capacity, instance)
+            return True
+
+    def delete(self, code, only_if_empty=False, instance=None):
+        """
+        Remove the room, or only the given instance of it. Returns the
+        removed Room, or None if it is missing (or still occupied).
+        """
+        shard = self._shard(code)
+        with shard.lock:
+            room = shard.rooms.get(code)
+            if room is None or (only_if_empty and room.members > 0):
+                return None
+            if instance is not None and room.instance != instance:
+                return None
+            del shard.rooms[code]
+            return room
+
+    def join(self, code, name):
+        """Add `name` to the room. Returns False if it is missing or already joined."""
+        with self.locked(code) as room:
+            if room is None or name in room.names:
+                return False
+            room.names.add(name)
+            room.joins += 1
+            return True
+
+    def leave(self, code, name):
+        """Remove `name` from the room. Returns the remaining member count."""
+        with self.locked(code) as room:
+            if room is None:
+                return 0
+            room.names.discard(name)
+            return room.members
+
+    def snapshot(self):
+        """List of (code, room) pairs, copied shard by shard."""
+        pairs = []
+        for shard in self._shards:
+            with shard.lock:
+                pairs.extend(shard.rooms.items())
+        return pairs
@@ -0,0 +1,231 @@
+import re
+import sys
+from array import array
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+TOKEN_RE = re.compile(r"\w+")
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+MAX_PREFIX_EXPANSION = 64
+SCAN_BUDGET = 2000  # candidates examined per search call before returning a partial page
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def parse_query(query):
+    """
+    Split a query into (terms, prefixes, phrases). `word*` is a prefix
+    query and "quoted words" a phrase; everything must match.
+    """
+    terms, prefixes, phrases = [], [], []
+    for phrase, word in QUERY_RE.findall(query):
+        if phrase:
+            tokens = tokenize(phrase)
+            if len(tokens) == 1:
+                terms.append(tokens[0])
+            elif tokens:
+                phrases.append(tokens)
+        elif word.endswith("*"):
+            tokens = tokenize(word)
+            if tokens:
+                terms.extend(tokens[:-1])
+                prefixes.append(tokens[-1])
+        else:
+            terms.extend(tokenize(word))
+    return terms, prefixes, phrases
+
+
+# truncated: a prefix matched more than MAX_PREFIX_EXPANSION words, so only the first ones were searched
+Candidates = namedtuple("Candidates", "seqs phrases cursor truncated", defaults=(False,))
+
+
+class RoomIndex:
+    """
+    Incremental inverted index over one room's messages.
+
+    Only postings are held: arrays of sequence numbers in increasing
+    order, so a query walks the rarest term's postings newest-first and
+    checks the other terms by bisection. Message text stays in the room
+    history and the message log, which the caller reads through `fetch`.
+    The index covers at most `max_messages` messages; older ones are
+    evicted and their postings trimmed lazily.
+    """
+
+    def __init__(self, max_messages=50000):
+        self.max_messages = max_messages
+        self.postings = {}
+        self.vocabulary = []  # sorted, for prefix expansion
+        self.seqs = array("I")  # indexed sequence numbers, oldest first, from `_head` on
+        self._head = 0
+        self.min_seq = 0
+
+    def __len__(self):
+        return len(self.seqs) - self._head
+
+    def add(self, content):
+        seq = content["seq"]
+        self.seqs.append(seq)
+        for term in set(tokenize(content["message"])):
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = array("I")
+                insort(self.vocabulary, term)
+            postings.append(seq)
+        if len(self) > self.max_messages:
+            self._head += 1
+            self.min_seq = self.seqs[self._head]
+            if self._head > self.max_messages // 2:
+                self._compact()
+
+    def _compact(self):
+        """Drop postings for evicted messages and forget terms left empty."""
+        self.seqs = self.seqs[self._head:]
+        self._head = 0
+        for term in list(self.postings):
+            postings = self.postings[term]
+            start = bisect_left(postings, self.min_seq)
+            if start == len(postings):
+                del self.postings[term]
+            elif start:
+                self.postings[term] = postings[start:]
+        self.vocabulary = sorted(self.postings)
+
+    def _expand(self, prefix):
+        """Return (terms starting with `prefix`, at most MAX_PREFIX_EXPANSION; whether some were left out)."""
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + "\U0010ffff")
+        return self.vocabulary[start:min(end, start + MAX_PREFIX_EXPANSION)], end - start > MAX_PREFIX_EXPANSION
+
+    def _live_count(self, postings):
+        return len(postings) - bisect_left(postings, self.min_seq)
+
+    @staticmethod
+    def _matches_all(groups, seq):
+        # Hot loop of every multi-term query, so no helper calls or generators
+        for group in groups:
+            for postings in group:
+                i = bisect_left(postings, seq)
+                if i < len(postings) and postings[i] == seq:
+                    break
+            else:
+                return False
+        return True
+
+    def candidates(self, query, before=None, limit=20):
+        """
+        Sequence numbers with seq < `before` that contain every query term,
+        newest first, for resolve_hits() to check against the message text.
+        Without phrases every candidate is a hit, so at most `limit` are
+        collected; otherwise the scan stops after SCAN_BUDGET messages and
+        `cursor` says where to resume (None at the end). `truncated` is set
+        when a prefix matched too many words to search them all.
+        """
+        terms, prefixes, phrases = parse_query(query)
+        for phrase in phrases:
+            terms.extend(phrase)
+        if not terms and not prefixes:
+            return Candidates([], phrases, None)
+
+        # Each clause is a group of postings; a message matches a clause if
+        # any of them contains it (prefixes expand to several terms)
+        clauses = []
+        for term in set(terms):
+            if term not in self.postings:
+                return Candidates([], phrases, None)
+            clauses.append([self.postings[term]])
+        truncated = False
+        for prefix in prefixes:
+            words, cut = self._expand(prefix)
+            if not words:
+                return Candidates([], phrases, None)
+            truncated = truncated or cut
+            clauses.append([self.postings[term] for term in words])
+        clauses.sort(key=lambda group: sum(self._live_count(p) for p in group))
+        driver, others = clauses[0], clauses[1:]
+
+        seqs = []
+        for scanned, seq in enumerate(self._descending(driver, before), 1):
+            if scanned > SCAN_BUDGET:
+                # Keeps broad queries fast; the cursor resumes the scan here
+                return Candidates(seqs, phrases, seq + 1, truncated)
+            if not self._matches_all(others, seq):
+                continue
+            seqs.append(seq)
+            if not phrases and len(seqs) == limit:
+                return Candidates(seqs, phrases, seq, truncated)
+        return Candidates(seqs, phrases, None, truncated)
+
+    def search(self, query, fetch, before=None, limit=20):
+        """Candidates and resolve_hits() in one call, for callers that need no lock in between."""
+        return resolve_hits(self.candidates(query, before, limit), fetch, limit)
+
+    def _descending(self, group, before):
+        """Yield sequence numbers from the union of `group`, newest first."""
+        if len(group) == 1:
+            postings = group[0]
+            end = len(postings) if before is None else bisect_left(postings, before)
+            return reversed(postings[bisect_left(postings, self.min_seq, 0, end):end])
+        return self._merge_descending(group, before)
+
+    def _merge_descending(self, group, before):
+        cursors = []
+        for postings in group:
+            end = len(postings) if before is None else bisect_left(postings, before)
+            start = bisect_left(postings, self.min_seq)
+            cursors.append([postings, end - 1, start])
+        last = None
+        while True:
+            best = None
+            for cursor in cursors:
+                postings, i, start = cursor
+                if i >= start and (best is None or postings[i] > best[0][best[1]]):
+                    best = cursor
+            if best is None:
+                return
+            seq = best[0][best[1]]
+            best[1] -= 1
+            if seq != last:
+                last = seq
+                yield seq
+
+    def memory_bytes(self):
+        """Approximate memory held by the index: postings, their terms and the vocabulary."""
+        total = sys.getsizeof(self.postings) + sys.getsizeof(self.vocabulary) + sys.getsizeof(self.seqs)
+        for term, postings in self.postings.items():
+            total += sys.getsizeof(term) + sys.getsizeof(postings)
+        return total
+
+
+def has_phrases(text, phrases):
+    tokens = tokenize(text)
+    for phrase in phrases:
+        width = len(phrase)
+        if not any(tokens[i:i + width] == phrase for i in range(len(tokens) - width + 1)):
+            return False
+    return True
+
+
+def resolve_hits(candidates, fetch, limit=20):
+    """
+    Return (hits, next_before): the messages behind `candidates` that match
+    its phrases, up to `limit`, and the cursor for the next page (None at
+    the end). `fetch(seqs)` returns {seq: message} for the ones it still
+    has. A page may come back short; follow the cursor for the rest.
+    """
+    hits = []
+    chunk = limit if not candidates.phrases else max(limit, 100)
+    for start in range(0, len(candidates.seqs), chunk):
+        seqs = candidates.seqs[start:start + chunk]
+        found = fetch(seqs)
+        for seq in seqs:
+            content = found.get(seq)
+            if content is None:
+                continue
+            if candidates.phrases and not has_phrases(content["message"], candidates.phrases):
+                continue
+            hits.append(content)
+            if len(hits) == limit:
+                return hits, seq
+    return hits, candidates.cursor
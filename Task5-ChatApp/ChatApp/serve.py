@@ -0,0 +1,182 @@
+"""
+Production entry point for the chat server: no debug mode, no reloader.
+
+    python serve.py --async-mode eventlet --port 8000 --backlog 2048 --concurrency 2000
+    CHAT_MESSAGE_BUS=zmq+tcp://localhost:5555+5556 python serve.py --workers 4 --port 8000
+
+With --workers N, N worker processes listen on ports port .. port+N-1 and
+share state over the message bus; put a load balancer with sticky
+sessions in front of them.
+
+eventlet mode serves with eventlet.wsgi. threading mode serves with
+gunicorn's threaded worker (one process, --concurrency threads, WebSocket
+through simple-websocket), never Werkzeug's development server.
+"""
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+
+ASYNC_MODES = ("eventlet", "threading")
+
+
+def patch_for(async_mode):
+    """Monkey patch the standard library. Must run before anything imports socket or threading users."""
+    if async_mode == "eventlet":
+        try:
+            import eventlet
+        except ImportError:
+            sys.exit('eventlet is not installed (Run "pip install eventlet"), or use --async-mode threading')
+        eventlet.monkey_patch()
+
+
+def self_check(main, args):
+    """Log what the server is about to run with, and refuse to start on a mismatch."""
+    active = main.socketio.async_mode
+    if active != args.async_mode:
+        sys.exit(f"Requested async mode {args.async_mode!r} but Flask-SocketIO picked {active!r}")
+    if args.async_mode == "eventlet":
+        import eventlet.patcher
+        patched = all(eventlet.patcher.is_monkey_patched(m) for m in ("socket", "thread", "time"))
+    else:
+        patched = False
+    try:
+        import simple_websocket  # noqa: F401
+        websocket = True
+    except ImportError:
+        websocket = args.async_mode == "eventlet"
+    main.logger.info(
+        "starting chat server",
+        async_mode=active,
+        monkey_patched=patched,
+        websocket=websocket,
+        debug=main.app.debug,
+        worker=args.worker_index,
+        workers=args.workers,
+        host=args.host,
+        port=args.port,
+        backlog=args.backlog,
+        concurrency=args.concurrency,
+        message_bus=main.app.config["MESSAGE_BUS"] or None,
+        wire_formats=list(main.wire.available_formats()),
+        jinja_cache=main.app.config["JINJA_CACHE_DIR"] or None,
+    )
+
+
+def precompile_templates(app):
+    """Compile every template now, so the bytecode cache is warm before the first request."""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+
+def load_app(args):
+    """Import the app with production settings, precompile templates and run the self-check."""
+    os.environ["CHAT_ASYNC_MODE"] = args.async_mode
+    os.environ["CHAT_JINJA_CACHE_DIR"] = args.jinja_cache
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    import main
+
+    main.app.debug = False
+    main.app.jinja_env.auto_reload = False
+    precompile_templates(main.app)
+    self_check(main, args)
+    return main
+
+
+def run_worker(args):
+    patch_for(args.async_mode)
+    if args.async_mode == "eventlet":
+        import eventlet
+        import eventlet.wsgi
+
+        main = load_app(args)
+        # Exit normally on SIGTERM so the atexit hooks flush messages and snapshot state
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        listener = eventlet.listen((args.host, args.port), backlog=args.backlog)
+        eventlet.wsgi.server(listener, main.app, max_size=args.concurrency, log_output=False)
+    else:
+        run_gunicorn(args)
+
+
+def run_gunicorn(args):
+    """Serve threading mode with gunicorn's gthread worker."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit('gunicorn is not installed (Run "pip install gunicorn"), or use --async-mode eventlet')
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            # Socket.IO sessions live in the process: scale out with --workers and the bus instead
+            self.cfg.set("workers", 1)
+            self.cfg.set("worker_class", "gthread")
+            # Every WebSocket holds a thread for as long as it is open
+            self.cfg.set("threads", args.concurrency)
+            # Idle keep-alive connections wait in the poller without a thread
+            self.cfg.set("worker_connections", 2 * args.concurrency)
+            self.cfg.set("backlog", args.backlog)
+            # gunicorn already exits cleanly on SIGTERM, so the atexit hooks run
+            self.cfg.set("graceful_timeout", 10)
+
+        def load(self):
+            # Runs in the forked worker, so the app's background threads start there
+            return load_app(args).app
+
+    # Per-request access lines belong to the load balancer, not the app log
+    logging.getLogger("gunicorn.access").setLevel(logging.WARNING)
+    Server().run()
+
+
+def run_workers(args):
+    """Start one process per worker and stop them all together."""
+    if not os.environ.get("CHAT_MESSAGE_BUS"):
+        sys.exit("--workers > 1 needs a message bus: start `python bus.py` and set CHAT_MESSAGE_BUS")
+    children = []
+    for index in range(args.workers):
+        command = [sys.executable, os.path.abspath(__file__),
+                   "--async-mode", args.async_mode, "--host", args.host, "--port", str(args.port + index),
+                   "--backlog", str(args.backlog), "--concurrency", str(args.concurrency),
+                   "--jinja-cache", args.jinja_cache, "--workers", "1", "--worker-index", str(index)]
+        children.append(subprocess.Popen(command))
+
+    def stop(signum, frame):
+        for child in children:
+            child.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for child in children:
+            child.wait()
+    except KeyboardInterrupt:
+        stop(None, None)
+        for child in children:
+            child.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the chat server in production mode")
+    parser.add_argument("--async-mode", default=os.environ.get("CHAT_ASYNC_MODE", "eventlet"), choices=ASYNC_MODES)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, on consecutive ports")
+    parser.add_argument("--backlog", type=int, default=1024, help="listen queue length")
+    parser.add_argument("--concurrency", type=int, default=1000,
+                        help="connections each worker serves at once (green threads, or gunicorn threads)")
+    parser.add_argument("--jinja-cache", default=os.path.join(tempfile.gettempdir(), "chat-jinja-cache"),
+                        help="directory for compiled templates")
+    parser.add_argument("--worker-index", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        run_workers(args)
+    else:
+        run_worker(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+import threading
+import time
+import uuid
+from codes import RoomCodeAllocator
+from registry import RoomRegistry
+from userstore import UserStore
+
+STATE_CHANNEL = "chat-state"
+
+
+class SharedState:
+    """
+    Room membership, room history and user records shared by every worker.
+
+    Each worker keeps a local replica of the rooms that handlers read
+    directly. Mutations go through the methods below, which apply the change
+    locally and publish it on the bus so the other workers apply it too.
+    Users live in a UserStore on a database every worker opens; the bus
+    only carries cache invalidations for them.
+
+    Messages are the exception: the bus delivers every event to every
+    worker in the same order (the broker is the sequencer), so a message is
+    only numbered when the bus hands it back, and each worker gives it the
+    same sequence number. New rooms work the same way: each worker picks
+    codes on its own, so a room only exists once the bus hands its claim
+    back, and the first claim for a code wins everywhere; see create_room().
+    A worker that starts while others are running asks them for their rooms
+    before serving; see sync().
+    """
+
+    def __init__(self, bus=None, history_capacity=500, code_length=4, users=None, shards=16,
+                 index_capacity=50000):
+        self.bus = bus
+        self.worker_id = uuid.uuid4().hex
+        self.codes = RoomCodeAllocator(code_length)
+        self._codes_lock = threading.Lock()
+        self.rooms = RoomRegistry(shards, history_capacity, index_capacity)
+        self.users = users if users is not None else UserStore(":memory:")
+        # Called with (code, instance, content) once a message sent through
+        # this worker has its sequence number, to persist and broadcast it
+        self.on_message = None
+        self.synced = bus is None
+        self._sync_lock = threading.Lock()
+        self._backlog = []  # events received before sync() caught up
+        self._sync_marks = {}  # our sync request id -> backlog position it was delivered at
+        self._claims = {}  # instance of a room we are creating -> None until settled, then whether it won
+
+    def _publish(self, op, **fields):
+        if self.bus is not None:
+            self.bus.publish(STATE_CHANNEL, {"op": op, "worker": self.worker_id, "fields": fields})
+
+    def listen(self):
+        """Apply changes published by other workers. Runs as a background task."""
+        for event in self.bus.listen(STATE_CHANNEL):
+            if self.synced:
+                self._receive(event)
+                continue
+            with self._sync_lock:
+                if self.synced:
+                    self._receive(event)
+                else:
+                    self._catch_up(event)
+
+    def apply(self, event):
+        handler = getattr(self, f"_{event['op']}", None)
+        if handler is not None:
+            handler(**event["fields"])
+
+    def _receive(self, event):
+        op, fields = event["op"], event["fields"]
+        if op == "sync_request":
+            if event["worker"] != self.worker_id:
+                self._publish("sync_state", request=fields["request"], rooms=self.capture_rooms())
+        elif op == "sync_state":
+            return
+        elif op == "add_message":
+            content = self._add_message(**fields)
+            if event["worker"] == self.worker_id:
+                self._delivered(fields["code"], fields["instance"], content)
+        elif op == "create_room" and event["worker"] == self.worker_id:
+            self._settle_claim(fields["code"], fields["instance"])
+        elif event["worker"] != self.worker_id:
+            self.apply(event)
+
+    def _catch_up(self, event):
+        op, fields = event["op"], event["fields"]
+        if op == "sync_request":
+            if event["worker"] == self.worker_id:
+                self._sync_marks[fields["request"]] = len(self._backlog)
+        elif op == "sync_state":
+            start = self._sync_marks.get(fields["request"])
+            if start is not None:
+                # The reply holds everything delivered before our request; replay the rest
+                self.load_rooms(fields["rooms"])
+                self._go_live(self._backlog[start:])
+        else:
+            self._backlog.append(event)
+
+    def _go_live(self, events):
+        self.synced = True
+        self._backlog = []
+        self._sync_marks = {}
+        for event in events:
+            self._receive(event)
+
+    def sync(self, timeout=2.0, retry=0.5, sleep=time.sleep):
+        """
+        Catch up with the workers already running: ask them for their rooms
+        and wait for the first answer, which replaces whatever this worker
+        restored on its own. Needs listen() running. Returns False if
+        nobody answered within `timeout` seconds (this is the first worker),
+        in which case the local state is kept.
+        """
+        deadline = time.monotonic() + timeout
+        next_request = 0.0
+        while not self.synced:
+            now = time.monotonic()
+            if now >= deadline:
+                with self._sync_lock:
+                    if not self.synced:
+                        self._go_live(self._backlog)
+                        return False
+                break
+            if now >= next_request:
+                # Repeated in case the bus had not finished subscribing us
+                self._publish("sync_request", request=uuid.uuid4().hex)
+                next_request = now + retry
+            sleep(0.01)
+        return True
+
+    def capture_rooms(self):
+        """Copy every room's state, for snapshots and for workers catching up."""
+        rooms = []
+        for code, _ in self.rooms.snapshot():
+            with self.rooms.locked(code) as room:
+                if room is None:
+                    continue
+                # Messages are never modified once appended, so copying the
+                # containers is enough; the message dicts are shared
+                rooms.append({
+                    "code": code,
+                    "instance": room.instance,
+                    "created_at": room.created_at,
+                    "joins": room.joins,
+                    "sent": room.sent,
+                    "names": list(room.names),
+                    "next_seq": room.messages.next_seq,
+                    "messages": list(room.messages.messages),
+                })
+        return rooms
+
+    def load_room(self, saved, members=False):
+        """
+        Restore a room captured by capture_rooms(), with its members if
+        `members`. Returns False if its code belongs to another instance.
+        """
+        code = saved["code"]
+        if not self.restore_room(code, saved["messages"], saved["instance"]):
+            return False
+        with self.rooms.locked(code) as room:
+            room.created_at = saved["created_at"]
+            room.joins = saved["joins"]
+            room.sent = saved["sent"]
+            room.messages.next_seq = max(room.messages.next_seq, saved["next_seq"])
+            if members:
+                room.names.update(saved["names"])
+        return True
+
+    def load_rooms(self, saved_rooms):
+        """Replace every local room with the ones another worker captured."""
+        for code, _ in self.rooms.snapshot():
+            self._delete_room(code)
+        for saved in saved_rooms:
+            self.load_room(saved, members=True)
+
+    # Users
+
+    def add_user(self, name, record):
+        """Returns False if the name is already taken."""
+        return self.users.add(name, record)
+
+    def update_user(self, name, **fields):
+        self.users.update(name, **fields)
+        self._publish("invalidate_user", name=name)
+
+    def _invalidate_user(self, name):
+        self.users.invalidate(name)
+
+    # Rooms
+
+    def create_room(self, timeout=2.0, sleep=time.sleep):
+        """
+        Create a room under a fresh code. Returns None if no code is free,
+        or if the bus did not hand the room's claim back within `timeout`
+        seconds.
+
+        With a bus, the room is only created when its claim comes back. If
+        another worker claimed the same code first, every worker keeps that
+        room and this one tries again with another code.
+        """
+        while True:
+            with self._codes_lock:
+                code = self.codes.allocate()
+            if code is None:
+                return None
+            if self.bus is None:
+                self.rooms.create(code)
+                return code
+            instance = uuid.uuid4().hex
+            with self._codes_lock:
+                self._claims[instance] = None
+            self._publish("create_room", code=code, instance=instance)
+            deadline = time.monotonic() + timeout
+            while self._claims[instance] is None and time.monotonic() < deadline:
+                sleep(0.01)
+            with self._codes_lock:
+                won = self._claims.pop(instance)
+            if won:
+                return code
+            if won is None:
+                # Given up on: undo it wherever it lands
+                self._publish("delete_room", code=code, instance=instance)
+                self._delete_room(code, instance=instance)
+                return None
+
+    def _settle_claim(self, code, instance):
+        with self._codes_lock:
+            waiting = instance in self._claims
+        if not waiting:
+            return
+        won = self._create_room(code, instance)
+        with self._codes_lock:
+            if instance in self._claims:
+                self._claims[instance] = won
+
+    def _create_room(self, code, instance=None):
+        """Returns False if the code already belongs to a room."""
+        if not self.rooms.create(code, instance):
+            return False
+        with self._codes_lock:
+            self.codes.reserve(code)
+        return True
+
+    def restore_room(self, code, messages, instance=None):
+        """
+        Seed a room from persisted history. Every worker restores on its own.
+        Returns False, restoring nothing, if the code already belongs to
+        another instance of the room.
+        """
+        self._create_room(code, instance)
+        with self.rooms.locked(code) as room:
+            if instance is not None and room.instance != instance:
+                return False
+            for content in room.messages.restore(messages):
+                room.index.add(content)
+        return True
+
+    def delete_room(self, code, only_if_empty=False):
+        """
+        Returns the deleted room's instance id, or None if the room was
+        missing (or, with only_if_empty, occupied).
+        """
+        room = self._delete_room(code, only_if_empty)
+        if room is None:
+            return None
+        self._publish("delete_room", code=code, instance=room.instance)
+        return room.instance
+
+    def _delete_room(self, code, only_if_empty=False, instance=None):
+        room = self.rooms.delete(code, only_if_empty, instance)
+        if room is None:
+            return None
+        with self._codes_lock:
+            self.codes.release(code)
+        return room
+
+    def join(self, code, name):
+        """Add `name` to the room. Returns False if it is already a member."""
+        if not self.rooms.join(code, name):
+            return False
+        self._publish("join", code=code, name=name)
+        return True
+
+    def _join(self, code, name):
+        self.rooms.join(code, name)
+
+    def leave(self, code, name):
+        """Remove `name` from the room. Returns the remaining member count."""
+        remaining = self.rooms.leave(code, name)
+        self._publish("leave", code=code, name=name)
+        return remaining
+
+    def _leave(self, code, name):
+        self.rooms.leave(code, name)
+
+    def add_message(self, code, content):
+        """
+        Submit a message to the room. It is numbered when the bus delivers
+        it (right away without a bus) and then passed to on_message.
+        Returns False if the room no longer exists.
+        """
+        with self.rooms.locked(code) as room:
+            if room is None:
+                return False
+            instance = room.instance
+        if self.bus is None:
+            self._delivered(code, instance, self._add_message(code, content, instance))
+        else:
+            self._publish("add_message", code=code, content=content, instance=instance)
+        return True
+
+    def _add_message(self, code, content, instance):
+        """Number and append a message. Returns None if its room instance is gone."""
+        with self.rooms.locked(code) as room:
+            if room is None or room.instance != instance:
+                return None
+            content = room.messages.append(content)
+            room.index.add(content)
+            room.sent += 1
+            return content
+
+    def _delivered(self, code, instance, content):
+        if content is not None and self.on_message is not None:
+            self.on_message(code, instance, content)
@@ -0,0 +1,193 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+from log import get_logger
+
+logger = get_logger("store")
+
+
+class MessageStore:
+    """
+    Durable SQLite (WAL-mode) log of chat messages.
+    Socket handlers only enqueue; a background writer batches inserts with
+    executemany and flushes every `batch_size` messages or `flush_interval`
+    seconds, whichever comes first.
+
+    Room codes are reused once a room is deleted, so messages are keyed by
+    the room's instance id as well, and deleted instances are recorded so a
+    restart neither merges two rooms nor brings a deleted one back.
+    """
+
+    def __init__(self, db_name="chat_messages.db", batch_size=100, flush_interval=0.2):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.written = 0
+        self.batches = 0
+        self._thread = None
+        self.create_tables()
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_name)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def create_tables(self):
+        with self.get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    room TEXT NOT NULL,
+                    instance TEXT,
+                    seq INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(messages)")]
+            if "instance" not in columns:
+                # Logs written before instance ids: their rows are never restored
+                conn.execute("ALTER TABLE messages ADD COLUMN instance TEXT")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS deleted_rooms (
+                    instance TEXT PRIMARY KEY,
+                    deleted_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_room_seq ON messages (room, seq)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_instance_seq ON messages (instance, seq)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages (created_at)")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="message-store-writer", daemon=True)
+            self._thread.start()
+
+    def append(self, room, instance, content):
+        """Queue a message for persistence. Never blocks on disk."""
+        self.queue.put_nowait(("message", (room, instance, content["seq"], json.dumps(content), time.time())))
+
+    def delete_room(self, instance):
+        """Record that a room instance was deleted, so it is not restored."""
+        self.queue.put_nowait(("deleted", (instance, time.time())))
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def close(self):
+        """Flush everything still queued and stop the writer."""
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        conn = self.get_connection()
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(conn, batch)
+        conn.close()
+
+    def _write(self, conn, batch):
+        messages = [row for kind, row in batch if kind == "message"]
+        deleted = [row for kind, row in batch if kind == "deleted"]
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO messages (room, instance, seq, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                    messages,
+                )
+                conn.executemany("INSERT OR REPLACE INTO deleted_rooms (instance, deleted_at) VALUES (?, ?)", deleted)
+            self.written += len(messages)
+            self.batches += 1
+        except sqlite3.Error as e:
+            logger.error("failed to persist messages", count=len(batch), error=str(e))
+
+    def load_recent(self, limit=500, max_age=24 * 60 * 60):
+        """
+        Return {room: (instance, [message, ...])} for rooms active within
+        `max_age` seconds and not deleted, holding at most `limit` of each
+        room's latest messages. Only the newest instance of a code is kept.
+        """
+        since = time.time() - max_age
+        history = {}
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT room, instance FROM messages
+                WHERE instance IS NOT NULL
+                  AND instance NOT IN (SELECT instance FROM deleted_rooms)
+                GROUP BY instance
+                HAVING MAX(created_at) >= ?
+                ORDER BY MAX(created_at) DESC
+            """, (since,))
+            for room, instance in cursor.fetchall():
+                if room in history:
+                    continue
+                cursor.execute("""
+                    SELECT payload FROM messages
+                    WHERE instance = ?
+                    ORDER BY seq DESC
+                    LIMIT ?
+                """, (instance, limit))
+                rows = cursor.fetchall()
+                history[room] = (instance, [json.loads(payload) for (payload,) in reversed(rows)])
+        return history
+
+    def page(self, instance, before, limit=50):
+        """Up to `limit` logged messages of a room instance with seq < `before`, oldest first."""
+        return list(self.iter_messages(instance, before, limit))
+
+    def fetch(self, instance, seqs):
+        """Return {seq: message} for the logged messages of a room instance among `seqs`."""
+        if not seqs:
+            return {}
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                f"SELECT seq, payload FROM messages WHERE instance = ? AND seq IN ({','.join('?' * len(seqs))})",
+                (instance, *seqs),
+            ).fetchall()
+        return {seq: json.loads(payload) for seq, payload in rows}
+
+    def iter_messages(self, instance, before, limit):
+        """Yield up to `limit` of the latest logged messages with seq < `before`, oldest first."""
+        with self.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT payload FROM (
+                    SELECT seq, payload FROM messages
+                    WHERE instance = ? AND seq < ?
+                    ORDER BY seq DESC
+                    LIMIT ?
+                ) ORDER BY seq
+            """, (instance, before, limit))
+            for (payload,) in rows:
+                yield json.loads(payload)
+
+    def deleted_rooms(self):
+        """Instance ids of every room recorded as deleted."""
+        with self.get_connection() as conn:
+            return {instance for (instance,) in conn.execute("SELECT instance FROM deleted_rooms")}
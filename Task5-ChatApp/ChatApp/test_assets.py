@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+from assets import StaticFingerprints
+
+
+class TestStaticFingerprints(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        os.makedirs(os.path.join(self.static, "css"))
+        self.path = os.path.join(self.static, "style.css")
+        with open(self.path, "w") as f:
+            f.write("body { color: red; }")
+        self.fingerprints = StaticFingerprints(self.static)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stable_until_content_changes(self):
+        first = self.fingerprints("style.css")
+        self.assertEqual(len(first), 12)
+        self.assertEqual(self.fingerprints("style.css"), first)
+        with open(self.path, "w") as f:
+            f.write("body { color: blue; }")
+        os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 1))
+        self.assertNotEqual(self.fingerprints("style.css"), first)
+
+    def test_missing_file(self):
+        self.assertIsNone(self.fingerprints("missing.js"))
+
+    def test_outside_the_folder(self):
+        with open(os.path.join(self.tmp.name, "secret.txt"), "w") as f:
+            f.write("secret")
+        self.assertIsNone(self.fingerprints("../secret.txt"))
+        self.assertIsNone(self.fingerprints(os.path.join(self.tmp.name, "secret.txt")))
+        self.assertIsNone(self.fingerprints("../../../../../../dev/zero"))
+
+    def test_only_regular_files(self):
+        self.assertIsNone(self.fingerprints("css"))
+        os.mkfifo(os.path.join(self.static, "pipe"))  # opening it would block
+        self.assertIsNone(self.fingerprints("pipe"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import threading
+import time
+import unittest
+from coalesce import MessageCoalescer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMessageCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.flushed = []
+        self.coalescer = MessageCoalescer(
+            lambda room, messages: self.flushed.append((room, messages)),
+            min_window=0.01, max_window=0.05, quiet_rate=20, busy_rate=200, clock=self.clock,
+        )
+
+    def send_at_rate(self, room, rate, count):
+        results = []
+        for i in range(count):
+            self.clock.now += 1 / rate
+            results.append(self.coalescer.submit(room, i))
+        return results
+
+    def flush_due(self):
+        for room, messages in self.coalescer.due():
+            self.coalescer._flush(room, messages)
+
+    def test_quiet_room_sends_directly(self):
+        self.assertEqual(self.send_at_rate("ABCD", 2, 10), [False] * 10)
+        self.assertEqual(self.coalescer.due(), [])
+
+    def test_busy_room_batches_in_order(self):
+        results = self.send_at_rate("ABCD", 500, 200)
+        self.assertTrue(all(results[-50:]))
+        self.clock.now += 1
+        self.flush_due()
+        delivered = [m for _, messages in self.flushed for m in messages]
+        self.assertEqual(delivered, [i for i, direct in enumerate(results) if direct])
+        self.assertLess(len(self.flushed), len(delivered))
+        self.assertEqual(self.coalescer.coalesced, len(delivered))
+
+    def test_window_adapts_to_rate(self):
+        self.assertEqual(self.coalescer.window(10), 0)
+        self.assertAlmostEqual(self.coalescer.window(20), 0.01)
+        self.assertAlmostEqual(self.coalescer.window(110), 0.03)
+        self.assertAlmostEqual(self.coalescer.window(1000), 0.05)
+
+    def test_open_batch_keeps_order_when_room_goes_quiet(self):
+        self.send_at_rate("ABCD", 500, 100)
+        self.clock.now += 0.001
+        self.assertTrue(self.coalescer.submit("ABCD", "late"))
+        self.clock.now += 1
+        self.flush_due()
+        self.assertEqual(self.flushed[-1][1][-1], "late")
+        self.clock.now += 10
+        self.assertFalse(self.coalescer.submit("ABCD", "quiet again"))
+
+    def test_forget_flushes_pending(self):
+        self.send_at_rate("ABCD", 500, 100)
+        self.coalescer.forget("ABCD")
+        self.assertTrue(self.flushed)
+        self.assertEqual(self.coalescer.due(), [])
+        self.assertEqual(self.coalescer.rate("ABCD"), 0.0)
+
+    def test_quiet_message_waits_for_batch_in_flight(self):
+        self.send_at_rate("ABCD", 500, 100)
+        self.clock.now += 1
+        (room, batch), = self.coalescer.due()
+        # The room has gone quiet, but the batch taken above is not sent yet
+        self.clock.now += 10
+        self.assertTrue(self.coalescer.submit("ABCD", "after"))
+        self.assertEqual(self.coalescer.due(), [])
+        self.coalescer._flush(room, batch)
+        (_, messages), = self.coalescer.due()
+        self.assertEqual(messages, ["after"])
+        self.coalescer._flush("ABCD", messages)
+        self.assertFalse(self.coalescer.submit("ABCD", "direct"))
+
+    def test_run_wakes_for_new_batches(self):
+        flushed = threading.Event()
+        coalescer = MessageCoalescer(lambda room, messages: flushed.set(), min_window=0.01, max_window=0.01,
+                                     quiet_rate=0, busy_rate=1)
+        threading.Thread(target=coalescer.run, daemon=True).start()
+        time.sleep(0.05)  # idle: the loop waits with no deadline
+        start = time.monotonic()
+        self.assertTrue(coalescer.submit("ABCD", "hi"))
+        self.assertTrue(flushed.wait(1))
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from codes import RoomCodeAllocator
+
+
+class TestRoomCodeAllocator(unittest.TestCase):
+    def setUp(self):
+        self.codes = RoomCodeAllocator(length=2, alphabet="ABC")
+
+    def test_encode_decode(self):
+        for number in range(self.codes.capacity):
+            self.assertEqual(self.codes.decode(self.codes.encode(number)), number)
+        self.assertIsNone(self.codes.decode("AZ"))
+        self.assertIsNone(self.codes.decode("A"))
+
+    def test_allocates_every_code_once(self):
+        allocated = {self.codes.allocate() for _ in range(9)}
+        self.assertEqual(len(allocated), 9)
+        self.assertIsNone(self.codes.allocate())
+        self.assertEqual(self.codes.stats()["occupancy"], 1.0)
+
+    def test_release_and_reserve(self):
+        self.assertTrue(self.codes.reserve("BC"))
+        self.assertFalse(self.codes.reserve("BC"))
+        self.assertTrue(self.codes.is_taken("BC"))
+        allocated = [self.codes.allocate() for _ in range(8)]
+        self.assertNotIn("BC", allocated)
+
+        self.assertTrue(self.codes.release("BC"))
+        self.assertFalse(self.codes.release("BC"))
+        self.assertEqual(self.codes.allocate(), "BC")
+        self.assertEqual(self.codes.stats()["free"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
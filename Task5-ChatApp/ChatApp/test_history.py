@@ -0,0 +1,63 @@
+import unittest
+from history import MessageHistory
+
+
+class TestMessageHistory(unittest.TestCase):
+    def setUp(self):
+        self.history = MessageHistory(capacity=5)
+
+    def fill(self, count):
+        for i in range(count):
+            self.history.append({"message": f"msg {i}"})
+
+    def test_sequence_numbers(self):
+        self.fill(3)
+        self.assertEqual([m["seq"] for m in self.history.page()], [1, 2, 3])
+        self.assertEqual(self.history.last_seq, 3)
+
+    def test_capacity_is_bounded(self):
+        self.fill(12)
+        self.assertEqual(len(self.history), 5)
+        self.assertEqual(self.history.first_seq, 8)
+        self.assertEqual(self.history.last_seq, 12)
+
+    def test_page_before(self):
+        self.fill(5)
+        page = self.history.page(before=4, limit=2)
+        self.assertEqual([m["seq"] for m in page], [2, 3])
+        self.assertTrue(self.history.has_more(page[0]["seq"]))
+        page = self.history.page(before=2, limit=2)
+        self.assertEqual([m["seq"] for m in page], [1])
+        self.assertFalse(self.history.has_more(page[0]["seq"]))
+
+    def test_page_before_evicted(self):
+        self.fill(10)
+        self.assertEqual(self.history.page(before=3), [])
+
+    def test_find(self):
+        self.fill(8)
+        self.assertEqual(self.history.find(6)["message"], "msg 5")
+        self.assertIsNone(self.history.find(2))
+        self.assertIsNone(self.history.find(9))
+
+    def test_since(self):
+        self.fill(5)
+        messages, complete = self.history.since(3)
+        self.assertEqual([m["seq"] for m in messages], [4, 5])
+        self.assertTrue(complete)
+        self.assertEqual(self.history.since(5), ([], True))
+
+    def test_since_evicted(self):
+        self.fill(12)
+        messages, complete = self.history.since(2)
+        self.assertEqual([m["seq"] for m in messages], [8, 9, 10, 11, 12])
+        self.assertFalse(complete)
+        self.assertTrue(self.history.since(7)[1])
+
+    def test_empty(self):
+        self.assertEqual(self.history.page(), [])
+        self.assertFalse(self.history.has_more(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
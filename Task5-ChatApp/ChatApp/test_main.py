@@ -0,0 +1,249 @@
+import atexit
+import itertools
+import os
+import tempfile
+import time
+import unittest
+
+from search import MAX_PREFIX_EXPANSION
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+main = None
+# main.py keeps its databases and snapshot relative to the working directory,
+# and its background tasks run until exit, so the directory lives until then too
+data_dir = tempfile.TemporaryDirectory()
+
+
+def setUpModule():
+    global main
+    os.environ.setdefault("CHAT_ASYNC_MODE", "threading")
+    # The message log reconnects by name on every read and write
+    os.chdir(data_dir.name)
+    import main
+    main.message_store.db_name = os.path.join(data_dir.name, main.app.config["MESSAGE_DB"])
+    main.snapshots.path = os.path.join(data_dir.name, main.app.config["SNAPSHOT_PATH"])
+
+
+def tearDownModule():
+    os.chdir(HERE)
+    main.message_store.close()
+    atexit.unregister(main.message_store.close)
+    atexit.unregister(main.snapshots.write)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class RoomTestCase(unittest.TestCase):
+    """A signed-in user who has just created a room through the lounge."""
+    names = itertools.count()
+    avatar = 2
+
+    def setUp(self):
+        self.name = self.new_user()
+        self.client = self.login(self.name)
+        response = self.client.post("/lounge", data={"create": "Create a Room"})
+        self.assertEqual(response.status_code, 302)
+        with self.client.session_transaction() as session:
+            self.code = session["room"]
+        self.addCleanup(main.forget_room, self.code)
+
+    def new_user(self):
+        name = f"tester{next(self.names)}"
+        self.assertTrue(main.state.add_user(name, {"password": "unused", "avatar": self.avatar}))
+        return name
+
+    def login(self, name, room=None):
+        client = main.app.test_client()
+        with client.session_transaction() as session:
+            session["name"] = name
+            if room is not None:
+                session["room"] = room
+        return client
+
+    def say(self, count, text="message {}"):
+        for i in range(count):
+            main.state.add_message(self.code, {"name": self.name, "message": text.format(i + 1), "time": "12:00",
+                                               "avatar": self.avatar})
+
+    def socket(self, client, **auth):
+        socket = main.socketio.test_client(main.app, flask_test_client=client, auth=auth)
+        self.addCleanup(lambda: socket.is_connected() and socket.disconnect())
+        self.assertTrue(socket.is_connected())
+        return socket
+
+
+class TestStaticCaching(unittest.TestCase):
+    def setUp(self):
+        self.client = main.app.test_client()
+
+    def test_fingerprinted_file_is_immutable(self):
+        with main.app.test_request_context():
+            url = main.url_for("static", filename="css/style.css")
+        self.assertIn("?v=", url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.cache_control.immutable)
+        self.assertEqual(response.cache_control.max_age, main.app.config["STATIC_MAX_AGE"])
+        response.close()
+
+    def test_stale_version_and_missing_file_are_not_cached(self):
+        response = self.client.get("/static/css/style.css?v=stale")
+        self.assertFalse(response.cache_control.immutable)
+        response.close()
+        response = self.client.get("/static/missing.css?v=x")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.cache_control.immutable)
+
+    def test_paths_outside_static_are_not_read(self):
+        response = self.client.get("/static/..%2f..%2f..%2f..%2f..%2f..%2fdev%2fzero?v=x")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.cache_control.immutable)
+        self.assertEqual(main.static_fingerprints._hashes.get("../../../../../../dev/zero"), None)
+
+
+class TestAvatars(RoomTestCase):
+    def test_avatar_is_cacheable(self):
+        response = self.client.get("/avatar/1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "image/svg+xml")
+        self.assertEqual(response.get_data(as_text=True), main.PROFILE_PICS[1])
+        self.assertTrue(response.cache_control.public)
+        self.assertEqual(response.cache_control.max_age, main.AVATAR_MAX_AGE)
+        etag, _ = response.get_etag()
+        self.assertEqual(etag, main.AVATAR_ETAGS[1])
+
+        response = self.client.get("/avatar/1", headers={"If-None-Match": f'"{etag}"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b"")
+        response = self.client.get("/avatar/0", headers={"If-None-Match": f'"{etag}"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_avatar(self):
+        self.assertEqual(self.client.get(f"/avatar/{len(main.PROFILE_PICS)}").status_code, 404)
+        self.assertEqual(self.client.get("/avatar/-1").status_code, 404)
+
+    def test_messages_carry_avatar_ids(self):
+        self.say(1, "rendered")
+        page = self.client.get("/room").get_data(as_text=True)
+        initial = page[page.index("const initialMessages"):page.index("initialMessages.forEach")]
+        self.assertIn('"avatar": 2', initial)
+        self.assertNotIn("svg", initial)
+
+        socket = self.socket(self.client)
+        socket.get_received()
+        socket.emit("message", {"data": "live"})
+        received = [packet["args"] for packet in socket.get_received() if packet["name"] == "message"]
+        self.assertEqual(received[0]["message"], "live")
+        self.assertEqual(received[0]["avatar"], 2)
+        self.assertNotIn("svg", repr(received))
+
+
+
+class TestRoomHistory(RoomTestCase):
+    def history(self, **args):
+        response = self.client.get("/room/history", query_string=args)
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        return [m["seq"] for m in body["messages"]], body["has_more"]
+
+    def test_requires_a_room(self):
+        client = self.login(self.new_user())
+        self.assertEqual(client.get("/room/history").status_code, 403)
+        client = self.login(self.name, room="gone")
+        self.assertEqual(client.get("/room/history").status_code, 403)
+
+    def test_pages_back_from_the_buffer(self):
+        self.say(120)
+        self.assertEqual(self.history(), (list(range(71, 121)), True))
+        self.assertEqual(self.history(before=71), (list(range(21, 71)), True))
+        self.assertEqual(self.history(before=21), (list(range(1, 21)), False))
+        self.assertEqual(self.history(before=31, limit=5), (list(range(26, 31)), True))
+        self.assertEqual(len(self.history(limit=1000)[0]), main.app.config["HISTORY_PAGE_SIZE"])
+
+    def test_older_pages_come_from_the_log(self):
+        capacity = main.app.config["HISTORY_CAPACITY"]
+        self.say(capacity + 30)
+        with main.rooms.locked(self.code) as room:
+            instance = room.instance
+            self.assertEqual(room.messages.first_seq, 31)
+        self.assertTrue(wait_for(lambda: len(main.message_store.fetch(instance, [1, capacity + 30])) == 2))
+
+        # Straddles the start of the buffer: 20 from the log, 20 from memory
+        seqs, has_more = self.history(before=51, limit=40)
+        self.assertEqual(seqs, list(range(11, 51)))
+        self.assertTrue(has_more)
+        seqs, has_more = self.history(before=11)
+        self.assertEqual(seqs, list(range(1, 11)))
+        self.assertFalse(has_more)
+        messages = self.client.get("/room/history", query_string={"before": 3}).get_json()["messages"]
+        self.assertEqual([m["message"] for m in messages], ["message 1", "message 2"])
+
+
+
+class TestResync(RoomTestCase):
+    def connect(self, **auth):
+        socket = self.socket(self.login(self.new_user(), room=self.code), **auth)
+        return {packet["name"]: packet["args"] for packet in socket.get_received()}
+
+    def test_replays_missed_messages(self):
+        self.say(30)
+        received = self.connect(last_seq=25)
+        resync = received["resync"][0]
+        self.assertEqual([m["seq"] for m in resync["messages"]], [26, 27, 28, 29, 30])
+        self.assertTrue(resync["complete"])
+        self.assertEqual(received["message"]["message"], "has entered the room")
+
+    def test_up_to_date_client_gets_no_resync(self):
+        self.say(3)
+        self.assertNotIn("resync", self.connect(last_seq=3))
+        self.assertNotIn("resync", self.connect())
+
+    def test_gap_older_than_the_buffer_is_incomplete(self):
+        capacity = main.app.config["HISTORY_CAPACITY"]
+        self.say(capacity + 10)
+        resync = self.connect(last_seq=5)["resync"][0]
+        self.assertEqual(len(resync["messages"]), capacity)
+        self.assertEqual(resync["messages"][0]["seq"], 11)
+        self.assertFalse(resync["complete"])
+
+
+
+class TestRoomSearch(RoomTestCase):
+    def search(self, **args):
+        response = self.client.get("/room/search", query_string=args)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_requires_a_room(self):
+        client = self.login(self.new_user())
+        self.assertEqual(client.get("/room/search", query_string={"q": "message"}).status_code, 403)
+
+    def test_pages_through_hits(self):
+        self.say(30)
+        self.say(1, "something else")
+        body = self.search(q="message")
+        self.assertEqual([hit["seq"] for hit in body["hits"]], list(range(30, 10, -1)))
+        self.assertEqual(body["next"], 11)
+        self.assertFalse(body["truncated"])
+        body = self.search(q="message", before=body["next"])
+        self.assertEqual([hit["seq"] for hit in body["hits"]], list(range(10, 0, -1)))
+        self.assertIsNone(body["next"])
+        self.assertEqual([hit["message"] for hit in self.search(q='"message 7"')["hits"]], ["message 7"])
+
+    def test_wide_prefix_is_flagged(self):
+        self.say(MAX_PREFIX_EXPANSION + 1, "word{}")
+        body = self.search(q="word*")
+        self.assertTrue(body["truncated"])
+        self.assertTrue(body["hits"])
+        self.assertFalse(self.search(q="word1*")["truncated"])
+
+
+if __name__ == "__main__":
+    unittest.main()
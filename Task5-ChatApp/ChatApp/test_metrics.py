@@ -0,0 +1,38 @@
+import unittest
+from metrics import MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+        self.latency = self.metrics.histogram("handler_seconds", "Handler latency.", label="event", buckets=(0.1, 1.0))
+
+    def test_histogram(self):
+        self.latency.observe("message", 0.05)
+        self.latency.observe("message", 0.5)
+        text = self.metrics.render()
+        self.assertIn('handler_seconds_bucket{event="message",le="0.1"} 1', text)
+        self.assertIn('handler_seconds_bucket{event="message",le="1.0"} 2', text)
+        self.assertIn('handler_seconds_bucket{event="message",le="+Inf"} 2', text)
+        self.assertIn('handler_seconds_count{event="message"} 2', text)
+
+    def test_timed(self):
+        handler = self.metrics.timed(self.latency, "connect")(lambda auth: auth)
+        self.assertEqual(handler("token"), "token")
+        self.assertEqual(self.latency.series["connect"]["count"], 1)
+
+    def test_collectors(self):
+        self.metrics.collect("rooms", "Open rooms.", lambda: 3)
+        self.metrics.collect("room_messages", "Messages.", lambda: {"AB": 2}, label="room")
+        text = self.metrics.render()
+        self.assertIn("# TYPE rooms gauge\nrooms 3\n", text)
+        self.assertIn('room_messages{room="AB"} 2', text)
+
+    def test_background_tasks(self):
+        task = self.metrics.track_task("reaper", lambda: self.metrics.background_tasks["reaper"])
+        self.assertEqual(task(), 1)
+        self.assertEqual(self.metrics.background_tasks["reaper"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from passwords import PasswordHasher
+
+
+class TestPasswordHasher(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+        def offload(fn, *args):
+            self.calls += 1
+            return fn(*args)
+
+        self.hasher = PasswordHasher(n=2 ** 8, offload=offload, cache_size=2)
+
+    def test_hash_is_salted(self):
+        first, second = self.hasher.hash("secret"), self.hasher.hash("secret")
+        self.assertNotEqual(first, second)
+        self.assertNotIn("secret", first)
+
+    def test_verify(self):
+        stored = self.hasher.hash("secret")
+        self.assertTrue(self.hasher.verify("secret", stored))
+        self.assertFalse(self.hasher.verify("wrong", stored))
+        self.assertFalse(self.hasher.verify("secret", "plaintext"))
+
+    def test_successful_verifications_are_cached(self):
+        stored = self.hasher.hash("secret")
+        self.hasher.verify("secret", stored)
+        calls = self.calls
+        self.assertTrue(self.hasher.verify("secret", stored))
+        self.assertEqual(self.calls, calls)
+        # Failures are never cached
+        self.hasher.verify("wrong", stored)
+        self.hasher.verify("wrong", stored)
+        self.assertEqual(self.calls, calls + 2)
+
+    def test_cache_is_bounded(self):
+        stored = [self.hasher.hash(f"pw{i}") for i in range(3)]
+        for i, value in enumerate(stored):
+            self.hasher.verify(f"pw{i}", value)
+        self.assertEqual(len(self.hasher._cache), 2)
+
+    def test_default_thread_pool(self):
+        hasher = PasswordHasher(n=2 ** 8)
+        self.assertTrue(hasher.verify("secret", hasher.hash("secret")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from ratelimit import RateLimiter, SlowConsumerGuard
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(rate=2, burst=3, clock=self.clock)
+
+    def test_burst_then_throttle(self):
+        self.assertEqual([self.limiter.allow("sid") for _ in range(4)], [True, True, True, False])
+        self.assertEqual(self.limiter.throttled, 1)
+
+    def test_refill(self):
+        for _ in range(3):
+            self.limiter.allow("sid")
+        self.clock.now = 0.5
+        self.assertTrue(self.limiter.allow("sid"))
+        self.assertFalse(self.limiter.allow("sid"))
+        self.clock.now = 100
+        self.assertEqual(sum(self.limiter.allow("sid") for _ in range(10)), 3)
+
+    def test_keys_are_independent(self):
+        for _ in range(3):
+            self.limiter.allow("a")
+        self.assertTrue(self.limiter.allow("b"))
+        self.limiter.forget("a")
+        self.assertTrue(self.limiter.allow("a"))
+
+
+class TestSlowConsumerGuard(unittest.TestCase):
+    def test_drop(self):
+        guard = SlowConsumerGuard(max_queue=10, policy="drop")
+        self.assertEqual(guard.check([("a", 2), ("b", 10)]), (["b"], []))
+        self.assertEqual(guard.dropped, 1)
+
+    def test_disconnect(self):
+        guard = SlowConsumerGuard(max_queue=10, policy="disconnect")
+        self.assertEqual(guard.check([("a", 20), ("b", 1)]), (["a"], ["a"]))
+        self.assertEqual(guard.disconnected, 1)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            SlowConsumerGuard(policy="block")
+
+
+if __name__ == "__main__":
+    unittest.main()
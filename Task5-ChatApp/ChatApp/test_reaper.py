@@ -0,0 +1,70 @@
+import threading
+import unittest
+from reaper import RoomReaper
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRoomReaper(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.expired = []
+        self.reaper = RoomReaper(self.expired.append, grace_period=5, clock=self.clock)
+
+    def test_expires_after_grace_period(self):
+        self.reaper.schedule("ABCD")
+        self.clock.now = 4.9
+        self.assertEqual(self.reaper.reap(), [])
+        self.assertEqual(self.reaper.pending_count(), 1)
+        self.clock.now = 5
+        self.assertEqual(self.reaper.reap(), ["ABCD"])
+        self.assertEqual(self.expired, ["ABCD"])
+        self.assertEqual(self.reaper.pending_count(), 0)
+
+    def test_cancel(self):
+        self.reaper.schedule("ABCD")
+        self.assertTrue(self.reaper.cancel("ABCD"))
+        self.assertFalse(self.reaper.cancel("ABCD"))
+        self.clock.now = 10
+        self.assertEqual(self.reaper.reap(), [])
+
+    def test_reschedule_extends_deadline(self):
+        self.reaper.schedule("ABCD")
+        self.clock.now = 3
+        self.reaper.schedule("ABCD")
+        self.clock.now = 6
+        self.assertEqual(self.reaper.reap(), [])
+        self.clock.now = 8
+        self.assertEqual(self.reaper.reap(), ["ABCD"])
+
+    def test_heap_stays_bounded_under_churn(self):
+        for _ in range(1000):
+            self.reaper.schedule("ABCD")
+            self.reaper.cancel("ABCD")
+        self.reaper.schedule("WXYZ")
+        self.assertLessEqual(len(self.reaper.heap), 65)
+
+
+    def test_concurrent_cancel_and_reap(self):
+        codes = [f"R{i:04d}" for i in range(2000)]
+        for code in codes:
+            self.reaper.schedule(code, 0)
+        cancelled = []
+        thread = threading.Thread(target=lambda: cancelled.extend(c for c in codes[::2] if self.reaper.cancel(c)))
+        thread.start()
+        reaped = []
+        while thread.is_alive() or self.reaper.pending_count():
+            reaped.extend(self.reaper.reap())
+        thread.join()
+        self.assertEqual(sorted(reaped + cancelled), codes)
+        self.assertEqual(self.expired, reaped)
+
+
+if __name__ == "__main__":
+    unittest.main()
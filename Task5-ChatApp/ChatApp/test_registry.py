@@ -0,0 +1,58 @@
+import threading
+import unittest
+from registry import Room, RoomRegistry
+
+
+class TestRoomRegistry(unittest.TestCase):
+    def setUp(self):
+        self.rooms = RoomRegistry(shards=4)
+
+    def test_room_uses_slots(self):
+        room = Room("ABCD")
+        with self.assertRaises(AttributeError):
+            room.extra = 1
+
+    def test_create_and_delete(self):
+        self.assertTrue(self.rooms.create("ABCD"))
+        self.assertFalse(self.rooms.create("ABCD"))
+        self.assertIn("ABCD", self.rooms)
+        self.assertEqual(len(self.rooms), 1)
+        self.assertTrue(self.rooms.delete("ABCD"))
+        self.assertFalse(self.rooms.delete("ABCD"))
+
+    def test_delete_only_if_empty(self):
+        self.rooms.create("ABCD")
+        self.rooms.join("ABCD", "alice")
+        self.assertFalse(self.rooms.delete("ABCD", only_if_empty=True))
+        self.rooms.leave("ABCD", "alice")
+        self.assertTrue(self.rooms.delete("ABCD", only_if_empty=True))
+
+    def test_members_never_go_negative(self):
+        self.rooms.create("ABCD")
+        self.assertTrue(self.rooms.join("ABCD", "alice"))
+        self.assertFalse(self.rooms.join("ABCD", "alice"))
+        self.assertEqual(self.rooms.leave("ABCD", "alice"), 0)
+        self.assertEqual(self.rooms.leave("ABCD", "alice"), 0)
+        self.assertEqual(self.rooms.leave("WXYZ", "alice"), 0)
+
+    def test_concurrent_join_and_leave(self):
+        self.rooms.create("ABCD")
+
+        def churn(worker):
+            for i in range(200):
+                name = f"{worker}-{i}"
+                self.rooms.join("ABCD", name)
+                self.rooms.leave("ABCD", name)
+
+        threads = [threading.Thread(target=churn, args=(w,)) for w in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self.rooms.locked("ABCD") as room:
+            self.assertEqual(room.members, 0)
+            self.assertEqual(room.joins, 1600)
+
+
+if __name__ == "__main__":
+    unittest.main()
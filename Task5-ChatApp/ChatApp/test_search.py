@@ -0,0 +1,123 @@
+import unittest
+from search import MAX_PREFIX_EXPANSION, RoomIndex, parse_query
+from state import SharedState
+
+
+def message(seq, text):
+    return {"name": "alice", "message": text, "time": "12:00", "seq": seq}
+
+
+class IndexedMessages:
+    """A RoomIndex with its messages kept in a dict, as history and the log keep them in the app."""
+
+    def __init__(self, max_messages):
+        self.index = RoomIndex(max_messages)
+        self.messages = {}
+
+    def add(self, content):
+        self.messages[content["seq"]] = content
+        self.index.add(content)
+
+    def fetch(self, seqs):
+        return {seq: self.messages[seq] for seq in seqs if seq in self.messages}
+
+    def search(self, query, **kwargs):
+        return self.index.search(query, self.fetch, **kwargs)
+
+
+class TestRoomIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = IndexedMessages(max_messages=100)
+        for seq, text in enumerate([
+            "Hello world",
+            "the quick brown fox",
+            "a brown dog, not quick",
+            "Quick brown foxes jump",
+            "world peace",
+        ]):
+            self.index.add(message(seq, text))
+
+    def seqs(self, query, **kwargs):
+        hits, _ = self.index.search(query, **kwargs)
+        return [hit["seq"] for hit in hits]
+
+    def test_parse_query(self):
+        self.assertEqual(parse_query('Hi fox* "quick brown"'), (["hi"], ["fox"], [["quick", "brown"]]))
+
+    def test_terms_match_all_words_newest_first(self):
+        self.assertEqual(self.seqs("brown quick"), [3, 2, 1])
+        self.assertEqual(self.seqs("WORLD"), [4, 0])
+        self.assertEqual(self.seqs("missing"), [])
+        self.assertEqual(self.seqs(""), [])
+
+    def test_prefix_and_phrase(self):
+        self.assertEqual(self.seqs("fox*"), [3, 1])
+        self.assertEqual(self.seqs('"quick brown"'), [3, 1])
+        self.assertEqual(self.seqs('"brown quick"'), [])
+        self.assertEqual(self.seqs('"quick brown" fox*'), [3, 1])
+
+    def test_wide_prefix_is_flagged(self):
+        self.assertFalse(self.index.index.candidates("fox*").truncated)
+        for seq in range(10, 10 + MAX_PREFIX_EXPANSION + 1):
+            self.index.add(message(seq, f"word{seq}"))
+        self.assertTrue(self.index.index.candidates("word*").truncated)
+        self.assertFalse(self.index.index.candidates("word1*").truncated)
+        self.assertFalse(self.index.index.candidates("world").truncated)
+
+    def test_pagination(self):
+        hits, next_before = self.index.search("brown", limit=2)
+        self.assertEqual([hit["seq"] for hit in hits], [3, 2])
+        self.assertEqual(next_before, 2)
+        hits, next_before = self.index.search("brown", before=next_before, limit=2)
+        self.assertEqual([hit["seq"] for hit in hits], [1])
+        self.assertIsNone(next_before)
+
+    def test_memory_is_bounded(self):
+        index = IndexedMessages(max_messages=10)
+        for seq in range(1000):
+            index.add(message(seq, f"word{seq} common"))
+        self.assertEqual(len(index.index), 10)
+        self.assertEqual(self.seqs_of(index, "common"), list(range(999, 989, -1)))
+        self.assertEqual(self.seqs_of(index, "word5"), [])
+        self.assertLessEqual(len(index.index.postings), 16)
+        self.assertLess(index.index.memory_bytes(), 4096)
+
+    def test_missing_text_is_skipped(self):
+        # Messages the log no longer has are left out, not returned as empty hits
+        hits, next_before = self.index.index.search("brown", lambda seqs: {2: message(2, "a brown dog")}, limit=2)
+        self.assertEqual([hit["seq"] for hit in hits], [2])
+        self.assertEqual(next_before, 2)
+
+    def test_scan_budget_returns_cursor(self):
+        index = IndexedMessages(max_messages=10000)
+        for seq in range(5000):
+            index.add(message(seq, "alpha" if seq % 2 else "alpha beta"))
+        index.add(message(5000, "beta"))
+        hits, _ = index.search("alpha beta", limit=10)
+        self.assertEqual([hit["seq"] for hit in hits], list(range(4998, 4978, -2)))
+        collected, cursor = [], None
+        while True:
+            hits, cursor = index.search("beta alpha", before=cursor, limit=5000)
+            collected.extend(hit["seq"] for hit in hits)
+            if cursor is None:
+                break
+        self.assertEqual(collected, list(range(4998, -1, -2)))
+
+    @staticmethod
+    def seqs_of(index, query):
+        hits, _ = index.search(query, limit=100)
+        return [hit["seq"] for hit in hits]
+
+    def test_index_follows_room_lifecycle(self):
+        state = SharedState()
+        code = state.create_room()
+        state.add_message(code, {"name": "alice", "message": "find me", "time": "12:00"})
+        with state.rooms.locked(code) as room:
+            self.assertEqual(room.index.candidates("find").seqs, [1])
+        state.delete_room(code)
+        with state.rooms.locked(code) as room:
+            self.assertIsNone(room)
+
+
+if __name__ == "__main__":
+    unittest.main()
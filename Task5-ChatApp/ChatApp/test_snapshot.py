@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from snapshot import StateSnapshotter
+from state import SharedState
+from userstore import UserStore
+
+
+class TestStateSnapshotter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state.snapshot")
+        self.users = UserStore(os.path.join(self.tmp.name, "users.db"))
+        self.users.add("alice", {"password": "x", "avatar": 1})
+
+    def tearDown(self):
+        self.users.conn.close()
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        state = SharedState(users=self.users)
+        code = state.create_room()
+        state.join(code, "alice")
+        for i in range(3):
+            state.add_message(code, {"name": "alice", "message": f"hello {i}", "time": "12:00"})
+        writer = StateSnapshotter(state, self.path)
+        self.assertGreater(writer.write(), 0)
+        self.assertEqual(writer.written, 1)
+
+        restarted = SharedState(users=UserStore(os.path.join(self.tmp.name, "users.db")))
+        reader = StateSnapshotter(restarted, self.path)
+        self.assertEqual(reader.restore(reader.load()), [code])
+        self.assertIn("alice", restarted.users.hot_names())
+        with restarted.rooms.locked(code) as room:
+            self.assertEqual([m["seq"] for m in room.messages.messages], [1, 2, 3])
+            self.assertEqual(room.sent, 3)
+            self.assertEqual(room.joins, 1)
+            # Members reconnect on their own; restoring them would block that
+            self.assertEqual(room.members, 0)
+            self.assertEqual(room.index.candidates("hello").seqs, [3, 2, 1])
+        self.assertTrue(restarted.codes.is_taken(code))
+
+        # Topping up from the message log afterwards must not duplicate
+        restarted.restore_room(code, [{"name": "alice", "message": "hello 2", "time": "12:00", "seq": 3},
+                                      {"name": "alice", "message": "later", "time": "12:01", "seq": 4}])
+        with restarted.rooms.locked(code) as room:
+            self.assertEqual([m["seq"] for m in room.messages.messages], [1, 2, 3, 4])
+        restarted.users.conn.close()
+
+    def test_deleted_rooms_stay_deleted(self):
+        state = SharedState(users=self.users)
+        kept, deleted = state.create_room(), state.create_room()
+        state.add_message(deleted, {"name": "alice", "message": "bye", "time": "12:00"})
+        snapshots = StateSnapshotter(state, self.path)
+        snapshots.write()
+        instance = state.delete_room(deleted)
+
+        restarted = SharedState(users=self.users)
+        reader = StateSnapshotter(restarted, self.path)
+        self.assertEqual(reader.restore(reader.load(), deleted={instance}), [kept])
+        self.assertNotIn(deleted, restarted.rooms)
+
+    def test_missing_or_corrupt_snapshot(self):
+        snapshots = StateSnapshotter(SharedState(users=self.users), self.path)
+        self.assertIsNone(snapshots.load())
+        with open(self.path, "wb") as f:
+            f.write(b"not a snapshot")
+        self.assertIsNone(snapshots.load())
+
+
+if __name__ == "__main__":
+    unittest.main()
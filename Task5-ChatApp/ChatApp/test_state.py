@@ -0,0 +1,174 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from bus import InProcessBus
+from state import SharedState
+from userstore import UserStore
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def get_room(state, code):
+    with state.rooms.locked(code) as room:
+        return room
+
+
+def pick_next(state, code):
+    """Make the worker's next allocation `code`, as if it had drawn it at random."""
+    allocate = state.codes.allocate
+
+    def pick():
+        state.codes.allocate = allocate
+        state.codes.reserve(code)
+        return code
+
+    state.codes.allocate = pick
+
+
+class TestSharedState(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        db_name = os.path.join(self.tmpdir.name, "users.db")
+        self.bus = InProcessBus()
+        self.db_name = db_name
+        self.worker_a = self.start_worker(timeout=0.1)
+        self.worker_b = self.start_worker()
+
+    def start_worker(self, timeout=1.0):
+        worker = SharedState(self.bus, users=UserStore(self.db_name))
+        worker.delivered = []
+        worker.on_message = lambda code, instance, content: worker.delivered.append(content)
+        threading.Thread(target=worker.listen, daemon=True).start()
+        worker.sync(timeout, retry=0.05)
+        return worker
+
+    def test_single_worker(self):
+        state = SharedState()
+        code = state.create_room()
+        self.assertTrue(state.join(code, "alice"))
+        self.assertFalse(state.join(code, "alice"))
+        self.assertEqual(state.leave(code, "alice"), 0)
+        self.assertEqual(state.leave(code, "alice"), 0)
+        self.assertTrue(state.codes.is_taken(code))
+        state.delete_room(code)
+        self.assertFalse(state.codes.is_taken(code))
+
+    def test_rooms_replicate(self):
+        code = self.worker_a.create_room()
+        self.worker_a.join(code, "alice")
+        self.assertTrue(wait_for(lambda: "alice" in getattr(get_room(self.worker_b, code), "names", ())))
+        self.assertFalse(self.worker_b.join(code, "alice"))
+        self.assertTrue(self.worker_b.codes.is_taken(code))
+
+        self.worker_b.delete_room(code)
+        self.assertTrue(wait_for(lambda: code not in self.worker_a.rooms))
+        self.assertFalse(self.worker_a.codes.is_taken(code))
+
+    def test_same_code_on_two_workers(self):
+        for worker in (self.worker_a, self.worker_b):
+            pick_next(worker, "ABCD")
+        codes = {}
+        threads = [threading.Thread(target=lambda w=w: codes.__setitem__(w, w.create_room()))
+                   for w in (self.worker_a, self.worker_b)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(codes.values())), 2)
+        self.assertIn("ABCD", codes.values())
+        for code in codes.values():
+            self.assertTrue(wait_for(lambda: get_room(self.worker_b, code) is not None))
+            self.assertEqual(get_room(self.worker_a, code).instance, get_room(self.worker_b, code).instance)
+
+    def test_unanswered_claim_is_withdrawn(self):
+        deaf = SharedState(self.bus, users=UserStore(self.db_name))  # never listens
+        self.assertIsNone(deaf.create_room(timeout=0.05))
+        time.sleep(0.1)
+        self.assertEqual(len(self.worker_a.rooms), 0)
+        self.assertEqual(len(self.worker_b.rooms), 0)
+
+    def test_users_are_shared(self):
+        self.assertTrue(self.worker_a.add_user("alice", {"password": "x", "avatar": 0}))
+        self.assertFalse(self.worker_b.add_user("alice", {"password": "y", "avatar": 1}))
+        self.assertEqual(self.worker_b.users.get("alice")["avatar"], 0)
+        self.worker_b.update_user("alice", avatar=3)
+        self.assertTrue(wait_for(lambda: self.worker_a.users.get("alice")["avatar"] == 3))
+
+    def test_messages_keep_sequence(self):
+        code = self.worker_a.create_room()
+        self.assertTrue(wait_for(lambda: code in self.worker_b.rooms))
+        self.assertTrue(self.worker_a.add_message(code, {"message": "hi"}))
+        self.assertTrue(wait_for(lambda: self.worker_a.delivered))
+        self.assertEqual(self.worker_a.delivered[0]["seq"], 1)
+        history = get_room(self.worker_b, code).messages
+        self.assertTrue(wait_for(lambda: len(history) == 1))
+        self.assertEqual(history.page()[0]["seq"], 1)
+        self.worker_b.add_message(code, {"message": "hello"})
+        self.assertTrue(wait_for(lambda: self.worker_b.delivered))
+        self.assertEqual(self.worker_b.delivered[0]["seq"], 2)
+
+    def test_concurrent_messages_agree(self):
+        code = self.worker_a.create_room()
+        self.assertTrue(wait_for(lambda: code in self.worker_b.rooms))
+
+        def send(worker):
+            for i in range(100):
+                worker.add_message(code, {"message": f"{worker.worker_id} {i}"})
+
+        threads = [threading.Thread(target=send, args=(w,)) for w in (self.worker_a, self.worker_b)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        histories = [get_room(w, code).messages for w in (self.worker_a, self.worker_b)]
+        self.assertTrue(wait_for(lambda: all(len(h) == 200 for h in histories)))
+        a, b = ([(m["seq"], m["message"]) for m in h.messages] for h in histories)
+        self.assertEqual(a, b)
+        self.assertEqual([seq for seq, _ in a], list(range(1, 201)))
+        delivered = self.worker_a.delivered + self.worker_b.delivered
+        self.assertEqual(sorted(m["seq"] for m in delivered), list(range(1, 201)))
+
+    def test_new_worker_syncs(self):
+        code = self.worker_a.create_room()
+        self.worker_a.join(code, "alice")
+        self.worker_a.add_message(code, {"message": "before"})
+        self.assertTrue(wait_for(lambda: self.worker_a.delivered))
+
+        worker_c = self.start_worker()
+        self.assertTrue(worker_c.synced)
+        room = get_room(worker_c, code)
+        self.assertEqual(room.names, {"alice"})
+        self.assertEqual(room.instance, get_room(self.worker_a, code).instance)
+        self.assertEqual([m["seq"] for m in room.messages.messages], [1])
+        self.assertTrue(worker_c.codes.is_taken(code))
+        worker_c.add_message(code, {"message": "after"})
+        self.assertTrue(wait_for(lambda: len(get_room(self.worker_a, code).messages) == 2))
+        self.assertEqual(worker_c.delivered[0]["seq"], 2)
+
+    def test_bus_copies_payloads(self):
+        bus = InProcessBus()
+        listeners = [bus.listen("test"), bus.listen("test")]
+        received = []
+        for listener in listeners:
+            threading.Thread(target=lambda l=listener: received.append(next(l)), daemon=True).start()
+        time.sleep(0.05)
+        payload = {"seq": 1}
+        bus.publish("test", payload)
+        self.assertTrue(wait_for(lambda: len(received) == 2))
+        received[0]["seq"] = 2
+        self.assertEqual(received[1], {"seq": 1})
+        self.assertEqual(payload, {"seq": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from history import MessageHistory
+from store import MessageStore
+
+
+class TestMessageStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = MessageStore(os.path.join(self.tmpdir.name, "messages.db"), batch_size=3, flush_interval=0.05)
+        self.store.start()
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_batches_and_flushes_on_close(self):
+        history = MessageHistory()
+        for i in range(7):
+            self.store.append("ABCD", "first", history.append({"message": str(i)}))
+        self.store.close()
+        self.assertEqual(self.store.written, 7)
+        self.assertEqual(self.store.batches, 3)
+
+    def test_restore_recent(self):
+        history = MessageHistory()
+        for i in range(5):
+            self.store.append("ABCD", "first", history.append({"message": str(i)}))
+        self.store.close()
+
+        instance, messages = self.store.load_recent(limit=2)["ABCD"]
+        self.assertEqual(instance, "first")
+        self.assertEqual([m["seq"] for m in messages], [4, 5])
+
+        restored = MessageHistory()
+        restored.restore(messages)
+        self.assertEqual(restored.append({"message": "next"})["seq"], 6)
+
+    def test_reused_code_is_not_merged(self):
+        old, new = MessageHistory(), MessageHistory()
+        for i in range(3):
+            self.store.append("ABCD", "old", old.append({"message": f"old {i}"}))
+        self.store.delete_room("old")
+        for i in range(2):
+            self.store.append("ABCD", "new", new.append({"message": f"new {i}"}))
+        self.store.delete_room("gone")
+        self.store.append("WXYZ", "gone", MessageHistory().append({"message": "bye"}))
+        self.store.close()
+
+        recent = self.store.load_recent()
+        self.assertEqual(list(recent), ["ABCD"])
+        instance, messages = recent["ABCD"]
+        self.assertEqual(instance, "new")
+        self.assertEqual([m["message"] for m in messages], ["new 0", "new 1"])
+        self.assertEqual(self.store.deleted_rooms(), {"old", "gone"})
+
+
+    def test_page_and_fetch(self):
+        history = MessageHistory()
+        for i in range(10):
+            self.store.append("ABCD", "first", history.append({"message": str(i)}))
+        self.store.close()
+        self.assertEqual([m["seq"] for m in self.store.page("first", before=6, limit=3)], [3, 4, 5])
+        self.assertEqual([m["seq"] for m in self.store.page("first", before=3)], [1, 2])
+        self.assertEqual(self.store.page("other", before=6), [])
+        found = self.store.fetch("first", [2, 9, 42])
+        self.assertEqual({seq: m["message"] for seq, m in found.items()}, {2: "1", 9: "8"})
+        self.assertEqual(self.store.fetch("first", []), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
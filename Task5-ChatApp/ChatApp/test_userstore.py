@@ -0,0 +1,40 @@
+import unittest
+from userstore import UserStore
+
+
+class TestUserStore(unittest.TestCase):
+    def setUp(self):
+        self.users = UserStore(":memory:", cache_size=2)
+        for name in ["alice", "albert", "alfred", "bob", "alan"]:
+            self.users.add(name, {"password": "hash", "avatar": 1})
+
+    def test_add_and_get(self):
+        self.assertFalse(self.users.add("alice", {"password": "other", "avatar": 2}))
+        self.assertEqual(self.users.get("alice"), {"password": "hash", "avatar": 1})
+        self.assertIsNone(self.users.get("carol"))
+        self.assertEqual(self.users.count(), 5)
+
+    def test_cache_is_bounded(self):
+        self.assertEqual(len(self.users.cache), 2)
+        self.users.get("bob")
+        self.assertIn("bob", self.users.cache)
+        misses = self.users.misses
+        self.users.get("alice")
+        self.assertEqual(self.users.misses, misses + 1)
+
+    def test_update_invalidates(self):
+        self.users.get("alice")
+        self.users.update("alice", avatar=4)
+        self.assertEqual(self.users.get("alice")["avatar"], 4)
+
+    def test_search_pages_by_prefix(self):
+        first = self.users.search("al", limit=2)
+        self.assertEqual([u["name"] for u in first], ["alan", "albert"])
+        second = self.users.search("al", after=first[-1]["name"], limit=2)
+        self.assertEqual([u["name"] for u in second], ["alfred", "alice"])
+        self.assertEqual(self.users.search("al", after="alice", limit=2), [])
+        self.assertEqual([u["name"] for u in self.users.search("b")], ["bob"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+import wire
+
+
+class TestWire(unittest.TestCase):
+    content = {"name": "alice", "message": "hi", "time": "12:00", "avatar": 3, "seq": 7}
+
+    def test_unknown_or_missing_format_gets_json(self):
+        self.assertEqual(wire.negotiate(None), wire.JSON)
+        self.assertEqual(wire.negotiate("xml"), wire.JSON)
+
+    def test_json_passes_content_through(self):
+        self.assertIs(wire.encode(self.content, wire.JSON), self.content)
+        self.assertIs(wire.decode(self.content), self.content)
+
+    @unittest.skipIf(wire.msgpack is None, "msgpack is not installed")
+    def test_msgpack_round_trip(self):
+        self.assertEqual(wire.negotiate("msgpack"), wire.MSGPACK)
+        payload = wire.encode(self.content, wire.MSGPACK)
+        self.assertIsInstance(payload, bytes)
+        self.assertEqual(wire.decode(payload), self.content)
+        self.assertLess(wire.encoded_size(self.content, wire.MSGPACK), wire.encoded_size(self.content, wire.JSON))
+
+    def test_format_rooms_are_distinct(self):
+        self.assertNotEqual(wire.format_room("ABCD", wire.JSON), wire.format_room("ABCD", wire.MSGPACK))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class UserStore:
+    """
+    SQLite-backed user directory with an in-memory LRU of hot records.
+
+    Records are dicts of {"password": <hash>, "avatar": <int>}. Treat the
+    returned dicts as read-only; change them through `update`.
+    """
+
+    def __init__(self, db_name="chat_users.db", cache_size=10000):
+        self.db_name = db_name
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_name, check_same_thread=False)
+        if db_name != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+
+    def create_tables(self):
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE NOT NULL,
+                    password TEXT NOT NULL,
+                    avatar INTEGER NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+    def add(self, name, record):
+        """Insert a new user. Returns False if the name is already taken."""
+        try:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO users (name, password, avatar) VALUES (?, ?, ?)",
+                    (name, record["password"], record["avatar"]),
+                )
+        except sqlite3.IntegrityError:
+            return False
+        self._cache_put(name, dict(record))
+        return True
+
+    def get(self, name):
+        """Return the user's record, or None if there is no such user."""
+        if not name:
+            return None
+        with self._lock:
+            record = self.cache.get(name)
+            if record is not None:
+                self.cache.move_to_end(name)
+                self.hits += 1
+                return record
+            self.misses += 1
+            row = self.conn.execute(
+                "SELECT password, avatar FROM users WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = {"password": row[0], "avatar": row[1]}
+        self._cache_put(name, record)
+        return record
+
+    def update(self, name, **fields):
+        columns = [column for column in fields if column in ("password", "avatar")]
+        if not columns:
+            return
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"UPDATE users SET {assignments} WHERE name = ?",
+                [fields[column] for column in columns] + [name],
+            )
+        self.invalidate(name)
+
+    def invalidate(self, name):
+        """Drop a cached record so the next read comes from the database."""
+        with self._lock:
+            self.cache.pop(name, None)
+
+    def search(self, prefix, after=None, limit=20):
+        """
+        Return up to `limit` user names starting with `prefix`, in order,
+        continuing after the name `after` (keyset pagination). The range
+        condition lets SQLite walk the unique index on name.
+        """
+        lower = max(prefix, after or "")
+        params = [lower, prefix + "\U0010ffff", limit]
+        comparison = ">" if after and after >= prefix else ">="
+        with self._lock:
+            rows = self.conn.execute(f"""
+                SELECT name, avatar FROM users
+                WHERE name {comparison} ? AND name < ?
+                ORDER BY name
+                LIMIT ?
+            """, params).fetchall()
+        return [{"name": name, "avatar": avatar} for name, avatar in rows]
+
+    def hot_names(self):
+        """Cached user names, least recently used first."""
+        with self._lock:
+            return list(self.cache)
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def _cache_put(self, name, record):
+        with self._lock:
+            self.cache[name] = record
+            self.cache.move_to_end(name)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
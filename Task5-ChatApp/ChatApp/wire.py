@@ -0,0 +1,53 @@
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+
+def available_formats():
+    """Wire formats this server can send; JSON is always available."""
+    return (JSON, MSGPACK) if msgpack is not None else (JSON,)
+
+
+def negotiate(requested):
+    """Pick the format for a client. Anything unknown (or old clients that ask for nothing) gets JSON."""
+    return requested if requested in available_formats() else JSON
+
+
+def format_room(room, fmt):
+    """
+    Socket.IO room holding the members of `room` that use `fmt`, so a
+    broadcast is encoded once per format rather than once per client.
+    """
+    return f"{room}:{fmt}"
+
+
+def encode(content, fmt):
+    """
+    Payload to hand to `send`. JSON clients get the dict and Socket.IO
+    serializes it as usual; MessagePack clients get packed bytes, which
+    Socket.IO ships as a binary attachment.
+    """
+    if fmt == MSGPACK:
+        return msgpack.packb(content)
+    return content
+
+
+def decode(payload):
+    if isinstance(payload, (bytes, bytearray)):
+        if msgpack is None:
+            raise RuntimeError('msgpack package is not installed (Run "pip install msgpack").')
+        return msgpack.unpackb(payload)
+    return payload
+
+
+def encoded_size(content, fmt):
+    """Bytes of the event payload on the wire, excluding Socket.IO framing."""
+    if fmt == MSGPACK:
+        return len(encode(content, fmt))
+    return len(json.dumps(content, separators=(",", ":")).encode())